@@ -0,0 +1,70 @@
+"""
+Micro-benchmark of HaloResponse parsing, one row per response type.
+
+    python -m benchmarks.bench_models --number 20000
+"""
+import argparse
+import json
+import timeit
+
+from roadangel.models import HaloResponse
+
+DEVICE_INFO = {
+    "nickname": "Halo", "password": "", "ordernum": "", "model": "HaloPro", "version": "1.0",
+    "uuid": "u", "macaddr": "00:00:00:00:00:00", "sn": "sn", "chipsn": "c", "legalret": 0,
+    "btnver": 1, "totalruntime": 100, "sdcapacity": 64000, "sdspare": 1000, "sdbrand": "x",
+    "hbbitrate": 1, "hsbitrate": 1, "mbbitrate": 1, "msbitrate": 1, "lbbitrate": 1,
+    "lsbitrate": 1, "rbbitrate": 1, "rsbitrate": 1, "default_user": "admin",
+    "is_neeed_update": 0, "edog_model": "", "edog_version": "", "edog_status": 0, "cid": "",
+    "is_support_emmc_and_tf": 0,
+}
+
+SD_CARD = {k: 1 for k in (
+    "sdcapacity", "sdspare", "n_num", "g_num", "stmsize", "playback_size", "slCycleSpace",
+    "smart_ok", "smart_version", "increasebadblock", "replaceblockleft", "runtime",
+    "totalruntime", "remainlifetimedegree", "degreeofwear", "totalweartime")}
+
+GPS_FILES = {"num": 500, "file": [
+    {"index": str(i), "type": "49", "starttime": "20250723145230", "endtime": "20250723145530",
+     "name": f"20250723145230_{i:04d}.gpx", "parentfile": ""} for i in range(500)]}
+
+# (label, command, payload)
+SAMPLES = [
+    ("SessionData", "API_RequestSessionID", {"acSessionId": "abc"}),
+    ("DeviceInfo", "API_GetBaseInfo", DEVICE_INFO),
+    ("AccStatus", None, {"connetc_acc_status": "on"}),
+    ("StateInfo", "API_GetMailboxData", {"state": 1}),
+    ("GpsState", None, {"gpsstate": 1}),
+    ("SystemParams", None, {"int_params": [{"key": "speaker_turn", "value": 50}],
+                            "string_params": [{"key": "mic_switch", "value": "off"}]}),
+    ("SdCardInfo", None, SD_CARD),
+    ("LoginHistory", None, {"info": [{"imei": "", "logon_time": "", "postion": "", "device_name": ""}]}),
+    ("BasicDeviceInfo", None, {"default_user": "admin", "model": "HaloPro", "nickname": "Halo",
+                               "macaddr": "", "version": "1.0", "totalruntime": 1}),
+    ("TripStats", None, {"total_time": 1, "total_mileage": 2, "avg_speed": 3.0}),
+    ("GpsFileReq x500", "API_GpsFileListReq", GPS_FILES),
+    ("unknown dict", None, {"foo": 1}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'type':<18}{'by command':>14}{'by keys':>14}{'json string':>14}   (us/op)")
+    for label, command, payload in SAMPLES:
+        text = json.dumps(payload)
+        number = max(args.number // 100, 1) if label.startswith("GpsFileReq") else args.number
+
+        def per_op(stmt):
+            return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e6
+
+        by_command = per_op(lambda: HaloResponse(0, payload, command).data) if command else float("nan")
+        by_keys = per_op(lambda: HaloResponse(0, payload).data)
+        from_text = per_op(lambda: HaloResponse(0, text, command).data)
+        print(f"{label:<18}{by_command:>14.2f}{by_keys:>14.2f}{from_text:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Bulk NMEA parsing (roadangel.nmea.parse_rmc) against the per-line
+GPSFetcher._extract_gps_from_line path, on a synthetic day of fixes.
+
+    python -m benchmarks.bench_nmea --fixes 86400
+"""
+import argparse
+import time
+
+import numpy as np
+
+from roadangel.gps import GPSFetcher
+from roadangel.nmea import parse_rmc
+from roadangel.simulator import synthetic_gpx
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixes", type=int, default=86400)
+    args = parser.parse_args()
+
+    data = synthetic_gpx(args.fixes)
+    print(f"{len(data) / 1e6:.1f} MB, {args.fixes} RMC sentences")
+
+    start = time.perf_counter()
+    per_line = [GPSFetcher._extract_gps_from_line(None, line) for line in data.decode().splitlines()]
+    per_line = [fix for fix in per_line if fix]
+    t_line = time.perf_counter() - start
+
+    start = time.perf_counter()
+    track = parse_rmc(data)
+    t_bulk = time.perf_counter() - start
+
+    valid = track.valid_only()
+    assert len(valid) == len(per_line)
+    assert np.allclose(valid.latitude, [f["latitude"] for f in per_line])
+    assert np.allclose(valid.longitude, [f["longitude"] for f in per_line])
+
+    print(f"per-line: {t_line * 1000:8.1f} ms")
+    print(f"bulk:     {t_bulk * 1000:8.1f} ms  ({t_line / t_bulk:.1f}x, plus speed/course/epoch columns)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Tail latency of ``get_baseinfo`` with and without a RequestPolicy against a
+lossy HaloSimulator.
+
+A lost request hangs for ``--stall`` seconds before the connection drops,
+like a packet lost on the camera's WiFi. Without a policy that stall (or the
+fixed timeout) ends up in the p99; with one, a hedged second attempt answers
+after the host's p95 round-trip.
+
+    python -m benchmarks.bench_policy --requests 500 --loss 0.03
+"""
+import argparse
+import statistics
+import time
+
+from roadangel.policy import RequestPolicy
+from roadangel.simulator import HaloSimulator
+
+from .suite import percentile
+
+
+def run(label, halo, n):
+    samples = []
+    errors = 0
+    for _ in range(n):
+        start = time.perf_counter()
+        try:
+            halo.get_baseinfo()
+        except Exception:
+            errors += 1
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    p99 = percentile(samples, 0.99)
+    print(f"{label:>8}: mean {statistics.mean(samples) * 1000:8.2f} ms  "
+          f"p50 {samples[len(samples) // 2] * 1000:8.2f} ms  "
+          f"p99 {p99 * 1000:8.2f} ms  errors {errors}")
+    return p99
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--loss", type=float, default=0.03)
+    parser.add_argument("--stall", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with HaloSimulator(latency=args.latency, jitter=args.jitter, loss=args.loss,
+                       stall=args.stall, seed=args.seed) as sim:
+        plain = run("plain", sim.halo(), args.requests)
+
+        policy = RequestPolicy()
+        hedged = run("policy", sim.halo(policy=policy), args.requests)
+        stats = policy.stats(sim.host)
+        print(f"hedges {stats.hedges}, won by hedge {stats.hedge_wins}, "
+              f"timeout {policy.timeout(sim.host) * 1000:.1f} ms, "
+              f"hedge after {policy.hedge_delay(sim.host) * 1000:.1f} ms")
+        policy.close()
+
+    print(f"p99 improvement: {plain / hedged:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare bare ``requests.post`` with the pooled HaloTransport against the
+local HaloSimulator.
+
+Every new TCP connection costs ``--connect-delay`` seconds on the simulator,
+mimicking the handshake over the camera's WiFi link.
+
+    python -m benchmarks.bench_transport --requests 200 --connect-delay 0.02
+"""
+import argparse
+import json
+import statistics
+import time
+
+import requests
+
+from roadangel.simulator import HaloSimulator
+from roadangel.transport import HaloTransport
+
+from .suite import percentile
+
+
+def run(label, send, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        send()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    print(f"{label:>10}: mean {statistics.mean(samples) * 1000:7.2f} ms  "
+          f"p50 {samples[len(samples) // 2] * 1000:7.2f} ms  "
+          f"p99 {percentile(samples, 0.99) * 1000:7.2f} ms")
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--connect-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with HaloSimulator(connect_delay=args.connect_delay) as sim:
+        host = sim.host
+        payload = json.dumps({"vyou": "1", "id": "2"})
+
+        url = f"http://{host}/vcam/cmd.cgi?cmd=API_GetMailboxData"
+        bare = run("bare", lambda: requests.post(url, data=payload, timeout=5).json(), args.requests)
+
+        with HaloTransport(host) as transport:
+            pooled = run("pooled", lambda: transport.command("API_GetMailboxData", payload).json(), args.requests)
+
+    print(f"speedup: {bare / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
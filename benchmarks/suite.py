@@ -0,0 +1,180 @@
+"""
+Benchmark suite against the local HaloSimulator: command round-trips,
+response parsing, GPS fetch and stream ingestion. Results are written as
+JSON; pass an earlier results file as ``--baseline`` to flag regressions.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --baseline results.json --threshold 0.2
+"""
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+
+from roadangel.gps import GPSFetcher
+from roadangel.models import HaloResponse
+from roadangel.mux import StreamMux
+from roadangel.nmea import parse_rmc
+from roadangel.recorder import StreamRecorder
+from roadangel.simulator import HaloSimulator, synthetic_gpx
+
+from .bench_models import SAMPLES
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of sorted ``samples``"""
+    return samples[min(len(samples) - 1, max(math.ceil(len(samples) * q) - 1, 0))]
+
+
+def timings(func, n, warmup=3):
+    """Latency summary of ``n`` calls, in seconds (lower is better)"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "unit": "s", "n": n,
+        "mean": statistics.mean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": percentile(samples, 0.99),
+    }
+
+
+def per_op(func, number):
+    """Best-of-3 seconds per call for fast functions (lower is better)"""
+    best = min(timeit.repeat(func, number=number, repeat=3)) / number
+    return {"unit": "s", "n": number, "mean": best, "p50": best, "p99": best}
+
+
+def throughput(nbytes, seconds):
+    """MB/s (higher is better)"""
+    return {"unit": "MB/s", "value": nbytes / seconds / 1e6 if seconds else 0.0}
+
+
+def bench_commands(n):
+    results = {}
+    with HaloSimulator(connect_delay=0.005) as sim:
+        halo = sim.halo()
+        halo.login()
+        results["command.get_baseinfo"] = timings(halo.get_baseinfo, n)
+        results["command.gpsfilelistreq"] = timings(halo.gpsfilelistreq, n)
+
+    with HaloSimulator(latency=0.002, jitter=0.002, seed=1) as sim:
+        halo = sim.halo()
+        halo.login()
+        results["command.jitter_2ms"] = timings(halo.get_mailboxdata, n)
+    return results
+
+
+def bench_parsing(number):
+    results = {}
+    for label, command, payload in SAMPLES:
+        n = max(number // 100, 1) if label.startswith("GpsFileReq") else number
+        key = "parse." + label.split()[0].replace(" ", "_")
+        results[key] = per_op(lambda: HaloResponse(0, payload, command).data, n)
+    return results
+
+
+def bench_gps(fixes, n):
+    results = {}
+    data = synthetic_gpx(fixes)
+    results["gps.parse_rmc"] = per_op(lambda: parse_rmc(data), max(n // 10, 1))
+
+    with HaloSimulator(gpx_files=1, gpx_fixes=fixes) as sim:
+        halo = sim.halo()
+        halo.login()
+        gps = GPSFetcher(halo)
+        name = sim.file_list[0]["name"]
+        results["gps.fetch_track"] = timings(lambda: gps.fetch_track(name), n)
+        results["gps.fetch_latest_gps"] = timings(gps.fetch_latest_gps, n)
+
+        tail = GPSFetcher(halo, tail=True)
+        tail.fetch_latest_gps()
+        results["gps.fetch_latest_gps_tail"] = timings(tail.fetch_latest_gps, n)
+    return results
+
+
+def bench_stream(seconds):
+    results = {}
+    with HaloSimulator(fps=0) as sim:
+        halo = sim.halo()
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = halo.recorder(directory, segment_seconds=1).start()
+            time.sleep(seconds)
+            recorder.stop()
+            results["stream.recorder"] = throughput(recorder.stats.bytes_received, seconds)
+
+        with StreamMux(port=sim.stream_port, decoder_factory=None) as mux:
+            mux.add(halo.stream_host)
+            time.sleep(seconds)
+            results["stream.mux_idle"] = throughput(sum(s.bytes_received for s in mux.stats), seconds)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Names of benchmarks that got more than ``threshold`` worse than the baseline"""
+    regressions = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None or before.get("unit") != now.get("unit"):
+            continue
+        if now["unit"] == "MB/s":
+            worse = before["value"] and (before["value"] - now["value"]) / before["value"]
+        else:
+            worse = before["p50"] and (now["p50"] - before["p50"]) / before["p50"]
+        if worse > threshold:
+            regressions.append(f"{name}: {worse * 100:.0f}% worse")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    parser.add_argument("--baseline", default=None, help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--fixes", type=int, default=3600)
+    parser.add_argument("--stream-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    results = {}
+    results.update(bench_commands(args.requests))
+    results.update(bench_parsing(args.number))
+    results.update(bench_gps(args.fixes, max(args.requests // 4, 5)))
+    results.update(bench_stream(args.stream_seconds))
+
+    for name, r in results.items():
+        if r["unit"] == "MB/s":
+            print(f"{name:<32}{r['value']:>12.1f} MB/s")
+        else:
+            print(f"{name:<32}{r['mean'] * 1e6:>12.1f} us mean {r['p99'] * 1e6:>12.1f} us p99")
+
+    report = {
+        "meta": {"time": time.time(), "python": platform.python_version(), "platform": platform.platform()},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import logging
+import time
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency: pip install RoadAngel[async]
+    aiohttp = None
+
+from .dashcam import HANDSHAKE_COMMANDS, generalsave_payload, stream_host, syncdate_payload
+from .metrics import METRICS, CommandEvent
+from .models import DeviceInfo, GpsFileReq, HaloResponse, SessionData, SwitchMode
+from .session import SessionManager
+
+
+def _payload_size(payload) -> int:
+    return len(payload) if isinstance(payload, (str, bytes)) else 0
+
+
+def create_session(limit=100, limit_per_host=2, timeout=5) -> "aiohttp.ClientSession":
+    """Create a ClientSession that many AsyncHaloPro instances can share.
+
+    ``limit`` caps the total number of open connections, ``limit_per_host``
+    caps them per camera so one device never gets more than its small web
+    server can handle.
+    """
+    if aiohttp is None:
+        raise ImportError("AsyncHaloPro requires aiohttp: pip install RoadAngel[async]")
+
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        # Cameras are addressed by IP, cookies are sent per request instead
+        cookie_jar=aiohttp.DummyCookieJar(),
+    )
+
+
+class AsyncHaloPro:
+    """asyncio counterpart of :class:`~roadangel.dashcam.HaloPro`.
+
+    All instances can share one ``aiohttp.ClientSession`` (see
+    :func:`create_session`), so a single event loop drives any number of
+    cameras::
+
+        async with create_session() as session:
+            cams = [AsyncHaloPro(host, session=session) for host in hosts]
+            await asyncio.gather(*(cam.login() for cam in cams))
+            infos = await asyncio.gather(*(cam.get_baseinfo() for cam in cams))
+
+    With a SessionManager, sessions are reused like HaloPro does and a
+    command rejected because the session expired triggers one fresh
+    handshake, shared by every coroutine that hit the same rejection.
+    """
+
+    def __init__(self, host, username="admin", password="admin", session=None,
+                 limit_per_host=2, timeout=5, sessions: SessionManager = None, stream_port=6200):
+        if aiohttp is None:
+            raise ImportError("AsyncHaloPro requires aiohttp: pip install RoadAngel[async]")
+
+        self.host = host
+        self.username = username
+        self.password = password
+        self.session_id = None
+        self.uid = "8f852e60dccd41299e873c62e3ba1ae38750231a"
+        self.stream_host = stream_host(host)
+        self.stream_port = stream_port
+        self.stream_url = f'tcp://{self.stream_host}:{stream_port}/'
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json'}
+        self.sessions = sessions
+        self._login_lock = asyncio.Lock()
+
+        self._session = session
+        self._owns_session = session is None
+        self._limit_per_host = limit_per_host
+
+    def _get_session(self):
+        if self._session is None:
+            self._session = create_session(limit=self._limit_per_host,
+                                           limit_per_host=self._limit_per_host,
+                                           timeout=self.timeout)
+        return self._session
+
+    async def _command(self, cmd, payload=None, reauth=True) -> HaloResponse:
+        """Send a command and check the errcode, re-authenticating once on an expired session"""
+        url = f"http://{self.host}/vcam/cmd.cgi?cmd={cmd}"
+        start = time.perf_counter() if METRICS.enabled else 0.0
+        body = b""
+        sent_with = self.session_id
+        halo_resp = None
+
+        try:
+            async with self._get_session().post(url, headers=self.headers, data=payload) as response:
+                if self._is_auth_error(cmd, response.status):
+                    errcode = response.status
+                else:
+                    response.raise_for_status()
+                    body = await response.read()
+                    # De camera stuurt niet altijd een JSON content-type mee
+                    halo_resp = HaloResponse.from_json(json.loads(body), cmd)
+                    errcode = halo_resp.errcode
+        except Exception as e:
+            if METRICS.enabled:
+                METRICS.record(CommandEvent(self.host, cmd, time.perf_counter() - start,
+                                            _payload_size(payload), len(body), None, not reauth, e))
+            raise
+
+        if METRICS.enabled:
+            METRICS.record(CommandEvent(self.host, cmd, time.perf_counter() - start,
+                                        _payload_size(payload), len(body), errcode, not reauth))
+
+        if reauth and self._is_auth_error(cmd, errcode):
+            async with self._login_lock:
+                # Een andere coroutine kan de sessie al vernieuwd hebben
+                if self.session_id == sent_with:
+                    logging.info(f"[info] Session for {self.host} rejected ({errcode}), re-authenticating")
+                    self.sessions.invalidate(self.host)
+                    await self.login(force=True)
+            return await self._command(cmd, payload, reauth=False)
+
+        if errcode != 0:
+            raise RuntimeError(f"API returned error code: {errcode}")
+
+        return halo_resp
+
+    def _is_auth_error(self, cmd, errcode):
+        return (self.sessions is not None
+                and cmd not in HANDSHAKE_COMMANDS
+                and errcode in self.sessions.auth_errcodes)
+
+    def _set_session_id(self, session_id):
+        self.session_id = session_id
+        self.headers = {
+            'Content-Type': 'application/json',
+            'SessionID': self.session_id,
+            # Zelfde cookie als HaloPro via requests meestuurt
+            'Cookie': f'Cookie=JSESSIONID={self.session_id}',
+        }
+
+    async def close(self):
+        """Close the session if this instance created it"""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def login(self, force=False):
+        """Session and certificate handshake in one go, reusing a cached session when possible"""
+        if not force and self.sessions is not None:
+            session_id = self.sessions.get(self.host)
+            if session_id:
+                self._set_session_id(session_id)
+                logging.info(f"[info] Reusing cached session for {self.host}")
+                return None
+
+        await self.get_session()
+        certificate = await self.get_certificate()
+
+        if self.sessions is not None:
+            self.sessions.put(self.host, self.session_id)
+        return certificate
+
+    async def get_session(self):
+        """Initialize a connection and get session_id"""
+        try:
+            self.headers = {'Content-Type': 'application/json'}
+
+            halo_resp = await self._command("API_RequestSessionID", {
+                "vyou": "1",
+                "id": "2"
+            })
+
+            if not isinstance(halo_resp.data, SessionData) or not halo_resp.data.acSessionId:
+                raise RuntimeError(f"[error] API returned invalid object: {halo_resp._data_raw}")
+
+            self._set_session_id(halo_resp.data.acSessionId)
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to get session ID: {e}")
+
+    async def get_certificate(self):
+        """Request certificate from HaloPro with session_id as cookie"""
+        try:
+            payload = json.dumps({
+                "password": self.password,
+                "uid": self.uid,
+                "level": 0,
+                "user": self.username
+            })
+
+            halo_resp = await self._command("API_RequestCertificate", payload)
+
+            logging.info(f"[success] Certificaat stored for {self.host}")
+            return halo_resp.data
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to get certificate: {e}")
+
+    async def get_mailbox_response(self) -> HaloResponse:
+        """API_GetMailboxData as a HaloResponse, for pollers that need the raw payload too"""
+        return await self._command("API_GetMailboxData", json.dumps({
+            "vyou": "1",
+            "id": "2"
+        }))
+
+    async def get_mailboxdata(self):
+        """Check if there is any data ready for us"""
+        try:
+            halo_resp = await self.get_mailbox_response()
+
+            logging.info(f"[info] Mailboxdata retreived {halo_resp.data}")
+            return halo_resp.data
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to get mailboxdata: {e}")
+
+    async def set_playbackliveswitch(self, switch: SwitchMode = SwitchMode.LIVE):
+        """Change playback live mode"""
+        try:
+            await self._command("APP_PlaybackLiveSwitch", json.dumps({
+                "switch": switch.value,
+                "playtime": "0"
+            }))
+
+            logging.info(f"[info] Livestream switched {switch}. Stream available at: {self.stream_url}")
+            return True
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to set livestream: {e}")
+
+    async def set_applivestate(self, switch: SwitchMode = SwitchMode.ON):
+        """Change the app's state"""
+        try:
+            await self._command("API_SetAppLiveState", json.dumps({
+                "switch": switch.value,
+                "playtime": "0"
+            }))
+
+            logging.info(f"[info] livestate switched {switch}. Stream available at: {self.stream_url}")
+            return True
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to set applivestate: {e}")
+
+    async def syncdate(self):
+        """Sync the date & time"""
+        try:
+            await self._command("API_SyncDate", json.dumps(syncdate_payload()))
+
+            logging.info(f"[info] Datetime synced")
+            return True
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to sync date: {e}")
+
+    async def get_baseinfo(self) -> DeviceInfo:
+        """Get DeviceInfo"""
+        try:
+            halo_resp = await self._command("API_GetBaseInfo", json.dumps({
+                "vyou": "1",
+                "id": "2"
+            }))
+
+            if isinstance(halo_resp.data, DeviceInfo):
+                return halo_resp.data
+
+            raise RuntimeError(f"Unable to get device info")
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to get baseinfo: {e}")
+
+    async def superdownload(self, switch: SwitchMode = SwitchMode.OFF):
+        """Set SuperDownload"""
+        try:
+            await self._command("API_SuperDownload", json.dumps({
+                "switch": switch.value,
+            }))
+
+            logging.info(f"[info] superdownload switched {switch}")
+            return True
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to set superdownload: {e}")
+
+    async def gpsfilelistreq(self) -> GpsFileReq:
+        """Get GPS file list"""
+        try:
+            halo_resp = await self._command("API_GpsFileListReq", json.dumps({
+                "vyou": "1",
+                "id": "2"
+            }))
+
+            logging.info(f"[info] GPS File req downloaded")
+            if isinstance(halo_resp.data, GpsFileReq):
+                return halo_resp.data
+
+            raise RuntimeError(f'Response not of correct type')
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to get gps file list: {e}")
+
+    async def generalsave(self, **params):
+        """Allow changing of the config, takes the same keywords as HaloPro.generalsave"""
+        try:
+            await self._command("API_GeneralSave", json.dumps(generalsave_payload(**params)))
+
+            logging.info(f"[info] Config changed")
+            return True
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to set config: {e}")
@@ -0,0 +1,45 @@
+from typing import List, Tuple
+
+# H.264 Annex B: elke NAL unit begint met 00 00 01 (of 00 00 00 01)
+START_CODE = b"\x00\x00\x01"
+
+NAL_SLICE = 1
+NAL_IDR = 5
+NAL_SEI = 6
+NAL_SPS = 7
+NAL_PPS = 8
+NAL_AUD = 9
+
+PARAMETER_SETS = (NAL_SPS, NAL_PPS)
+# Na deze NAL units hoort een IDR slice bij een access unit die al begonnen is
+IDR_CONTINUES = (NAL_SPS, NAL_PPS, NAL_SEI, NAL_AUD, NAL_IDR)
+
+
+def find_nals(buf, start=0) -> List[Tuple[int, int]]:
+    """(offset, nal type) of every NAL unit in ``buf`` whose header byte is present.
+
+    The offset points at the first byte of the start code, including the
+    extra leading zero of a 4-byte start code. Uses ``bytes.find`` only, so
+    the payload is never touched from Python.
+    """
+    nals = []
+    find = buf.find
+    end = len(buf) - 3
+    pos = find(START_CODE, start)
+    while pos != -1 and pos < end:
+        offset = pos - 1 if pos > start and buf[pos - 1] == 0 else pos
+        nals.append((offset, buf[pos + 3] & 0x1F))
+        pos = find(START_CODE, pos + 3)
+    return nals
+
+
+def is_keyframe_boundary(nal_type, previous_type=None) -> bool:
+    """True where a decoder can start: an SPS, or the first IDR slice of a frame without parameter sets.
+
+    An IDR after SPS, PPS, SEI or an access unit delimiter belongs to the
+    keyframe that started there, and an IDR after an IDR is the next slice
+    of the same frame.
+    """
+    if nal_type == NAL_SPS:
+        return True
+    return nal_type == NAL_IDR and previous_type not in IDR_CONTINUES
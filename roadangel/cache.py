@@ -0,0 +1,175 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Seconden; alleen commando's met een TTL worden gecachet
+DEFAULT_TTLS = {
+    "API_GetBaseInfo": 300.0,
+    "API_GpsFileListReq": 10.0,
+}
+
+# Schrijvend commando -> gecachte commando's die erdoor verouderen
+DEFAULT_INVALIDATES = {
+    "API_GeneralSave": frozenset({"API_GetBaseInfo", "API_GeneralQuery"}),
+    "API_SyncDate": frozenset({"API_GetBaseInfo", "API_GpsFileListReq"}),
+    "API_SuperDownload": frozenset({"API_GpsFileListReq"}),
+}
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    stale_hits: int = 0     # served stale while a refresh ran
+    misses: int = 0
+    refreshes: int = 0
+    refresh_errors: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+@dataclass(slots=True)
+class _Entry:
+    value: object
+    stored: float
+    refreshing: bool = False
+
+
+@dataclass(slots=True)
+class _Inflight:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    users: int = 0
+    generation: int = 0     # raised by invalidate() while a fetch runs
+
+
+class ResponseCache:
+    """LRU cache of command responses per ``(host, command)`` with a TTL per command.
+
+    An entry younger than its TTL is returned as is. Up to ``stale_ttl``
+    seconds after that it is still returned, while one background refresh
+    fetches a new value (stale-while-revalidate). Older entries are fetched
+    again in the caller. Concurrent misses for the same key share one fetch.
+    A write listed in ``invalidates`` drops the entries it makes stale::
+
+        cache = ResponseCache(ttls={"API_GetBaseInfo": 60})
+        halo = HaloPro(host, cache=cache)
+        halo.get_baseinfo()  # round-trip
+        halo.get_baseinfo()  # from the cache
+
+    Cached values are shared between callers, treat them as read-only.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, stale_ttl=30.0, max_entries=256,
+                 invalidates: Optional[Dict[str, Iterable[str]]] = None, workers=2):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.invalidates = {cmd: frozenset(targets) for cmd, targets in
+                            (DEFAULT_INVALIDATES if invalidates is None else invalidates).items()}
+        self.stats = CacheStats()
+
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], _Inflight] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cache-refresh")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cacheable(self, cmd) -> bool:
+        return cmd in self.ttls
+
+    def get(self, host, cmd, fetch: Callable[[], object]):
+        """Cached value for ``cmd`` on ``host``, calling ``fetch()`` when there is none"""
+        key = (host, cmd)
+        ttl = self.ttls[cmd]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry.stored
+                if age < ttl:
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return entry.value
+                if age < ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stats.stale_hits += 1
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        self._pool.submit(self._refresh, key, entry, fetch)
+                    return entry.value
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                inflight = self._inflight[key] = _Inflight()
+            inflight.users += 1
+
+        try:
+            with inflight.lock:
+                # Een andere thread kan het net opgehaald hebben
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and time.monotonic() - entry.stored < ttl:
+                        self.stats.hits += 1
+                        return entry.value
+                    self.stats.misses += 1
+                    generation = inflight.generation
+                value = fetch()
+                with self._lock:
+                    # Ongeldig gemaakt tijdens fetch(): de waarde kan van voor de write zijn, niet bewaren
+                    if inflight.generation == generation:
+                        self._store(key, value)
+                return value
+        finally:
+            # De laatste die op dit lock wacht ruimt het op
+            with self._lock:
+                inflight.users -= 1
+                if not inflight.users:
+                    del self._inflight[key]
+
+    def _refresh(self, key, entry: _Entry, fetch):
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self.stats.refresh_errors += 1
+                entry.refreshing = False
+            logging.warning(f"[warning] Refreshing {key[1]} for {key[0]} failed: {e}")
+            return
+        with self._lock:
+            self.stats.refreshes += 1
+            # Niet terugzetten als het intussen ongeldig is gemaakt
+            if self._entries.get(key) is entry:
+                self._store(key, value)
+
+    def _store(self, key, value):
+        # Aanroeper houdt self._lock vast
+        self._entries[key] = _Entry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def invalidate(self, host=None, cmd=None):
+        """Drop the entries of ``host`` and/or ``cmd``, everything without arguments"""
+        def matches(key):
+            return (host is None or key[0] == host) and (cmd is None or key[1] == cmd)
+
+        with self._lock:
+            for key in [k for k in self._entries if matches(k)]:
+                del self._entries[key]
+                self.stats.invalidations += 1
+            # Lopende fetches mogen hun antwoord niet meer bewaren
+            for key, inflight in self._inflight.items():
+                if matches(key):
+                    inflight.generation += 1
+
+    def written(self, host, cmd):
+        """Invalidate what the write ``cmd`` on ``host`` makes stale"""
+        for target in self.invalidates.get(cmd, ()):
+            self.invalidate(host, target)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
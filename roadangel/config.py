@@ -0,0 +1,166 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional
+
+from .dashcam import HaloPro
+from .fleet import FleetResult, HaloFleet
+from .models import IntParam, StringParam, SystemParams
+
+
+@dataclass
+class ConfigDiff:
+    """Keys whose desired value differs from the device, split like API_GeneralSave expects"""
+    int_params: Dict[str, int] = field(default_factory=dict)
+    string_params: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def empty(self) -> bool:
+        return not self.int_params and not self.string_params
+
+    @property
+    def keys(self):
+        return sorted({*self.int_params, *self.string_params})
+
+
+@dataclass
+class ConfigReport:
+    host: str
+    diff: ConfigDiff
+    saved: bool = False      # False: already as desired, nothing sent
+    verified: Optional[bool] = None
+    mismatches: Dict[str, Any] = field(default_factory=dict)
+
+
+def flatten_params(params: SystemParams) -> Dict[str, Any]:
+    """SystemParams as one ``key -> value`` dict"""
+    flat = {p.key: p.value for p in params.int_params}
+    flat.update((p.key, p.value) for p in params.string_params)
+    return flat
+
+
+def diff_params(current: SystemParams, desired: Dict[str, Any]) -> ConfigDiff:
+    """Minimal change that turns ``current`` into ``desired``.
+
+    A key's type follows the device (IntParam or StringParam); keys the
+    device did not report go by the type of the desired value.
+    """
+    ints = {p.key: p.value for p in current.int_params}
+    strings = {p.key: p.value for p in current.string_params}
+
+    diff = ConfigDiff()
+    for key, value in desired.items():
+        if key in ints or (key not in strings and isinstance(value, int) and not isinstance(value, bool)):
+            value = int(value)
+            if ints.get(key) != value:
+                diff.int_params[key] = value
+        else:
+            value = str(value)
+            if strings.get(key) != value:
+                diff.string_params[key] = value
+    return diff
+
+
+class ConfigManager:
+    """Reads each device's settings once and writes only what differs from a desired state.
+
+    The current SystemParams of a host are cached after the first read and
+    updated with every save, so a second ``apply`` of the same state sends
+    nothing. ``rollout`` applies one state to a whole HaloFleet in
+    parallel, with a ConfigReport (or the error) per device::
+
+        manager = ConfigManager(fleet)
+        results = manager.rollout({"mic_switch": "on", "speaker_turn": 30})
+        for host, result in results.items():
+            print(host, result.value.diff.keys if result.ok else result.error)
+
+    ``query_command`` reads the settings, see ``HaloPro.get_params``.
+    """
+
+    def __init__(self, fleet: Optional[HaloFleet] = None, query_command="API_GeneralQuery", verify=False):
+        self.fleet = fleet
+        self.query_command = query_command
+        self.verify = verify
+        self._params: Dict[str, SystemParams] = {}
+        self._lock = threading.Lock()
+
+    def current(self, halo: HaloPro, refresh=False) -> SystemParams:
+        """The host's settings, from the device on first use or with ``refresh``"""
+        with self._lock:
+            params = None if refresh else self._params.get(halo.host)
+        if params is None:
+            params = halo.get_params(self.query_command)
+            with self._lock:
+                self._params[halo.host] = params
+        return params
+
+    def forget(self, host=None):
+        """Drop the cached settings of ``host``, or of every host"""
+        with self._lock:
+            if host is None:
+                self._params.clear()
+            else:
+                self._params.pop(host, None)
+
+    def plan(self, halo: HaloPro, desired: Dict[str, Any]) -> ConfigDiff:
+        return diff_params(self.current(halo), desired)
+
+    def apply(self, halo: HaloPro, desired: Dict[str, Any], verify=None) -> ConfigReport:
+        """Send the changed keys of ``desired`` to ``halo``, nothing when it already matches"""
+        verify = self.verify if verify is None else verify
+        diff = self.plan(halo, desired)
+        report = ConfigReport(halo.host, diff)
+        if diff.empty:
+            logging.info(f"[info] Config of {halo.host} already up to date")
+            return report
+
+        try:
+            halo.save_params(diff.int_params, diff.string_params)
+        except Exception:
+            # Onbekend wat er is doorgevoerd, volgende keer opnieuw lezen
+            self.forget(halo.host)
+            raise
+        report.saved = True
+        self._update(halo.host, diff)
+
+        if verify:
+            remaining = diff_params(self.current(halo, refresh=True), desired)
+            report.mismatches = {**remaining.int_params, **remaining.string_params}
+            report.verified = remaining.empty
+            if not report.verified:
+                logging.warning(f"[warning] {halo.host} did not take {remaining.keys}")
+        return report
+
+    def _update(self, host, diff: ConfigDiff):
+        with self._lock:
+            params = self._params.get(host)
+            if params is None:
+                return
+            ints = {p.key: p for p in params.int_params}
+            strings = {p.key: p for p in params.string_params}
+            for key, value in diff.int_params.items():
+                if key in ints:
+                    ints[key].value = value
+                else:
+                    params.int_params.append(IntParam(key, value))
+            for key, value in diff.string_params.items():
+                if key in strings:
+                    strings[key].value = value
+                else:
+                    params.string_params.append(StringParam(key, value))
+
+    def rollout(self, desired: Dict[str, Any], hosts: Optional[Iterable[str]] = None, deadline=None,
+                verify=None) -> Dict[str, FleetResult]:
+        """``apply`` on every device of the fleet in parallel"""
+        if self.fleet is None:
+            raise RuntimeError("[error] ConfigManager has no fleet to roll out to")
+        results = self.fleet.run(lambda device: self.apply(device, desired, verify=verify),
+                                 deadline=deadline, hosts=list(hosts) if hosts else None, write=True)
+        changed = sum(1 for r in results.values() if r.ok and r.value.saved)
+        # Over de deadline maar nog bezig: kan alsnog opgeslagen worden, result.wait() geeft de uitkomst
+        running = sum(1 for r in results.values() if r.error is None and r.future is not None)
+        failed = sum(1 for r in results.values() if r.error is not None)
+        logging.info(f"[info] Config rollout: {changed} changed, "
+                     f"{len(results) - changed - running - failed} up to date, {running} still running, "
+                     f"{failed} failed")
+        return results
@@ -1,5 +1,5 @@
-import requests
 import socket
+import requests
 import numpy as np
 import cv2
 import logging
@@ -7,18 +7,185 @@ import json
 from datetime import datetime, timezone, timedelta
 
 import time
-from .models import DeviceInfo, GpsFileReq, HaloResponse, SessionData, SwitchMode
+from typing import Dict
+from .cache import ResponseCache
+from .metrics import METRICS
+from .models import DeviceInfo, GpsFileReq, HaloResponse, SessionData, SwitchMode, SystemParams
+from .policy import RequestPolicy
+from .recorder import StreamRecorder
+from .session import SessionManager
+from .stream import LiveStream, ReadMode, SampledStream, show_stream
+from .transport import HaloTransport
+
+# Commands that make up the handshake, never retried on an auth error
+HANDSHAKE_COMMANDS = ("API_RequestSessionID", "API_RequestCertificate")
+
+
+def stream_host(host) -> str:
+    """Host part of ``host``; a port in it ("127.0.0.1:8080") is the HTTP port, the stream has its own"""
+    return host.rsplit(":", 1)[0] if host.count(":") == 1 else host
+
+
+def syncdate_payload():
+    """Payload for API_SyncDate with the current time"""
+    tz = timezone(timedelta(seconds=7200))  # 7200 sec = +02:00
+
+    return {
+        "imei": "",
+        "format": "dd/MM/yyyy HH:mm:ss",
+        "lang": "en_US",
+        "time_zone": 7200,
+        "date": datetime.now(tz).strftime("%Y%m%d%H%M%S")
+    }
+
+
+def generalsave_payload(event_before_time=0,
+                        speaker_turn=50,
+                        parking_power_mgr=0,
+                        mic_switch="off",
+                        osd_switch="off",
+                        osd_speedswitch="off",
+                        start_sound_switch="off",
+                        scam_vertical_mirror="off",
+                        scam_horizontal_mirror="off",
+                        parking_status="hibernate",
+                        power_guard_value="mid"
+                    ):
+    """Payload for API_GeneralSave"""
+    return {
+        "int_params": [
+            {"key": "event_before_time", "value": event_before_time},         # 0-30
+            {"key": "event_after_time", "value": event_before_time},          # 0-30
+            {"key": "speaker_turn", "value": speaker_turn},              # 0-100
+            {"key": "parking_power_mgr", "value": parking_power_mgr},          # 0,1,2,3,4
+        ],
+        "string_params": [
+            {"key": "mic_switch", "value": mic_switch},
+            {"key": "osd_switch", "value": osd_switch},
+            {"key": "osd_speedswitch", "value": osd_speedswitch},
+            {"key": "start_sound_switch", "value": start_sound_switch},
+            {"key": "scam_vertical_mirror", "value": scam_vertical_mirror},
+            {"key": "scam_horizontal_mirror", "value": scam_horizontal_mirror},
+            {"key": "parking_status", "value": parking_status},   # timelapse | hibernate | normal
+            {"key": "power_guard_value", "value": power_guard_value},      # high | mid | low
+        ]
+    }
+
 
 class HaloPro:
-    def __init__(self, host, username="admin", password="admin"):
+    def __init__(self, host, username="admin", password="admin",
+                 transport: HaloTransport = None, pool_connections=1, pool_maxsize=4,
+                 sessions: SessionManager = None, stream_port=6200, policy: RequestPolicy = None,
+                 cache: ResponseCache = None):
         self.host = host
         self.username = username
         self.password = password
         self.session_id = None
         self.uid = "8f852e60dccd41299e873c62e3ba1ae38750231a"
-        self.stream_url = f'tcp://{self.host}:6200/'
+        self.stream_host = stream_host(host)
+        self.stream_port = stream_port
+        self.stream_url = f'tcp://{self.stream_host}:{stream_port}/'
         self.headers = None
-        self.coockie = None
+        self.cookies = None
+        self.transport = transport or HaloTransport(host, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.sessions = sessions
+        self.policy = policy
+        self.cache = cache
+
+    def _command(self, cmd, payload=None) -> HaloResponse:
+        """Send a command, through the ResponseCache when one is set"""
+        if self.cache is None:
+            return self._send(cmd, payload)
+        if self.cache.cacheable(cmd):
+            return self.cache.get(self.host, cmd, lambda: self._send(cmd, payload))
+        try:
+            return self._send(cmd, payload)
+        finally:
+            # Ook bij een fout: de write kan half zijn doorgevoerd
+            self.cache.written(self.host, cmd)
+
+    def _send(self, cmd, payload=None, reauth=True) -> HaloResponse:
+        """Send a command over the shared transport and check the errcode.
+
+        With a SessionManager, a command rejected because the session expired
+        triggers one fresh handshake and is then sent again.
+        """
+        if METRICS.enabled:
+            halo_resp, errcode, _ = METRICS.observe_command(
+                self.host, cmd, payload, lambda: self._roundtrip(cmd, payload), retry=not reauth)
+        else:
+            halo_resp, errcode, _ = self._roundtrip(cmd, payload)
+
+        if reauth and self._is_auth_error(cmd, errcode):
+            logging.info(f"[info] Session for {self.host} rejected ({errcode}), re-authenticating")
+            self.sessions.invalidate(self.host)
+            self.login(force=True)
+            return self._send(cmd, payload, reauth=False)
+
+        if errcode != 0:
+            raise RuntimeError(f"API returned error code: {errcode}")
+
+        return halo_resp
+
+    def _roundtrip(self, cmd, payload):
+        """One POST: the HaloResponse (None for an HTTP auth error), its errcode and the raw response"""
+        try:
+            if self.policy is not None:
+                response = self.policy.execute(
+                    self.host, cmd, lambda timeout: self.transport.command(cmd, payload, timeout=timeout))
+            else:
+                response = self.transport.command(cmd, payload)
+            halo_resp = HaloResponse.from_json(response.json(), cmd)
+            return halo_resp, halo_resp.errcode, response
+        except requests.HTTPError as e:
+            if e.response is None or not self._is_auth_error(cmd, e.response.status_code):
+                raise
+            return None, e.response.status_code, e.response
+
+    def _is_auth_error(self, cmd, errcode):
+        return (self.sessions is not None
+                and cmd not in HANDSHAKE_COMMANDS
+                and errcode in self.sessions.auth_errcodes)
+
+    def _set_session_id(self, session_id):
+        self.session_id = session_id
+
+        self.headers = {
+            'Content-Type': 'application/json',
+            'SessionID': self.session_id
+        }
+
+        self.cookies = {
+            'Cookie': f'JSESSIONID={self.session_id}'
+        }
+
+        # Headers en cookies eenmalig op de gedeelde sessie zetten
+        self.transport.set_session(self.session_id)
+
+    def login(self, force=False):
+        """Session + certificate handshake, reusing a cached session when possible"""
+        if not force and self.sessions is not None:
+            session_id = self.sessions.get(self.host)
+            if session_id:
+                self._set_session_id(session_id)
+                logging.info(f"[info] Reusing cached session for {self.host}")
+                return
+
+        self.get_session()
+        self.get_certificate()
+
+        if self.sessions is not None:
+            self.sessions.put(self.host, self.session_id)
+
+    def close(self):
+        """Close the pooled connections to the camera"""
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def test(self, timeout=5):
         """Test remote connection"""
@@ -33,39 +200,24 @@ class HaloPro:
     def get_session(self):
         """Initialize a connection and get session_id with retry logic"""
         try:
-            url = f"http://{self.host}/vcam/cmd.cgi?cmd=API_RequestSessionID"
-            headers = {
-                'Content-Type': 'application/json'
-            }
-            response = requests.post(url, headers=headers, data={
+            # Nieuwe sessie: oude SessionID/cookie niet meesturen
+            self.transport.set_session(None)
+
+            # Parse direct naar HaloResponse
+            halo_resp = self._command("API_RequestSessionID", {
                 "vyou": "1",
                 "id": "2"
-            }, timeout=5)
-            response.raise_for_status()
-            
-            # Parse direct naar HaloResponse
-            halo_resp = HaloResponse.from_json(response.json())
-            if halo_resp.errcode != 0:
-                raise RuntimeError(f"[error] API returned error code: {response.json()}")
+            })
             
             # Extract acsession_id uit de geneste data
             if isinstance(halo_resp.data, SessionData):
-                self.session_id = halo_resp.data.acSessionId
-
-                self.headers = {
-                    'Content-Type': 'application/json',
-                    'SessionID': self.session_id
-                }
-
-                self.cookies = {
-                    'Cookie': f'JSESSIONID={self.session_id}'
-                }
-
-                if not self.session_id:
+                if not halo_resp.data.acSessionId:
                     raise RuntimeError("[error] acsession_id not found in response data")
+
+                self._set_session_id(halo_resp.data.acSessionId)
                 
             else:
-                raise RuntimeError(f"[error] API returned invalid object: {response.json()}")
+                raise RuntimeError(f"[error] API returned invalid object: {halo_resp._data_raw}")
             
             return  # Success, exit the function
             
@@ -75,8 +227,6 @@ class HaloPro:
     def get_certificate(self):
         """Request certificate from HaloPro with session_id as cookie"""
         try:
-            url = f"http://{self.host}/vcam/cmd.cgi?cmd=API_RequestCertificate"
-
             payload = json.dumps({
                 "password": self.password,
                 "uid": "8f852e60dccd41299e873c62e3ba1ae38750231a",
@@ -84,13 +234,7 @@ class HaloPro:
                 "user": self.username
             })
 
-            response = requests.post(url, headers=self.headers, cookies=self.cookies, data=payload, timeout=5)
-            response.raise_for_status()
-
-            halo_resp = HaloResponse.from_json(response.json())
-
-            if halo_resp.errcode != 0:
-                raise RuntimeError(f"API returned error code: {halo_resp.errcode}")
+            halo_resp = self._command("API_RequestCertificate", payload)
 
             logging.info(f"[success] Certificaat stored")
             return halo_resp.data
@@ -98,23 +242,18 @@ class HaloPro:
         except Exception as e:
             raise RuntimeError(f"[error] Failed to get certificate: {e}")
         
+    def get_mailbox_response(self) -> HaloResponse:
+        """API_GetMailboxData as a HaloResponse, for pollers that need the raw payload too"""
+        payload = json.dumps({
+            "vyou": "1",
+            "id": "2"
+        })
+        return self._command("API_GetMailboxData", payload)
+
     def get_mailboxdata(self):
         """Check if there is any data ready for us"""
         try:
-            url = f"http://{self.host}/vcam/cmd.cgi?cmd=API_GetMailboxData"
-
-            payload = json.dumps({
-                "vyou": "1",
-                "id": "2"
-            })
-
-            response = requests.post(url, headers=self.headers, cookies=self.cookies, data=payload, timeout=5)
-            response.raise_for_status()
-
-            halo_resp = HaloResponse.from_json(response.json())
-
-            if halo_resp.errcode != 0:
-                raise RuntimeError(f"API returned error code: {halo_resp.errcode}")
+            halo_resp = self.get_mailbox_response()
 
             logging.info(f"[info] Mailboxdata retreived {halo_resp.data}")
             return halo_resp.data
@@ -126,20 +265,12 @@ class HaloPro:
     def set_playbackliveswitch(self, switch: SwitchMode = SwitchMode.LIVE):
         """Change playback live mode"""
         try:
-            url = f"http://{self.host}/vcam/cmd.cgi?cmd=APP_PlaybackLiveSwitch"
-
             payload = json.dumps({
                 "switch": switch.value,
                 "playtime": "0"
             })
 
-            response = requests.post(url, headers=self.headers, cookies=self.cookies, data=payload, timeout=5)
-            response.raise_for_status()
-
-            halo_resp = HaloResponse.from_json(response.json())
-
-            if halo_resp.errcode != 0:
-                raise RuntimeError(f"API returned error code: {halo_resp.errcode}")
+            halo_resp = self._command("APP_PlaybackLiveSwitch", payload)
 
             logging.info(f"[info] Livestream switched {switch}. Stream available at: {self.stream_url}")
             return True
@@ -150,20 +281,12 @@ class HaloPro:
     def set_applivestate(self, switch: SwitchMode = SwitchMode.ON):
         """Change the app's state"""
         try:
-            url = f"http://{self.host}/vcam/cmd.cgi?cmd=API_SetAppLiveState"
-
             payload = json.dumps({
                 "switch": switch.value,
                 "playtime": "0"
             })
 
-            response = requests.post(url, headers=self.headers, cookies=self.cookies, data=payload, timeout=5)
-            response.raise_for_status()
-
-            halo_resp = HaloResponse.from_json(response.json())
-
-            if halo_resp.errcode != 0:
-                raise RuntimeError(f"API returned error code: {halo_resp.errcode}")
+            halo_resp = self._command("API_SetAppLiveState", payload)
 
             logging.info(f"[info] livestate switched {switch}. Stream available at: {self.stream_url}")
             return True
@@ -175,25 +298,9 @@ class HaloPro:
     def syncdate(self):
         """Sync the date & time"""
         try:
-            url = f"http://{self.host}/vcam/cmd.cgi?cmd=API_SyncDate"
-
-            tz = timezone(timedelta(seconds=7200))  # 7200 sec = +02:00
-
-            payload = json.dumps({
-                "imei": "",
-                "format": "dd/MM/yyyy HH:mm:ss",
-                "lang": "en_US",
-                "time_zone": 7200,
-                "date": datetime.now(tz).strftime("%Y%m%d%H%M%S")
-            })
+            payload = json.dumps(syncdate_payload())
 
-            response = requests.post(url, headers=self.headers, cookies=self.cookies, data=payload, timeout=5)
-            response.raise_for_status()
-
-            halo_resp = HaloResponse.from_json(response.json())
-
-            if halo_resp.errcode != 0:
-                raise RuntimeError(f"API returned error code: {halo_resp.errcode}")
+            halo_resp = self._command("API_SyncDate", payload)
 
             logging.info(f"[info] Datetime synced")
             return True
@@ -205,20 +312,12 @@ class HaloPro:
     def get_baseinfo(self) -> DeviceInfo:
         """Get DeviceInfo"""
         try:
-            url = f"http://{self.host}/vcam/cmd.cgi?cmd=API_GetBaseInfo"
-
             payload = json.dumps({
                 "vyou": "1",
                 "id": "2"
             })
 
-            response = requests.post(url, headers=self.headers, cookies=self.cookies, data=payload, timeout=5)
-            response.raise_for_status()
-
-            halo_resp = HaloResponse.from_json(response.json())
-
-            if halo_resp.errcode != 0:
-                raise RuntimeError(f"API returned error code: {halo_resp.errcode}")
+            halo_resp = self._command("API_GetBaseInfo", payload)
 
             if isinstance(halo_resp.data, DeviceInfo):
                 return halo_resp.data
@@ -232,19 +331,11 @@ class HaloPro:
     def superdownload(self, switch: SwitchMode = SwitchMode.OFF):
         """Set SuperDownload"""
         try:
-            url = f"http://{self.host}/vcam/cmd.cgi?cmd=API_SuperDownload"
-
             payload = json.dumps({
                 "switch": switch.value,
             })
 
-            response = requests.post(url, headers=self.headers, cookies=self.cookies, data=payload, timeout=5)
-            response.raise_for_status()
-
-            halo_resp = HaloResponse.from_json(response.json())
-
-            if halo_resp.errcode != 0:
-                raise RuntimeError(f"API returned error code: {halo_resp.errcode}")
+            halo_resp = self._command("API_SuperDownload", payload)
 
             logging.info(f"[info] superdownload switched {switch}")
             return True
@@ -256,20 +347,12 @@ class HaloPro:
         """http://193.168.0.1/vcam/cmd.cgi?cmd=API_GpsFileListReq"""
         """Get GPS file list"""
         try:
-            url = f"http://{self.host}/vcam/cmd.cgi?cmd=API_GpsFileListReq"
-
             payload = json.dumps({
                 "vyou": "1",
                 "id": "2"
             })
 
-            response = requests.post(url, headers=self.headers, cookies=self.cookies, data=payload, timeout=5)
-            response.raise_for_status()
-
-            halo_resp = HaloResponse.from_json(response.json())
-
-            if halo_resp.errcode != 0:
-                raise RuntimeError(f"API returned error code: {halo_resp.errcode}")
+            halo_resp = self._command("API_GpsFileListReq", payload)
 
             logging.info(f"[info] GPS File req downloaded")
             if isinstance(halo_resp.data, GpsFileReq):
@@ -296,60 +379,83 @@ class HaloPro:
                 ):
         """Allow changing of the config"""
         try:
-            url = f"http://{self.host}/vcam/cmd.cgi?cmd=API_GeneralSave"
+            payload = json.dumps(generalsave_payload(
+                event_before_time=event_before_time,
+                speaker_turn=speaker_turn,
+                parking_power_mgr=parking_power_mgr,
+                mic_switch=mic_switch,
+                osd_switch=osd_switch,
+                osd_speedswitch=osd_speedswitch,
+                start_sound_switch=start_sound_switch,
+                scam_vertical_mirror=scam_vertical_mirror,
+                scam_horizontal_mirror=scam_horizontal_mirror,
+                parking_status=parking_status,
+                power_guard_value=power_guard_value,
+            ))
+
+            halo_resp = self._command("API_GeneralSave", payload)
+
+            logging.info(f"[info] Config changed")
+            return True
+
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to set config: {e}")
+
+    def get_params(self, command="API_GeneralQuery") -> SystemParams:
+        """Read the current settings as SystemParams.
 
+        The query command is not documented, pass ``command`` if your firmware uses another one.
+        """
+        try:
             payload = json.dumps({
-                "int_params": [
-                    {"key": "event_before_time", "value": event_before_time},         # 0-30
-                    {"key": "event_after_time", "value": event_before_time},          # 0-30
-                    {"key": "speaker_turn", "value": speaker_turn},              # 0-100
-                    {"key": "parking_power_mgr", "value": parking_power_mgr},          # 0,1,2,3,4
-                ],
-                "string_params": [
-                    {"key": "mic_switch", "value": mic_switch},
-                    {"key": "osd_switch", "value": osd_switch},
-                    {"key": "osd_speedswitch", "value": osd_speedswitch},
-                    {"key": "start_sound_switch", "value": start_sound_switch},
-                    {"key": "scam_vertical_mirror", "value": scam_vertical_mirror},
-                    {"key": "scam_horizontal_mirror", "value": scam_horizontal_mirror},
-                    {"key": "parking_status", "value": parking_status},   # timelapse | hibernate | normal
-                    {"key": "power_guard_value", "value": power_guard_value},      # high | mid | low
-                ]
+                "vyou": "1",
+                "id": "2"
             })
 
-            response = requests.post(url, headers=self.headers, cookies=self.cookies, data=payload, timeout=5)
-            response.raise_for_status()
+            halo_resp = self._command(command, payload)
 
-            print(response.json())
+            if isinstance(halo_resp.data, SystemParams):
+                return halo_resp.data
 
-            halo_resp = HaloResponse.from_json(response.json())
+            raise RuntimeError(f'Response not of correct type')
 
-            if halo_resp.errcode != 0:
-                raise RuntimeError(f"API returned error code: {halo_resp.errcode}")
+        except Exception as e:
+            raise RuntimeError(f"[error] Failed to get config: {e}")
 
-            logging.info(f"[info] Config changed")
+    def save_params(self, int_params: Dict[str, int] = None, string_params: Dict[str, str] = None):
+        """API_GeneralSave with only the given keys, other settings stay as they are"""
+        try:
+            payload = json.dumps({
+                "int_params": [{"key": k, "value": v} for k, v in (int_params or {}).items()],
+                "string_params": [{"key": k, "value": v} for k, v in (string_params or {}).items()],
+            })
+
+            halo_resp = self._command("API_GeneralSave", payload)
+
+            logging.info(f"[info] Config changed: {sorted({**(int_params or {}), **(string_params or {})})}")
             return True
 
         except Exception as e:
             raise RuntimeError(f"[error] Failed to set config: {e}")
 
-    def visualize_stream(self):
-        """Opens CV2 stream to the dashcam"""
-        try:
-            cap = cv2.VideoCapture(self.stream_url)
-            cap.set(cv2.CAP_PROP_FPS, 30)
+    def live_stream(self, mode=ReadMode.LATEST, buffer_size=8, sample_fps=None, **kwargs) -> LiveStream:
+        """Threaded frame grabber on the live stream, call ``start()`` or use it as a context manager.
 
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    logging.info("⚠️ Frame niet ontvangen, probeer opnieuw...")
-                    break
+        With ``sample_fps`` only about that many frames per second are decoded, see SampledStream.
+        """
+        if sample_fps is not None:
+            return SampledStream(self.stream_url, sample_fps=sample_fps, mode=mode, buffer_size=buffer_size, **kwargs)
+        return LiveStream(self.stream_url, mode=mode, buffer_size=buffer_size, **kwargs)
 
-                cv2.imshow('Livestream', frame)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+    def recorder(self, directory, **kwargs) -> StreamRecorder:
+        """Decode-free recorder of the live stream into segment files, see StreamRecorder"""
+        kwargs.setdefault("port", self.stream_port)
+        return StreamRecorder(self.stream_host, directory, **kwargs)
 
-            cap.release()
-            cv2.destroyAllWindows()
+    def visualize_stream(self):
+        """Opens CV2 stream to the dashcam"""
+        try:
+            with self.live_stream() as stream:
+                show_stream(stream)
         except Exception as e:
             raise RuntimeError(f"[error] Failed to open VLC: {e}")
\ No newline at end of file
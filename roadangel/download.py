@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import requests
+
+from .models import FileEntry
+
+CHUNK_SIZE = 1024 * 1024
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-\d+/(\d+|\*)$")
+_UNSATISFIED_RANGE = re.compile(r"bytes \*/(\d+)$")
+
+
+@dataclass
+class DownloadResult:
+    name: str
+    path: Optional[Path]
+    bytes: int = 0            # bytes transferred in this run
+    resumed_from: int = 0
+    elapsed: float = 0.0
+    skipped: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def rate(self) -> float:
+        """Bytes per second"""
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+
+class Downloader:
+    """Pulls files from the camera's SD card to a local directory.
+
+    Files are fetched by ``workers`` threads over the HaloPro's pooled
+    transport and streamed to ``<name>.part`` in ``chunk_size`` blocks. A
+    manifest (``.manifest.json``) remembers which files are complete, so a
+    new run skips them and continues a ``.part`` file with a Range request
+    instead of starting over::
+
+        downloader = Downloader(halo, "/data/halo-front", workers=4)
+        results = downloader.download(halo.gpsfilelistreq().file)
+
+    Keep ``workers`` at or below the transport's ``pool_maxsize``. The
+    manifest is written at most every ``save_interval`` seconds during a
+    run and once at the end of it.
+    """
+
+    def __init__(self, halo, directory, workers=4, chunk_size=CHUNK_SIZE, timeout=(5, 30),
+                 progress: Optional[Callable[[str, int, Optional[int]], None]] = None, save_interval=2.0):
+        self.halo = halo
+        self.directory = Path(directory)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.progress = progress
+        self.save_interval = save_interval
+
+        self.manifest_path = self.directory / ".manifest.json"
+        self.manifest: Dict[str, Dict] = self._load_manifest()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        try:
+            return json.loads(self.manifest_path.read_text())
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logging.warning(f"[warning] Ignoring corrupt manifest {self.manifest_path}: {e}")
+            return {}
+
+    def _save_manifest(self):
+        # Aangeroepen met self._lock vast
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.manifest, indent=1))
+        os.replace(tmp, self.manifest_path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _update(self, name, **fields):
+        # Niet bij elke update het hele manifest herschrijven
+        with self._lock:
+            self.manifest.setdefault(name, {}).update(fields)
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self._save_manifest()
+
+    def flush(self):
+        """Write pending manifest changes"""
+        with self._lock:
+            if self._dirty:
+                self._save_manifest()
+
+    def local_path(self, name) -> Path:
+        """Where ``name`` is stored; raises ValueError for names that point outside the directory"""
+        root = self.directory.resolve()
+        path = (root / name.lstrip("/")).resolve()
+        if path == root or root not in path.parents:
+            raise ValueError(f"refusing to write {name!r} outside {self.directory}")
+        return path
+
+    def is_complete(self, entry: FileEntry) -> bool:
+        """Downloaded before and not changed on the camera since"""
+        known = self.manifest.get(entry.name)
+        return bool(known and known.get("done") and known.get("endtime") == entry.endtime
+                    and self.local_path(entry.name).exists())
+
+    def fetch(self, item: Union[FileEntry, str]) -> DownloadResult:
+        """Download one file, resuming a partial download when possible"""
+        try:
+            return self._fetch(item)
+        finally:
+            self.flush()
+
+    def _fetch(self, item: Union[FileEntry, str]) -> DownloadResult:
+        entry = item if isinstance(item, FileEntry) else None
+        name = item.name if entry else item
+        result = DownloadResult(name, None)
+        start = time.monotonic()
+
+        try:
+            path = result.path = self.local_path(name)
+            part = path.with_name(path.name + ".part")
+            if entry is not None and self.is_complete(entry):
+                result.skipped = True
+                return result
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            known = self.manifest.get(name, {})
+            offset = part.stat().st_size if part.exists() else 0
+            if offset and entry is not None and known.get("starttime") not in (None, entry.starttime):
+                # Ander bestand met dezelfde naam (SD-kaart geformatteerd), opnieuw beginnen
+                offset = 0
+
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            r = self.halo.transport.get(name, timeout=self.timeout, headers=headers, stream=True)
+            if offset and r.status_code == 416 and _unsatisfied_size(r) != offset:
+                # 416 om een andere reden dan een complete .part: weggooien en opnieuw beginnen
+                r.close()
+                part.unlink()
+                offset = 0
+                r = self.halo.transport.get(name, timeout=self.timeout, stream=True)
+
+            with r:
+                if offset and r.status_code == 416:
+                    # .part is al compleet, Content-Range bevestigt de grootte
+                    self._update(name, size=offset, done=False,
+                                 starttime=entry.starttime if entry else None,
+                                 endtime=entry.endtime if entry else None)
+                else:
+                    r.raise_for_status()
+                    if offset and r.status_code == 206:
+                        mode = "ab"
+                        first, total = _content_range(r, offset)
+                        if first != offset:
+                            # Verkeerd stuk: niet aan de .part plakken, volgende keer opnieuw
+                            part.unlink()
+                            raise ValueError(f"asked for bytes from {offset}, got them from {first}")
+                    else:
+                        # Server negeert Range: vanaf het begin
+                        mode, offset = "wb", 0
+                        total = _content_range(r, 0)[1]
+
+                    result.resumed_from = offset
+                    self._update(name, size=total, done=False,
+                                 starttime=entry.starttime if entry else None,
+                                 endtime=entry.endtime if entry else None)
+
+                    done = offset
+                    with open(part, mode) as f:
+                        for chunk in r.iter_content(chunk_size=self.chunk_size):
+                            f.write(chunk)
+                            done += len(chunk)
+                            result.bytes += len(chunk)
+                            if self.progress is not None:
+                                self.progress(name, done, total)
+
+                    if total is not None and done < total:
+                        raise IOError(f"connection closed at {done} of {total} bytes")
+
+            os.replace(part, path)
+            self._update(name, size=path.stat().st_size, done=True)
+            logging.info(f"[success] Downloaded {name} ({result.bytes} bytes, resumed from {result.resumed_from})")
+        except (requests.RequestException, OSError, ValueError) as e:
+            result.error = str(e)
+            logging.warning(f"[warning] Failed to download {name}: {e}")
+
+        result.elapsed = time.monotonic() - start
+        return result
+
+    def download(self, items: Iterable[Union[FileEntry, str]], types: Optional[Iterable[str]] = None) -> List[DownloadResult]:
+        """Download many files in parallel, optionally only FileEntry types in ``types``"""
+        items = list(items)
+        if types is not None:
+            types = set(types)
+            items = [i for i in items if not isinstance(i, FileEntry) or i.type in types]
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="download") as pool:
+                return list(pool.map(self._fetch, items))
+        finally:
+            self.flush()
+
+
+def _unsatisfied_size(r: requests.Response) -> Optional[int]:
+    """File size from the ``bytes */<size>`` Content-Range of a 416, None when absent or malformed"""
+    match = _UNSATISFIED_RANGE.match(r.headers.get("Content-Range", "").strip())
+    return int(match.group(1)) if match else None
+
+
+def _content_range(r: requests.Response, offset: int) -> Tuple[int, Optional[int]]:
+    """First byte and full file size from Content-Range, else ``offset`` and offset + Content-Length.
+
+    Raises ValueError for a header that does not parse.
+    """
+    content_range = r.headers.get("Content-Range", "")
+    if content_range:
+        match = _CONTENT_RANGE.match(content_range.strip())
+        if match is None:
+            raise ValueError(f"malformed Content-Range {content_range!r}")
+        first, total = match.groups()
+        return int(first), None if total == "*" else int(total)
+    length = r.headers.get("Content-Length")
+    return offset, offset + int(length) if length is not None else None
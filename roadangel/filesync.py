@@ -0,0 +1,193 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .models import FileEntry
+from .session import default_cache_dir
+
+
+class ChangeKind:
+    ADDED = "added"
+    REMOVED = "removed"
+    GROWN = "grown"  # zelfde bestand, endtime verschoven (wordt nog geschreven)
+
+
+@dataclass(slots=True)
+class FileChange:
+    kind: str
+    entry: FileEntry
+    previous: Optional[FileEntry] = None
+
+
+class FileListSnapshot:
+    """Indexed copy of a device's file list.
+
+    Entries are keyed by name, with secondary indexes on ``index``, on
+    ``type`` and on ``starttime`` (kept sorted, starttimes sort as text).
+    ``version`` goes up with every modification, also one that is not
+    reported as a change (a new index or parentfile).
+    """
+
+    def __init__(self, entries: Iterable[FileEntry] = ()):
+        self.entries: Dict[str, FileEntry] = {}
+        self._by_index: Dict[str, str] = {}
+        self._by_type: Dict[str, Set[str]] = {}
+        self._by_start: List[Tuple[str, str]] = []
+        self.version = 0
+        for entry in entries:
+            self._add(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[FileEntry]:
+        return iter(self.entries.values())
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def _add(self, entry: FileEntry):
+        self.version += 1
+        self.entries[entry.name] = entry
+        self._by_index[entry.index] = entry.name
+        self._by_type.setdefault(entry.type, set()).add(entry.name)
+        bisect.insort(self._by_start, (entry.starttime, entry.name))
+
+    def _remove(self, entry: FileEntry):
+        self.version += 1
+        del self.entries[entry.name]
+        if self._by_index.get(entry.index) == entry.name:
+            del self._by_index[entry.index]
+        self._by_type.get(entry.type, set()).discard(entry.name)
+        i = bisect.bisect_left(self._by_start, (entry.starttime, entry.name))
+        if i < len(self._by_start) and self._by_start[i] == (entry.starttime, entry.name):
+            del self._by_start[i]
+
+    def get(self, name) -> Optional[FileEntry]:
+        return self.entries.get(name)
+
+    def by_index(self, index) -> Optional[FileEntry]:
+        name = self._by_index.get(str(index))
+        return self.entries.get(name) if name else None
+
+    def of_type(self, type) -> List[FileEntry]:
+        return sorted((self.entries[n] for n in self._by_type.get(type, ())), key=lambda e: e.starttime)
+
+    def between(self, start, end, type=None) -> List[FileEntry]:
+        """Entries with ``start <= starttime < end``"""
+        lo = bisect.bisect_left(self._by_start, (start, ""))
+        hi = bisect.bisect_left(self._by_start, (end, ""))
+        entries = (self.entries[name] for _, name in self._by_start[lo:hi])
+        return [e for e in entries if type is None or e.type == type]
+
+    def latest(self, type=None) -> Optional[FileEntry]:
+        """Entry with the highest starttime, optionally of one type"""
+        for _, name in reversed(self._by_start):
+            entry = self.entries[name]
+            if type is None or entry.type == type:
+                return entry
+        return None
+
+    def apply(self, entries: Iterable[FileEntry]) -> List[FileChange]:
+        """Replace the snapshot by a new listing and return what changed"""
+        changes = []
+        seen = set()
+        for entry in entries:
+            seen.add(entry.name)
+            old = self.entries.get(entry.name)
+            if old is None:
+                changes.append(FileChange(ChangeKind.ADDED, entry))
+                self._add(entry)
+            elif old != entry:
+                if old.starttime != entry.starttime:
+                    # Andere opname met dezelfde naam
+                    changes.append(FileChange(ChangeKind.REMOVED, old))
+                    changes.append(FileChange(ChangeKind.ADDED, entry))
+                elif old.endtime != entry.endtime:
+                    changes.append(FileChange(ChangeKind.GROWN, entry, old))
+                # Alleen index of parentfile verschoven: bijwerken zonder event
+                self._remove(old)
+                self._add(entry)
+
+        for name in [n for n in self.entries if n not in seen]:
+            old = self.entries[name]
+            changes.append(FileChange(ChangeKind.REMOVED, old))
+            self._remove(old)
+        return changes
+
+
+class FileListSync:
+    """Keeps a persistent snapshot of a device's file list and reports only changes.
+
+    The snapshot is stored as JSON per host (in the roadangel cache
+    directory by default), so a restarted process does not treat the whole
+    SD card as new::
+
+        sync = FileListSync(halo)
+        for change in sync.sync():
+            if change.kind != ChangeKind.REMOVED and change.entry.type == "49":
+                store.ingest(gps, change.entry)
+    """
+
+    def __init__(self, halo, path=None, persist=True):
+        self.halo = halo
+        if path:
+            self.path = Path(path)
+        elif persist:
+            host = halo.host.replace(":", "_").replace("/", "_")
+            self.path = default_cache_dir() / "filelists" / f"{host}.json"
+        else:
+            self.path = None
+        self.snapshot = self._load()
+        self.last_sync: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> FileListSnapshot:
+        if self.path is None:
+            return FileListSnapshot()
+        try:
+            raw = json.loads(self.path.read_text())
+            return FileListSnapshot(FileEntry(**e) for e in raw["entries"])
+        except FileNotFoundError:
+            return FileListSnapshot()
+        except (ValueError, TypeError, KeyError) as e:
+            logging.warning(f"[warning] Ignoring corrupt file list snapshot {self.path}: {e}")
+            return FileListSnapshot()
+
+    def _save(self):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"entries": [asdict(e) for e in self.snapshot]}))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning(f"[warning] Could not write file list snapshot {self.path}: {e}")
+
+    def apply(self, entries: Iterable[FileEntry]) -> List[FileChange]:
+        """Diff a listing obtained elsewhere against the snapshot"""
+        with self._lock:
+            version = self.snapshot.version
+            changes = self.snapshot.apply(entries)
+            self.last_sync = time.time()
+            # Ook opslaan als alleen index of parentfile veranderde, anders is dat na een herstart weg
+            if self.snapshot.version != version:
+                self._save()
+            return changes
+
+    def sync(self) -> List[FileChange]:
+        """Request the device's file list and return the added, removed and grown entries"""
+        filereq = self.halo.gpsfilelistreq()
+        return self.apply(filereq.file if filereq else [])
+
+    def reset(self):
+        with self._lock:
+            self.snapshot = FileListSnapshot()
+            self._save()
@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+from .dashcam import HaloPro
+
+
+# Commando's die niets op de camera veranderen; de rest telt als write
+READ_COMMANDS = frozenset({
+    "test", "get_session", "get_certificate", "get_mailbox_response", "get_mailboxdata",
+    "get_baseinfo", "gpsfilelistreq", "get_params",
+})
+
+
+@dataclass
+class FleetResult:
+    host: str
+    value: Any = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+    started: bool = True                # False: never got a worker, cancelled
+    future: Optional[Future] = None     # set when the call ran past its deadline
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.future is None
+
+    @property
+    def running(self) -> bool:
+        """Past its deadline but not finished, a write may still go through"""
+        return self.future is not None and not self.future.done()
+
+    def wait(self, timeout=None) -> "FleetResult":
+        """The final result of a call that ran past its deadline, raises TimeoutError while it still runs"""
+        if self.future is None:
+            return self
+        return self.future.result(timeout)
+
+
+class HaloFleet:
+    """Run HaloPro commands on many cameras in parallel.
+
+    Commands are fanned out over a bounded thread pool. Every call gets
+    ``deadline`` seconds from the moment a worker starts it; a device that
+    has not answered by then no longer holds up the sweep. A late read is
+    reported with a ``TimeoutError``, a late write only as ``running``
+    because it may still go through. Commands that never got a worker are
+    cancelled and reported with ``started=False``::
+
+        fleet = HaloFleet([HaloPro(h) for h in hosts], max_workers=16, deadline=8)
+        fleet.map("get_session")
+        results = fleet.map("get_baseinfo")
+        fleet.syncdate()
+    """
+
+    def __init__(self, devices: Iterable[HaloPro] = (), max_workers=16, deadline=10.0):
+        self.devices: Dict[str, HaloPro] = {}
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self._executor = None
+        self._lock = threading.Lock()
+
+        for device in devices:
+            self.add(device)
+
+    def add(self, device: HaloPro):
+        self.devices[device.host] = device
+
+    def remove(self, host: str) -> Optional[HaloPro]:
+        return self.devices.pop(host, None)
+
+    @property
+    def hosts(self):
+        return list(self.devices)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices.values())
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="halofleet")
+            return self._executor
+
+    def run(self, func, deadline=None, hosts=None, write=False) -> Dict[str, FleetResult]:
+        """Call ``func(device)`` for every device and collect the results per host.
+
+        A call that is not done ``deadline`` seconds after it started is
+        returned with its ``future``; with ``write`` it gets no error. Calls
+        still queued once nothing of this batch is running and ``deadline``
+        has passed since the batch started are cancelled: a worker that a
+        late call keeps holding would otherwise leave them waiting forever.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        devices = [self.devices[h] for h in (hosts or self.devices)]
+        executor = self._get_executor()
+
+        started: Dict[str, float] = {}
+        results: Dict[str, FleetResult] = {}
+
+        def call(device):
+            started[device.host] = time.monotonic()
+            try:
+                value = func(device)
+            except Exception as e:
+                return FleetResult(device.host, error=e, elapsed=time.monotonic() - started[device.host])
+            return FleetResult(device.host, value=value, elapsed=time.monotonic() - started[device.host])
+
+        batch_start = time.monotonic()
+        pending = {executor.submit(call, device): device.host for device in devices}
+        while pending:
+            now = time.monotonic()
+            # Gestart maar started nog niet gezet: telt als net begonnen
+            running = {f: started.get(h, now) + deadline for f, h in pending.items() if f.running()}
+            wake = min(running.values()) if running else batch_start + deadline
+            done, _ = wait(pending, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+
+            now = time.monotonic()
+            for future, host in list(pending.items()):
+                if future.running() and now - started.get(host, now) >= deadline:
+                    del pending[future]
+                    error = None if write else TimeoutError(f"{host} did not answer within the {deadline}s deadline")
+                    results[host] = FleetResult(host, error=error, elapsed=now - started.get(host, now), future=future)
+                    logging.warning(f"[warning] {host} missed the {deadline}s deadline")
+
+            if now - batch_start >= deadline and not any(f.running() for f in pending):
+                for future, host in list(pending.items()):
+                    # Niet gestart: uit de wachtrij halen zodat het de volgende batch niet ophoudt
+                    if future.cancel():
+                        del pending[future]
+                        error = TimeoutError(f"{host} did not get a worker within the {deadline}s deadline")
+                        results[host] = FleetResult(host, error=error, started=False)
+                        logging.warning(f"[warning] {host} was not started, all workers busy")
+
+        return {device.host: results[device.host] for device in devices}
+
+    def map(self, command: str, *args, deadline=None, hosts=None, **kwargs) -> Dict[str, FleetResult]:
+        """Call ``device.<command>(*args, **kwargs)`` on every device"""
+        if not callable(getattr(HaloPro, command, None)):
+            raise AttributeError(f"HaloPro has no command {command!r}")
+
+        return self.run(lambda device: getattr(device, command)(*args, **kwargs),
+                        deadline=deadline, hosts=hosts, write=command not in READ_COMMANDS)
+
+    def __getattr__(self, name):
+        # fleet.syncdate() == fleet.map("syncdate")
+        if not name.startswith("_") and callable(getattr(HaloPro, name, None)):
+            return lambda *args, **kwargs: self.map(name, *args, **kwargs)
+        raise AttributeError(name)
+
+    def close(self):
+        """Stop the worker pool and close every device's transport"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+        for device in self.devices.values():
+            device.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
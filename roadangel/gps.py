@@ -1,16 +1,46 @@
-import requests
 import re
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, Dict
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Union
 from .dashcam import HaloPro
+from .filesync import FileListSync
+from .models import FileEntry
+from .nmea import GpsTrack, parse_rmc
+from .session import SessionManager
+
+
+@dataclass
+class GpxTail:
+    """Read position in a growing .gpx file"""
+    offset: int = 0
+    carry: bytes = b""  # onvolledige laatste regel van de vorige poll
+
 
 class GPSFetcher:
-    def __init__(self, host: str):
-        self.host = host
-        self.dashcam = HaloPro(host)
-        self.dashcam.get_session()
-        self.dashcam.get_certificate()
+    def __init__(self, dashcam: Union[HaloPro, str], sessions: Optional[SessionManager] = None, tail=False,
+                 filelist: Optional[FileListSync] = None):
+        """
+        dashcam: an (authenticated) HaloPro to reuse, or a host to connect to.
+        sessions: session cache used when a new HaloPro has to be created.
+        tail: only download the bytes added to the current .gpx since the
+              previous poll (HTTP Range), instead of the whole file.
+        filelist: FileListSync whose indexed snapshot is used to find the
+              newest .gpx, instead of scanning the whole list.
+        """
+        if isinstance(dashcam, HaloPro):
+            self.dashcam = dashcam
+        else:
+            self.dashcam = HaloPro(dashcam, sessions=sessions)
+
+        # Alleen een handshake als de camera nog geen sessie heeft
+        if not self.dashcam.session_id:
+            self.dashcam.login()
+
+        self.host = self.dashcam.host
+        self.tail = tail
+        self.filelist = filelist
+        self._tails: Dict[str, GpxTail] = {}
         self._last_known_location = None  # opslaan laatste locatie dict
 
     def _parse_timestamp(self, ts_str: str) -> Optional[str]:
@@ -59,6 +89,57 @@ class GPSFetcher:
             "longitude": longitude,
 
         }
+    def _read_new_lines(self, name: str, retry=True) -> List[str]:
+        """Complete lines appended to ``name`` since the previous call"""
+        # Alleen het bestand dat nu geschreven wordt bijhouden
+        tail = self._tails.get(name) or GpxTail()
+        self._tails = {name: tail}
+
+        headers = {"Range": f"bytes={tail.offset}-"} if tail.offset else {}
+        r = self.dashcam.transport.get(name, headers=headers)
+
+        if r.status_code == 416:
+            size = r.headers.get("Content-Range", "").rpartition("/")[2]
+            if retry and size.isdigit() and int(size) < tail.offset:
+                # Bestand is korter dan onze offset (opnieuw begonnen), vanaf het begin lezen
+                logging.debug(f'{name} shrank to {size} bytes, restarting tail')
+                tail.offset, tail.carry = 0, b""
+                return self._read_new_lines(name, retry=False)
+            # Niets nieuws sinds de vorige poll
+            return []
+        r.raise_for_status()
+
+        body = r.content
+        content_range = r.headers.get("Content-Range", "")
+        if r.status_code == 206:
+            if not content_range.startswith(f"bytes {tail.offset}-"):
+                # Ander stuk dan gevraagd: tail opnieuw beginnen en het bestand opnieuw opvragen
+                logging.debug(f'{name} answered {content_range!r} for offset {tail.offset}, restarting tail')
+                tail.offset, tail.carry = 0, b""
+                return self._read_new_lines(name, retry=False) if retry else []
+            data = body
+        elif len(body) >= tail.offset:
+            # Server negeert Range: volledig bestand, alleen het nieuwe deel gebruiken
+            data = body[tail.offset:]
+        else:
+            # Bestand is korter dan onze offset, opnieuw beginnen
+            logging.debug(f'{name} shrank, restarting tail')
+            tail.offset, tail.carry, data = 0, b"", body
+
+        tail.offset += len(data)
+        buf = tail.carry + data
+        end = buf.rfind(b"\n") + 1
+        tail.carry = buf[end:]
+
+        return buf[:end].decode("ascii", errors="replace").splitlines()
+
+    def fetch_track(self, item: Union[FileEntry, str]) -> GpsTrack:
+        """Download a whole .gpx file and parse all fixes in one go"""
+        name = item.name if isinstance(item, FileEntry) else item
+        r = self.dashcam.transport.get(name)
+        r.raise_for_status()
+        return parse_rmc(r.content)
+
     def fetch_latest_gps(self) -> Optional[Dict]:
         """
         host: "193.168.0.1"
@@ -67,13 +148,17 @@ class GPSFetcher:
         # We kunnen niet zomaar GPS ophalen, we moeten eerst een request doen naar API_GpsFileListReq, en daar de laatste uithalen, die mogen we downloaden.
         # 20250723145230_0060.gpx
         
-        filereq = self.dashcam.gpsfilelistreq()
+        if self.filelist is not None:
+            self.filelist.sync()
+            item = self.filelist.snapshot.latest("49")
+        else:
+            filereq = self.dashcam.gpsfilelistreq()
 
-        if not filereq:
-            logging.debug(f'No gps data available')
-            return
-        
-        item = next((f for f in reversed(filereq.file) if f.type == "49"), None)
+            if not filereq:
+                logging.debug(f'No gps data available')
+                return
+
+            item = next((f for f in reversed(filereq.file) if f.type == "49"), None)
         
         if not item:
             logging.debug(f'No gps data available')
@@ -82,9 +167,12 @@ class GPSFetcher:
         url = f"http://{self.host}/{item.name}"
         lines = []
         try:
-            r = requests.get(url, timeout=5)
-            r.raise_for_status()
-            lines = r.text.splitlines()
+            if self.tail:
+                lines = self._read_new_lines(item.name)
+            else:
+                r = self.dashcam.transport.get(item.name)
+                r.raise_for_status()
+                lines = r.text.splitlines()
         except Exception:
             logging.warning(f'Failed getting .gpx for {url}')
 
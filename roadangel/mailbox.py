@@ -0,0 +1,300 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .models import HaloResponse
+
+# callback(host, data, response)
+MailboxCallback = Callable[[str, Any, HaloResponse], Any]
+
+
+@dataclass
+class MailboxStats:
+    host: str
+    polls: int = 0
+    messages: int = 0      # dispatched to callbacks
+    duplicates: int = 0    # merged into an earlier message
+    errors: int = 0
+    interval: float = 0.0  # current poll interval
+
+
+@dataclass
+class _Device:
+    host: str
+    device: Any
+    interval: float
+    due: float = 0.0
+    seen: Dict[str, float] = field(default_factory=dict)
+    stats: MailboxStats = None
+
+
+def _is_empty(response: HaloResponse) -> bool:
+    return response.raw in (None, "", {}, [])
+
+
+def _message_key(response: HaloResponse) -> str:
+    try:
+        return json.dumps(response.raw, sort_keys=True)
+    except (TypeError, ValueError):
+        return repr(response.raw)
+
+
+class _MailboxSchedule:
+    """Interval, dedupe and dispatch logic shared by the threaded and asyncio pollers.
+
+    After a new message a device is polled every ``min_interval`` seconds;
+    every idle poll (empty or duplicate) multiplies its interval by
+    ``decay``, up to ``max_interval``. A message equal to one seen in the
+    last ``dedupe_window`` seconds is counted as a duplicate and not
+    dispatched.
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=30.0, decay=1.5, dedupe_window=60.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.decay = decay
+        self.dedupe_window = dedupe_window
+        self._devices: Dict[str, _Device] = {}
+        self._callbacks: List[Tuple[Optional[type], MailboxCallback]] = []
+        self._heap: List[Tuple[float, int, _Device]] = []
+        self._counter = itertools.count()
+
+    def on(self, callback: MailboxCallback, model: Optional[type] = None):
+        """Register ``callback(host, data, response)``, optionally only for payloads of ``model``"""
+        self._callbacks.append((model, callback))
+        return callback
+
+    def _add(self, device):
+        host = device.host
+        entry = _Device(host, device, self.min_interval, due=time.monotonic(),
+                        stats=MailboxStats(host, interval=self.min_interval))
+        self._devices[host] = entry
+        heapq.heappush(self._heap, (entry.due, next(self._counter), entry))
+        return entry
+
+    def _remove(self, host):
+        # Staat nog in de heap, wordt daar overgeslagen
+        self._devices.pop(host, None)
+
+    def _current(self, entry: _Device) -> bool:
+        return self._devices.get(entry.host) is entry
+
+    def _next_due(self) -> Optional[float]:
+        while self._heap and not self._current(self._heap[0][2]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _pop_due(self, now) -> List[_Device]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, entry = heapq.heappop(self._heap)
+            if self._current(entry):
+                due.append(entry)
+        return due
+
+    def _reschedule(self, entry: _Device, active: bool):
+        if active:
+            entry.interval = self.min_interval
+        else:
+            entry.interval = min(entry.interval * self.decay, self.max_interval)
+        entry.stats.interval = entry.interval
+        entry.due = time.monotonic() + entry.interval
+        if self._current(entry):
+            heapq.heappush(self._heap, (entry.due, next(self._counter), entry))
+
+    def _accept(self, entry: _Device, response: HaloResponse) -> bool:
+        """True for a new, non-empty message"""
+        entry.stats.polls += 1
+        if _is_empty(response):
+            return False
+
+        now = time.monotonic()
+        entry.seen = {k: t for k, t in entry.seen.items() if now - t <= self.dedupe_window}
+        key = _message_key(response)
+        if key in entry.seen:
+            entry.stats.duplicates += 1
+            entry.seen[key] = now
+            return False
+        entry.seen[key] = now
+        entry.stats.messages += 1
+        return True
+
+    def _matching(self, response: HaloResponse) -> List[MailboxCallback]:
+        data = response.data
+        return [cb for model, cb in self._callbacks if model is None or isinstance(data, model)]
+
+    @property
+    def stats(self) -> List[MailboxStats]:
+        return [entry.stats for entry in self._devices.values()]
+
+
+class MailboxPoller(_MailboxSchedule):
+    """Polls ``API_GetMailboxData`` of many HaloPro's from one scheduler thread.
+
+    Polls run on a small thread pool, callbacks run on those threads::
+
+        poller = MailboxPoller(min_interval=0.5, max_interval=30)
+        poller.on(lambda host, data, resp: print(host, data))
+        poller.on(handle_acc, model=AccStatus)
+        poller.add(halo)
+        poller.start()
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=30.0, decay=1.5, dedupe_window=60.0, workers=4):
+        super().__init__(min_interval, max_interval, decay, dedupe_window)
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def add(self, halo):
+        with self._cond:
+            self._add(halo)
+            self._cond.notify()
+
+    def remove(self, host):
+        with self._cond:
+            self._remove(host)
+
+    def start(self) -> "MailboxPoller":
+        if self._thread is None:
+            self._stop.clear()
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mailbox")
+            self._thread = threading.Thread(target=self._run, name="mailbox-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                due = self._next_due()
+                now = time.monotonic()
+                if due is None or due > now:
+                    self._cond.wait(None if due is None else due - now)
+                    continue
+                entries = self._pop_due(now)
+            for entry in entries:
+                self._pool.submit(self._poll, entry)
+
+    def _poll(self, entry: _Device):
+        active = False
+        try:
+            response = entry.device.get_mailbox_response()
+            active = self._accept(entry, response)
+            if active:
+                for callback in self._matching(response):
+                    try:
+                        callback(entry.host, response.data, response)
+                    except Exception as e:
+                        logging.warning(f"[warning] Mailbox callback failed: {e}")
+        except Exception as e:
+            entry.stats.errors += 1
+            logging.warning(f"[warning] Mailbox poll of {entry.host} failed: {e}")
+        finally:
+            with self._cond:
+                self._reschedule(entry, active)
+                self._cond.notify()
+
+
+class AsyncMailboxPoller(_MailboxSchedule):
+    """asyncio variant of MailboxPoller for AsyncHaloPro devices.
+
+    Callbacks may be plain functions or coroutines::
+
+        poller = AsyncMailboxPoller()
+        poller.on(handler)
+        poller.add(cam)
+        task = asyncio.create_task(poller.run())
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=30.0, decay=1.5, dedupe_window=60.0, concurrency=8):
+        super().__init__(min_interval, max_interval, decay, dedupe_window)
+        self.concurrency = concurrency
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopped = False
+
+    def add(self, halo):
+        self._add(halo)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def remove(self, host):
+        self._remove(host)
+
+    def stop(self):
+        self._stopped = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self):
+        """Run the scheduler until ``stop()`` or cancellation"""
+        self._wakeup = asyncio.Event()
+        self._stopped = False
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        try:
+            while not self._stopped:
+                due = self._next_due()
+                now = time.monotonic()
+                if due is None or due > now:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), None if due is None else due - now)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                for entry in self._pop_due(now):
+                    task = asyncio.create_task(self._poll(entry, semaphore))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _poll(self, entry: _Device, semaphore: asyncio.Semaphore):
+        active = False
+        try:
+            async with semaphore:
+                response = await entry.device.get_mailbox_response()
+            active = self._accept(entry, response)
+            if active:
+                for callback in self._matching(response):
+                    try:
+                        result = callback(entry.host, response.data, response)
+                        if inspect.isawaitable(result):
+                            await result
+                    except Exception as e:
+                        logging.warning(f"[warning] Mailbox callback failed: {e}")
+        except Exception as e:
+            entry.stats.errors += 1
+            logging.warning(f"[warning] Mailbox poll of {entry.host} failed: {e}")
+        finally:
+            self._reschedule(entry, active)
+            if self._wakeup is not None:
+                self._wakeup.set()
@@ -0,0 +1,254 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Seconden; de camera zit meestal tussen 5 en 500 ms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PARSE_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2)
+
+
+def _label(value) -> str:
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding quantile ``q``"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+@dataclass
+class CommandEvent:
+    """One command round-trip, handed to hooks"""
+    host: str
+    command: str
+    elapsed: float
+    bytes_out: int
+    bytes_in: int
+    errcode: Optional[int]
+    retry: bool = False
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class CommandStats:
+    latency: Histogram = field(default_factory=Histogram)
+    bytes_out: int = 0
+    bytes_in: int = 0
+    retries: int = 0   # re-sends after a rejected session, and hedged attempts of a RequestPolicy
+    failures: int = 0  # transport errors, no errcode
+    errcodes: Counter = field(default_factory=Counter)
+
+
+class Metrics:
+    """Process-wide instrumentation of HaloPro commands and response parsing.
+
+    Off by default; every instrumented call site first checks ``enabled``,
+    so the disabled cost is one attribute lookup. Turn it on with
+    ``METRICS.enable()`` or ``ROADANGEL_METRICS=1``::
+
+        from roadangel.metrics import METRICS
+        METRICS.enable()
+        METRICS.add_hook(lambda ev: ev.elapsed > 1 and print(ev))
+        METRICS.serve(9464)  # GET /metrics
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.commands: Dict[Tuple[str, str], CommandStats] = {}
+        self.parse: Dict[str, Histogram] = {}
+        self.hooks: List[Callable[[CommandEvent], None]] = []
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.commands.clear()
+            self.parse.clear()
+
+    def add_hook(self, hook: Callable[[CommandEvent], None]):
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def record(self, event: CommandEvent):
+        with self._lock:
+            stats = self.commands.get((event.host, event.command))
+            if stats is None:
+                stats = self.commands[(event.host, event.command)] = CommandStats()
+            stats.latency.observe(event.elapsed)
+            stats.bytes_out += event.bytes_out
+            stats.bytes_in += event.bytes_in
+            stats.retries += event.retry
+            if event.errcode is None:
+                stats.failures += 1
+            else:
+                stats.errcodes[event.errcode] += 1
+
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                logging.warning(f"[warning] Metrics hook failed: {e}")
+
+    def count_retry(self, host, command):
+        """Count an extra attempt sent outside ``observe_command``, e.g. a hedge"""
+        with self._lock:
+            stats = self.commands.get((host, command))
+            if stats is None:
+                stats = self.commands[(host, command)] = CommandStats()
+            stats.retries += 1
+
+    def observe_command(self, host, command, payload, call, retry=False):
+        """Time ``call()`` (a round-trip returning (HaloResponse, errcode, response)) and record it"""
+        bytes_out = len(payload) if isinstance(payload, (str, bytes)) else 0
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            response = getattr(e, "response", None)
+            self.record(CommandEvent(host, command, time.perf_counter() - start, bytes_out,
+                                     len(response.content) if response is not None else 0,
+                                     None, retry, e))
+            raise
+        response = result[2]
+        self.record(CommandEvent(host, command, time.perf_counter() - start, bytes_out,
+                                 len(response.content) if response is not None else 0, result[1], retry))
+        return result
+
+    def observe_parse(self, model: str, elapsed: float):
+        with self._lock:
+            hist = self.parse.get(model)
+            if hist is None:
+                hist = self.parse[model] = Histogram(PARSE_BUCKETS)
+            hist.observe(elapsed)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per ``host command``: count, mean/p50/p99 latency, bytes, retries and errcodes"""
+        with self._lock:
+            return {f"{host} {cmd}": {
+                "count": s.latency.count,
+                "mean": s.latency.mean,
+                "p50": s.latency.quantile(0.5),
+                "p99": s.latency.quantile(0.99),
+                "bytes_out": s.bytes_out,
+                "bytes_in": s.bytes_in,
+                "retries": s.retries,
+                "failures": s.failures,
+                "errcodes": dict(s.errcodes),
+            } for (host, cmd), s in self.commands.items()}
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+
+        def histogram(name, labels, hist: Histogram):
+            seen = 0
+            for bound, n in zip(hist.buckets, hist.counts):
+                seen += n
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {seen}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+            lines.append(f"{name}_sum{{{labels}}} {hist.sum}")
+            lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+        with self._lock:
+            lines.append("# TYPE roadangel_command_seconds histogram")
+            for (host, cmd), s in self.commands.items():
+                histogram("roadangel_command_seconds", f'host="{_label(host)}",command="{_label(cmd)}"', s.latency)
+
+            for metric, attr in (("roadangel_command_bytes_out_total", "bytes_out"),
+                                 ("roadangel_command_bytes_in_total", "bytes_in"),
+                                 ("roadangel_command_retries_total", "retries"),
+                                 ("roadangel_command_failures_total", "failures")):
+                lines.append(f"# TYPE {metric} counter")
+                for (host, cmd), s in self.commands.items():
+                    lines.append(f'{metric}{{host="{_label(host)}",command="{_label(cmd)}"}} {getattr(s, attr)}')
+
+            lines.append("# TYPE roadangel_command_errcode_total counter")
+            for (host, cmd), s in self.commands.items():
+                for errcode, n in s.errcodes.items():
+                    lines.append(f'roadangel_command_errcode_total{{host="{_label(host)}",command="{_label(cmd)}",'
+                                 f'errcode="{_label(errcode)}"}} {n}')
+
+            lines.append("# TYPE roadangel_parse_seconds histogram")
+            for model, hist in self.parse.items():
+                histogram("roadangel_parse_seconds", f'model="{_label(model)}"', hist)
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9464, host="0.0.0.0") -> ThreadingHTTPServer:
+        """Start a background HTTP server with ``GET /metrics`` for a Prometheus scraper"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-exporter", daemon=True).start()
+        logging.info(f"[info] Metrics available at http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+METRICS = Metrics(enabled=os.environ.get("ROADANGEL_METRICS", "") not in ("", "0"))
@@ -1,7 +1,11 @@
-from dataclasses import dataclass
-from typing import List, Optional, Union, Any
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, FrozenSet, List, Optional, Union, Any
 from enum import Enum
 import json
+import logging
+import time
+
+from .metrics import METRICS
 
 class SwitchMode(str, Enum):
     LIVE = "live"
@@ -9,11 +13,11 @@ class SwitchMode(str, Enum):
     ON = "on"
     OFF = "off"
 
-@dataclass
+@dataclass(slots=True)
 class SessionData:
     acSessionId: str
 
-@dataclass
+@dataclass(slots=True)
 class DeviceInfo:
     nickname: str
     password: str
@@ -46,39 +50,39 @@ class DeviceInfo:
     cid: str
     is_support_emmc_and_tf: int
 
-@dataclass
+@dataclass(slots=True)
 class AccStatus:
     connetc_acc_status: str
 
-@dataclass
+@dataclass(slots=True)
 class StateInfo:
     state: int
 
-@dataclass
+@dataclass(slots=True)
 class ErrorData:
     errcode: int
     data: List[str]
 
-@dataclass
+@dataclass(slots=True)
 class GpsState:
     gpsstate: int
 
-@dataclass
+@dataclass(slots=True)
 class IntParam:
     key: str
     value: int
 
-@dataclass
+@dataclass(slots=True)
 class StringParam:
     key: str
     value: str
 
-@dataclass
+@dataclass(slots=True)
 class SystemParams:
     int_params: List[IntParam]
     string_params: List[StringParam]
 
-@dataclass
+@dataclass(slots=True)
 class SdCardInfo:
     sdcapacity: int
     sdspare: int
@@ -97,18 +101,18 @@ class SdCardInfo:
     degreeofwear: int
     totalweartime: int
 
-@dataclass
+@dataclass(slots=True)
 class LoginInfo:
     imei: str
     logon_time: str
     postion: str
     device_name: str
 
-@dataclass
+@dataclass(slots=True)
 class LoginHistory:
     info: List[LoginInfo]
 
-@dataclass
+@dataclass(slots=True)
 class BasicDeviceInfo:
     default_user: str
     model: str
@@ -117,13 +121,13 @@ class BasicDeviceInfo:
     version: str
     totalruntime: int
 
-@dataclass
+@dataclass(slots=True)
 class TripStats:
     total_time: int
     total_mileage: int
     avg_speed: float
 
-@dataclass
+@dataclass(slots=True)
 class FileEntry:
     index: str
     type: str
@@ -132,94 +136,175 @@ class FileEntry:
     name: str
     parentfile: str
 
-@dataclass
+@dataclass(slots=True)
 class GpsFileReq:
     num: int
     file: List[FileEntry]
 
-@dataclass
+
+
+# --- Response dispatch --------------------------------------------------------
+
+def _fields(model) -> FrozenSet[str]:
+    return frozenset(f.name for f in fields(model))
+
+def _parse_system_params(parsed) -> SystemParams:
+    int_params = [IntParam(**param) for param in parsed["int_params"]]
+    string_params = [StringParam(**param) for param in parsed["string_params"]]
+    return SystemParams(int_params=int_params, string_params=string_params)
+
+def _parse_login_history(parsed) -> LoginHistory:
+    return LoginHistory(info=[LoginInfo(**info) for info in parsed["info"]])
+
+def _parse_gps_file_req(parsed) -> GpsFileReq:
+    return GpsFileReq(num=parsed["num"], file=[FileEntry(**f) for f in parsed["file"]])
+
+# Parser per model, flat models are built straight from their keys
+PARSERS: Dict[type, Callable[[dict], Any]] = {
+    SessionData: lambda parsed: SessionData(acSessionId=parsed["acSessionId"]),
+    DeviceInfo: lambda parsed: DeviceInfo(**parsed),
+    AccStatus: lambda parsed: AccStatus(**parsed),
+    StateInfo: lambda parsed: StateInfo(**parsed),
+    GpsState: lambda parsed: GpsState(**parsed),
+    SystemParams: _parse_system_params,
+    SdCardInfo: lambda parsed: SdCardInfo(**parsed),
+    LoginHistory: _parse_login_history,
+    BasicDeviceInfo: lambda parsed: BasicDeviceInfo(**parsed),
+    TripStats: lambda parsed: TripStats(**parsed),
+    GpsFileReq: _parse_gps_file_req,
+}
+
+# Model per command, for commands that always return the same payload
+COMMAND_MODELS: Dict[str, type] = {
+    "API_RequestSessionID": SessionData,
+    "API_GetBaseInfo": DeviceInfo,
+    "API_GpsFileListReq": GpsFileReq,
+}
+
+# Partial-key rules for payloads that don't match a model exactly (e.g. a newer
+# firmware adding a field). Checked in order, first match wins.
+RULES = [
+    (frozenset({"acSessionId"}), SessionData),
+    (frozenset({"nickname", "model", "uuid"}), DeviceInfo),
+    (frozenset({"connetc_acc_status"}), AccStatus),
+    (frozenset({"state"}), StateInfo),
+    (frozenset({"gpsstate"}), GpsState),
+    (frozenset({"int_params", "string_params"}), SystemParams),
+    (frozenset({"sdcapacity", "playback_size"}), SdCardInfo),
+    (frozenset({"info"}), LoginHistory),
+    (frozenset({"model", "default_user"}), BasicDeviceInfo),
+    (frozenset({"total_time", "total_mileage"}), TripStats),
+    (frozenset({"num", "file"}), GpsFileReq),
+]
+
+# Key signature -> model, seeded with every model's exact field set. Signatures
+# resolved through RULES are added on first sight, so each payload shape pays
+# for the rule scan only once. Unknown shapes are not cached and the cache
+# stops growing at MAX_SIGNATURES, so arbitrary payload keys cannot fill it.
+MAX_SIGNATURES = 1024
+SIGNATURES: Dict[FrozenSet[str], type] = {_fields(model): model for model in PARSERS}
+
+
+def register_model(model, parser=None, command=None):
+    """Register an extra response model, optionally as the model of ``command``"""
+    PARSERS[model] = parser or (lambda parsed: model(**parsed))
+    SIGNATURES[_fields(model)] = model
+    if command:
+        COMMAND_MODELS[command] = model
+
+
+def resolve_model(parsed: dict) -> Optional[type]:
+    """Model for a payload dict, or None for unknown structures"""
+    signature = frozenset(parsed)
+    try:
+        return SIGNATURES[signature]
+    except KeyError:
+        pass
+
+    model = None
+    for keys, candidate in RULES:
+        # LoginHistory alleen als info een lijst is
+        if keys <= signature and (candidate is not LoginHistory or isinstance(parsed["info"], list)):
+            model = candidate
+            break
+
+    # De uitkomst hangt alleen van de keys af, tenzij "info" meedoet
+    if model is not None and "info" not in signature and len(SIGNATURES) < MAX_SIGNATURES:
+        SIGNATURES[signature] = model
+    return model
+
+
 class HaloResponse:
-    def __init__(self, errcode: int, data_raw):
+    __slots__ = ("errcode", "command", "_data_raw", "_data", "parse_error")
+
+    _UNSET = object()
+
+    def __init__(self, errcode: int, data_raw, command: Optional[str] = None):
         self.errcode = errcode
+        self.command = command
         self._data_raw = data_raw
-        self._data = None
-        
+        self._data = self._UNSET
+        self.parse_error: Optional[Exception] = None
+
+    def __repr__(self):
+        return f"HaloResponse(errcode={self.errcode!r}, command={self.command!r}, data={self.data!r})"
+
     @staticmethod
-    def from_json(resp_json):
+    def from_json(resp_json, command: Optional[str] = None):
         errcode = resp_json.get("errcode")
         data_raw = resp_json.get("data")
-        return HaloResponse(errcode, data_raw)
-    
+        return HaloResponse(errcode, data_raw, command)
+
+    @property
+    def raw(self):
+        """The unparsed ``data`` field as returned by the camera"""
+        return self._data_raw
+
     @property
     def data(self):
-        if self._data is None:
-            try:               
-                # Handle empty string responses
-                if self._data_raw == "":
-                    self._data = None
-                    return self._data
-                
-                # Parse JSON string responses
-                parsed = json.loads(self._data_raw) if isinstance(self._data_raw, str) else self._data_raw
-                
-                # Dispatch based on keys in the parsed data
-                if isinstance(parsed, dict):
-                    # Session response
-                    if "acSessionId" in parsed:
-                        self._data = SessionData(acSessionId=parsed["acSessionId"])
-                    
-                    # Device info (comprehensive)
-                    elif "nickname" in parsed and "model" in parsed and "uuid" in parsed:
-                        self._data = DeviceInfo(**parsed)
-                    
-                    # ACC status
-                    elif "connetc_acc_status" in parsed:
-                        self._data = AccStatus(**parsed)
-                    
-                    # State info
-                    elif "state" in parsed:
-                        self._data = StateInfo(**parsed)
-                    
-                    # GPS state
-                    elif "gpsstate" in parsed:
-                        self._data = GpsState(**parsed)
-                    
-                    # System parameters
-                    elif "int_params" in parsed and "string_params" in parsed:
-                        int_params = [IntParam(**param) for param in parsed["int_params"]]
-                        string_params = [StringParam(**param) for param in parsed["string_params"]]
-                        self._data = SystemParams(int_params=int_params, string_params=string_params)
-                    
-                    # SD Card info
-                    elif "sdcapacity" in parsed and "playback_size" in parsed:
-                        self._data = SdCardInfo(**parsed)
-                    
-                    # Login history
-                    elif "info" in parsed and isinstance(parsed["info"], list):
-                        login_infos = [LoginInfo(**info) for info in parsed["info"]]
-                        self._data = LoginHistory(info=login_infos)
-                    
-                    # Basic device info (minimal)
-                    elif "model" in parsed and "default_user" in parsed:
-                        self._data = BasicDeviceInfo(**parsed)
-                    
-                    # Trip statistics
-                    elif "total_time" in parsed and "total_mileage" in parsed:
-                        self._data = TripStats(**parsed)
-
-                    # GPS File Entry
-                    elif "num" in parsed and "file" in parsed:
-                        files = [FileEntry(**f) for f in parsed["file"]]
-                        self._data = GpsFileReq(num=parsed["num"], file=files)
-                    
-                    # Fallback for unknown structures
-                    else:
-                        self._data = parsed
-                else:
-                    self._data = parsed
-                    
-            except Exception as e:
-                # If parsing fails, store raw data
-                self._data = self._data_raw
-                
-        return self._data
\ No newline at end of file
+        if self._data is self._UNSET:
+            if METRICS.enabled:
+                start = time.perf_counter()
+                self._data = self._parse()
+                METRICS.observe_parse(type(self._data).__name__, time.perf_counter() - start)
+            else:
+                self._data = self._parse()
+        return self._data
+
+    def _parse(self):
+        # Handle empty string responses
+        if self._data_raw == "":
+            return None
+
+        try:
+            # Parse JSON string responses
+            parsed = json.loads(self._data_raw) if isinstance(self._data_raw, str) else self._data_raw
+        except ValueError as e:
+            return self._failed(e)
+
+        if not isinstance(parsed, dict):
+            return parsed
+
+        # Bekend commando: direct het juiste model
+        model = COMMAND_MODELS.get(self.command)
+        if model is not None:
+            try:
+                return PARSERS[model](parsed)
+            except (KeyError, TypeError, ValueError):
+                pass  # onverwachte payload, verder via de key signature
+
+        model = resolve_model(parsed)
+        if model is None:
+            # Fallback for unknown structures
+            return parsed
+
+        try:
+            return PARSERS[model](parsed)
+        except (KeyError, TypeError, ValueError) as e:
+            return self._failed(e)
+
+    def _failed(self, error):
+        # If parsing fails, store raw data and keep the error for the caller
+        self.parse_error = error
+        logging.warning(f"[warning] Could not parse {self.command or 'response'} data: {error}")
+        return self._data_raw
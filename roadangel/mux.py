@@ -0,0 +1,407 @@
+import logging
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import av
+except ImportError:  # optional dependency: pip install RoadAngel[av]
+    av = None
+
+from .annexb import find_nals, is_keyframe_boundary
+from .dashcam import stream_host
+from .recorder import STREAM_PORT
+
+
+class PyAVDecoder:
+    """H.264 decoder on raw Annex B bytes, one per subscribed stream"""
+
+    def __init__(self, host=None):
+        if av is None:
+            raise ImportError("StreamMux decoding requires PyAV: pip install RoadAngel[av]")
+        self.codec = av.CodecContext.create("h264", "r")
+
+    def decode(self, data: bytes) -> List[np.ndarray]:
+        frames = []
+        for packet in self.codec.parse(data):
+            for frame in self.codec.decode(packet):
+                frames.append(frame.to_ndarray(format="bgr24"))
+        return frames
+
+    def close(self):
+        self.codec = None
+
+
+@dataclass
+class FeedStats:
+    host: str
+    connected: bool = False
+    bytes_received: int = 0
+    bytes_decoded: int = 0
+    frames: int = 0
+    subscribers: int = 0
+    reconnects: int = 0
+
+
+class Subscription:
+    """A viewer of one stream in a StreamMux, keeps only the newest frame"""
+
+    def __init__(self, mux: "StreamMux", host, callback: Optional[Callable[[str, np.ndarray], None]] = None):
+        self.mux = mux
+        self.host = host
+        self.callback = callback
+        self.received = 0
+        self._frame: Optional[np.ndarray] = None
+        self._cond = threading.Condition()
+
+    def _deliver(self, frame):
+        if self.callback is not None:
+            try:
+                self.callback(self.host, frame)
+            except Exception as e:
+                logging.warning(f"[warning] Subscriber of {self.host} failed: {e}")
+        with self._cond:
+            self._frame = frame
+            self.received += 1
+            self._cond.notify_all()
+
+    def read(self, timeout: float = 0) -> Optional[np.ndarray]:
+        """Newest frame since the last read, or None"""
+        with self._cond:
+            if self._frame is None and timeout > 0:
+                self._cond.wait(timeout)
+            frame, self._frame = self._frame, None
+            return frame
+
+    def close(self):
+        self.mux.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@dataclass
+class _Feed:
+    host: str
+    sock: Optional[socket.socket] = None
+    held: bytes = b""
+    previous_type: Optional[int] = None
+    synced: bool = False  # decoder is gevoed vanaf een keyframe
+    subscribers: List[Subscription] = field(default_factory=list)
+    decoder: object = None
+    pending: bytearray = field(default_factory=bytearray)
+    decoding: bool = False
+    retry_at: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    stats: FeedStats = None
+
+
+class StreamMux:
+    """Ingests the live streams of many cameras on one thread.
+
+    All sockets are watched with a selector. Streams without subscribers
+    are only read and scanned for keyframes, nothing is buffered for them;
+    a new viewer gets its first picture at the next keyframe. Only
+    subscribed streams are decoded, on a pool of ``workers`` threads, so
+    CPU and memory follow the number of viewers. A stream whose undecoded
+    backlog exceeds ``max_gop_bytes`` skips ahead to the next keyframe::
+
+        with StreamMux(workers=4) as mux:
+            for halo in fleet:
+                mux.add(halo.stream_host)
+            with mux.subscribe("193.168.0.12") as sub:
+                frame = sub.read(timeout=2)
+
+    ``decoder_factory(host)`` returns an object with ``decode(bytes)`` and
+    ``close()``; the default uses PyAV. A port in ``host`` is taken as the
+    HTTP port and dropped, the stream is read from ``port``.
+    """
+
+    def __init__(self, port=STREAM_PORT, workers=4, decoder_factory: Callable = PyAVDecoder,
+                 chunk_size=256 * 1024, max_gop_bytes=4 * 1024 * 1024, reconnect_delay=2, timeout=5):
+        self.port = port
+        self.decoder_factory = decoder_factory
+        self.chunk_size = chunk_size
+        self.max_gop_bytes = max_gop_bytes
+        self.reconnect_delay = reconnect_delay
+        self.timeout = timeout
+
+        self._feeds: Dict[str, _Feed] = {}
+        self._selector = selectors.DefaultSelector()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mux-decode")
+        self._buf = bytearray(chunk_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Verwijderde feeds, afgebroken op de selector thread
+        self._removed: List[_Feed] = []
+        # Wekt de selector als er feeds bijkomen of weggaan
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def add(self, host):
+        host = stream_host(host)
+        with self._lock:
+            if host not in self._feeds:
+                self._feeds[host] = _Feed(host, stats=FeedStats(host))
+        self._wake()
+
+    def remove(self, host):
+        host = stream_host(host)
+        with self._lock:
+            feed = self._feeds.pop(host, None)
+            if feed is None:
+                return
+            with feed.lock:
+                feed.subscribers.clear()
+                feed.stats.subscribers = 0
+            if self._thread is not None:
+                # Selectors zijn niet thread-safe: de selector thread ruimt op
+                self._removed.append(feed)
+        if self._thread is not None:
+            self._wake()
+        else:
+            self._teardown(feed)
+
+    def _teardown(self, feed: _Feed):
+        self._disconnect(feed)
+        with feed.lock:
+            if not feed.decoding:
+                self._close_decoder(feed)
+
+    @property
+    def hosts(self) -> List[str]:
+        return list(self._feeds)
+
+    def subscribe(self, host, callback=None) -> Subscription:
+        """Start decoding ``host`` for a new viewer"""
+        host = stream_host(host)
+        self.add(host)
+        sub = Subscription(self, host, callback)
+        feed = self._feeds[host]
+        with feed.lock:
+            feed.subscribers.append(sub)
+            feed.stats.subscribers = len(feed.subscribers)
+            if feed.decoder is None:
+                feed.decoder = self.decoder_factory(host)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        feed = self._feeds.get(sub.host)
+        if feed is None:
+            return
+        with feed.lock:
+            if sub in feed.subscribers:
+                feed.subscribers.remove(sub)
+            feed.stats.subscribers = len(feed.subscribers)
+            if not feed.subscribers and not feed.decoding:
+                self._close_decoder(feed)
+
+    def _close_decoder(self, feed: _Feed):
+        if feed.decoder is not None:
+            try:
+                feed.decoder.close()
+            except Exception:
+                pass
+            feed.decoder = None
+        feed.pending = bytearray()
+
+    def start(self) -> "StreamMux":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stream-mux", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            feeds, self._removed = list(self._feeds.values()) + self._removed, []
+        for feed in feeds:
+            self._teardown(feed)
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _connect(self, feed: _Feed):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.chunk_size)
+        try:
+            sock.connect_ex((feed.host, self.port))
+        except OSError as e:
+            # Bv. een naam die niet resolvet; de selector thread moet blijven lopen voor de andere feeds
+            logging.warning(f"[warning] Could not connect to {feed.host}:{self.port}: {e}")
+            sock.close()
+            feed.retry_at = time.monotonic() + self.reconnect_delay
+            return
+        feed.sock = sock
+        feed.retry_at = time.monotonic() + self.timeout
+        self._selector.register(sock, selectors.EVENT_READ | selectors.EVENT_WRITE, feed)
+
+    def _disconnect(self, feed: _Feed, retry=False):
+        if feed.sock is not None:
+            try:
+                self._selector.unregister(feed.sock)
+            except (KeyError, ValueError):
+                pass
+            feed.sock.close()
+            feed.sock = None
+        if feed.stats.connected and retry:
+            feed.stats.reconnects += 1
+        feed.stats.connected = False
+        feed.held, feed.previous_type, feed.synced = b"", None, False
+        feed.retry_at = time.monotonic() + self.reconnect_delay
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._lock:
+                feeds = list(self._feeds.values())
+                removed, self._removed = self._removed, []
+            for feed in removed:
+                self._teardown(feed)
+            for feed in feeds:
+                if feed.sock is None and now >= feed.retry_at:
+                    self._connect(feed)
+                elif feed.sock is not None and not feed.stats.connected and now >= feed.retry_at:
+                    logging.warning(f"[warning] Connecting to {feed.host}:{self.port} timed out")
+                    self._disconnect(feed, retry=True)
+
+            for key, events in self._selector.select(timeout=0.5):
+                feed = key.data
+                if feed is None:
+                    try:
+                        self._wake_r.recv(4096)
+                    except OSError:
+                        pass
+                    continue
+                if feed.sock is None:
+                    continue
+                if events & selectors.EVENT_WRITE and not feed.stats.connected:
+                    self._on_connected(feed)
+                    continue
+                if events & selectors.EVENT_READ:
+                    self._on_readable(feed)
+
+        self._selector.close()
+
+    def _on_connected(self, feed: _Feed):
+        err = feed.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            logging.warning(f"[warning] Could not connect to {feed.host}:{self.port}: {err}")
+            self._disconnect(feed, retry=True)
+            return
+        feed.stats.connected = True
+        self._selector.modify(feed.sock, selectors.EVENT_READ, feed)
+        logging.info(f"[info] Stream {feed.host} connected")
+
+    def _on_readable(self, feed: _Feed):
+        try:
+            n = feed.sock.recv_into(self._buf)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            logging.warning(f"[warning] Stream {feed.host} failed: {e}")
+            n = 0
+        if not n:
+            self._disconnect(feed, retry=True)
+            return
+        feed.stats.bytes_received += n
+        self._ingest(feed, bytes(self._buf[:n]))
+
+    def _ingest(self, feed: _Feed, chunk: bytes):
+        # Keyframes zoeken; de laatste 3 bytes wachten op de volgende chunk
+        data = feed.held + chunk
+        cut = None
+        for offset, nal_type in find_nals(data):
+            if is_keyframe_boundary(nal_type, feed.previous_type):
+                cut = offset
+            feed.previous_type = nal_type
+
+        keep = max(len(data) - 3, 0)
+        feed.held = data[keep:]
+
+        with feed.lock:
+            if feed.decoder is None:
+                # Geen kijkers: niets bewaren
+                feed.synced = False
+                return
+            if feed.synced:
+                feed.pending += data[:keep]
+            elif cut is not None:
+                # Decoder begint bij een keyframe
+                feed.pending += data[cut:keep]
+                feed.synced = True
+            if len(feed.pending) > self.max_gop_bytes:
+                logging.warning(f"[warning] Decoder of {feed.host} is behind, skipping to the next keyframe")
+                feed.pending = bytearray()
+                feed.synced = False
+        self._schedule(feed)
+
+    def _schedule(self, feed: _Feed):
+        """At most one decode job per stream, the pool bounds the total"""
+        with feed.lock:
+            if feed.decoding or not feed.pending or feed.decoder is None:
+                return
+            feed.decoding = True
+        try:
+            self._pool.submit(self._decode, feed)
+        except RuntimeError:
+            feed.decoding = False
+
+    def _decode(self, feed: _Feed):
+        while True:
+            with feed.lock:
+                data, feed.pending = bytes(feed.pending), bytearray()
+                decoder = feed.decoder
+                if not data or decoder is None:
+                    feed.decoding = False
+                    if not feed.subscribers:
+                        self._close_decoder(feed)
+                    return
+            try:
+                frames = decoder.decode(data)
+            except Exception as e:
+                logging.warning(f"[warning] Decoding {feed.host} failed: {e}")
+                frames = []
+            feed.stats.bytes_decoded += len(data)
+            if frames:
+                feed.stats.frames += len(frames)
+                # Een kijker heeft alleen iets aan het nieuwste frame
+                for sub in list(feed.subscribers):
+                    sub._deliver(frames[-1])
+
+    @property
+    def stats(self) -> List[FeedStats]:
+        return [feed.stats for feed in self._feeds.values()]
+
+    @property
+    def active_decoders(self) -> int:
+        return sum(1 for feed in self._feeds.values() if feed.decoder is not None)
@@ -0,0 +1,197 @@
+from dataclasses import dataclass
+from typing import Union
+
+import numpy as np
+
+# $GPRMC,hhmmss.sss,A,ddmm.mmmm,N,dddmm.mmmm,E,speed,course,ddmmyy,...
+# Velden na de talker, in volgorde
+TIME, STATUS, LAT, LAT_DIR, LON, LON_DIR, SPEED, COURSE, DATE = range(9)
+
+# Maximale breedte per veld inclusief scheidingsteken. Regels met een
+# langer veld worden overgeslagen.
+FIELD_WIDTHS = (12, 2, 14, 2, 15, 2, 10, 10, 8)
+NUMERIC_FIELDS = (TIME, LAT, LON, SPEED, COURSE, DATE)
+
+# Scheidingstekens; 0 is de opvulling na het einde van de buffer
+_SEPARATORS = np.zeros(256, dtype=bool)
+_SEPARATORS[[0, ord(","), ord("*"), ord("\r"), ord("\n")]] = True
+
+_DIGITS = np.zeros(256, dtype=bool)
+_DIGITS[ord("0"):ord("9") + 1] = True
+
+_POW10 = 10.0 ** np.arange(max(FIELD_WIDTHS) + 1)
+
+
+@dataclass(slots=True)
+class GpsTrack:
+    """Columnar GPS fixes, one array element per $GPRMC sentence.
+
+    timestamp: UTC epoch seconds (float64), NaN when time or date is missing
+    latitude/longitude: decimal degrees, negative for S and W
+    valid: True for status "A"
+    speed: knots, course: degrees (float32, NaN when empty)
+    """
+    timestamp: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+    valid: np.ndarray
+    speed: np.ndarray
+    course: np.ndarray
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @classmethod
+    def empty(cls) -> "GpsTrack":
+        return cls(np.empty(0), np.empty(0), np.empty(0), np.empty(0, dtype=bool),
+                   np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32))
+
+    def select(self, mask) -> "GpsTrack":
+        """Subset by boolean mask, index array or slice"""
+        return GpsTrack(self.timestamp[mask], self.latitude[mask], self.longitude[mask],
+                        self.valid[mask], self.speed[mask], self.course[mask])
+
+    def valid_only(self) -> "GpsTrack":
+        return self.select(self.valid)
+
+    @classmethod
+    def concat(cls, tracks) -> "GpsTrack":
+        tracks = list(tracks)
+        if not tracks:
+            return cls.empty()
+        return cls(*(np.concatenate([getattr(t, name) for t in tracks]) for name in cls.__slots__))
+
+
+def _degrees(raw: np.ndarray, hemisphere: np.ndarray, negative: str) -> np.ndarray:
+    """NMEA (d)ddmm.mmmm to signed decimal degrees"""
+    deg = np.floor(raw / 100)
+    dec = deg + (raw - deg * 100) / 60
+    return np.where(hemisphere == ord(negative), -dec, dec)
+
+
+def _timestamps(t: np.ndarray, d: np.ndarray) -> np.ndarray:
+    """hhmmss.sss + ddmmyy (as numbers) to UTC epoch seconds"""
+    seconds = np.floor(t / 10000) * 3600 + np.floor(t / 100) % 100 * 60 + t % 100
+
+    known = ~np.isnan(d)
+    days = np.full(d.shape, np.nan)
+    if known.any():
+        dk = d[known].astype(np.int64)
+        day, month, year = dk // 10000, dk // 100 % 100, 2000 + dk % 100
+        months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+        days[known] = (months.astype("datetime64[D]") - np.datetime64(0, "D")).astype(np.int64) + day - 1
+
+    return days * 86400 + seconds
+
+
+def _rmc_starts(buf: np.ndarray) -> np.ndarray:
+    """Offsets of every line that starts with $GPRMC or $GNRMC"""
+    starts = np.concatenate(([0], np.flatnonzero(buf == ord("\n")) + 1))
+    starts = starts[starts + 7 <= len(buf)]
+
+    # $G?RMC, met ? = P (GPS) of N (multi-GNSS)
+    is_rmc = ((buf[starts] == ord("$")) & (buf[starts + 1] == ord("G"))
+              & ((buf[starts + 2] == ord("P")) | (buf[starts + 2] == ord("N")))
+              & (buf[starts + 3] == ord("R")) & (buf[starts + 4] == ord("M")) & (buf[starts + 5] == ord("C"))
+              & (buf[starts + 6] == ord(",")))
+    return starts[is_rmc]
+
+
+def _scan_field(padded: np.ndarray, pos: np.ndarray, width: int, numeric: bool):
+    """Scan one field that starts at ``pos`` in every line.
+
+    Works column by column over all lines at once: finds the separator and,
+    for numeric fields, accumulates the digits. Returns whether a separator
+    was found within ``width``, the field length and the value (a float, or
+    the first byte for one-letter fields).
+    """
+    n = len(pos)
+    length = np.full(n, width)
+    active = np.ones(n, dtype=bool)
+
+    if not numeric:
+        for j in range(width):
+            stop = _SEPARATORS[padded[pos + j]] & active
+            length[stop] = j
+            active &= ~stop
+        return ~active, length, padded[pos]
+
+    value = np.zeros(n)
+    decimals = np.zeros(n, dtype=np.intp)
+    after_dot = np.zeros(n, dtype=bool)
+
+    for j in range(width):
+        c = padded[pos + j]
+        stop = _SEPARATORS[c] & active
+        length[stop] = j
+        active &= ~stop
+        if not active.any():
+            break
+
+        digit = _DIGITS[c] & active
+        value[digit] = value[digit] * 10 + (c[digit] - ord("0"))
+        decimals += digit & after_dot
+        after_dot |= c == ord(".")
+
+    value = value / _POW10[decimals]
+    # Lege velden (lengte 0) worden NaN
+    value[length == 0] = np.nan
+    return ~active, length, value
+
+
+def _rmc_fields(buf: np.ndarray, starts: np.ndarray):
+    """Values of the first fields of the RMC lines at ``starts``.
+
+    Returns a mask of the lines that have all fields, and one array per
+    field in the order of FIELD_WIDTHS.
+    """
+    padded = np.concatenate((buf, np.zeros(sum(FIELD_WIDTHS), dtype=np.uint8)))
+    pos = starts + 7  # eerste veld, na "$GPRMC,"
+    ok = np.ones(len(starts), dtype=bool)
+
+    values = []
+    for i, width in enumerate(FIELD_WIDTHS):
+        found, length, value = _scan_field(padded, pos, width, numeric=i in NUMERIC_FIELDS)
+        ok &= found
+        if i != DATE:
+            # Eindigt de regel eerder, dan ontbreken er velden
+            ok &= padded[pos + length] == ord(",")
+
+        values.append(value)
+        pos = pos + length + 1
+
+    return ok, values
+
+
+def parse_rmc(buffer: Union[bytes, bytearray, memoryview, str]) -> GpsTrack:
+    """Parse every $GPRMC/$GNRMC sentence in ``buffer`` at once.
+
+    Lines and fields are located on the raw bytes with NumPy and all
+    conversions (digits, degrees/minutes, hemisphere sign, time) run on
+    whole columns, so there is no per-line Python code.
+    """
+    if isinstance(buffer, str):
+        buffer = buffer.encode("ascii", errors="replace")
+
+    buf = np.frombuffer(buffer, dtype=np.uint8)
+    starts = _rmc_starts(buf)
+    if not len(starts):
+        return GpsTrack.empty()
+
+    ok, values = _rmc_fields(buf, starts)
+    cols = [v[ok] for v in values]
+
+    return GpsTrack(
+        timestamp=_timestamps(cols[TIME], cols[DATE]),
+        latitude=_degrees(cols[LAT], cols[LAT_DIR], "S"),
+        longitude=_degrees(cols[LON], cols[LON_DIR], "W"),
+        valid=cols[STATUS] == ord("A"),
+        speed=cols[SPEED].astype(np.float32),
+        course=cols[COURSE].astype(np.float32),
+    )
+
+
+def parse_rmc_file(path) -> GpsTrack:
+    """Parse a .gpx/.nmea file from disk"""
+    with open(path, "rb") as f:
+        return parse_rmc(f.read())
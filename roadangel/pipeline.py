@@ -0,0 +1,393 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional
+
+import numpy as np
+
+
+class DropPolicy:
+    BLOCK = "block"    # wachten tot er plek is, vertraagt de vorige stage
+    OLDEST = "oldest"  # oudste item in de wachtrij vervalt
+    NEWEST = "newest"  # het nieuwe item vervalt
+
+
+@dataclass(slots=True)
+class Item:
+    seq: int
+    captured: float  # time.monotonic() when the frame entered the pipeline
+    data: Any
+
+
+_END = object()
+
+
+class BoundedQueue:
+    """Small deque-based queue that applies a DropPolicy when full"""
+
+    def __init__(self, maxsize=16, drop=DropPolicy.BLOCK):
+        self.maxsize = maxsize
+        self.drop = drop
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item, force=False):
+        with self._cond:
+            if not force and len(self._items) >= self.maxsize:
+                if self.drop == DropPolicy.NEWEST:
+                    self.dropped += 1
+                    return
+                if self.drop == DropPolicy.OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get(self, timeout: Optional[float] = None):
+        """Next item, or None on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._items:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Release producers blocked on a full queue"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reset(self):
+        """Empty and reopen after close(), for the next run"""
+        with self._cond:
+            self._items.clear()
+            self._closed = False
+
+
+@dataclass
+class StageStats:
+    name: str
+    processed: int = 0
+    batches: int = 0
+    dropped: int = 0
+    errors: int = 0
+    busy: float = 0.0          # seconds spent inside the stage function
+    latency_avg: float = 0.0   # seconds from entering the pipeline to leaving this stage
+    latency_max: float = 0.0
+    queued: int = 0
+
+    @property
+    def batch_avg(self) -> float:
+        return self.processed / self.batches if self.batches else 0.0
+
+    @property
+    def per_item(self) -> float:
+        return self.busy / self.processed if self.processed else 0.0
+
+
+class Stage:
+    """One processing step.
+
+    ``func`` gets a batch and returns one result per input. With
+    ``batch_size > 1`` the batch is a NumPy array stacked on a new first
+    axis (or a list when the frames differ in shape); with ``batch_size=1``
+    it gets the single frame. A batch is sent when it is full or when
+    ``max_wait`` seconds passed since its first frame.
+
+    ``executor="process"`` runs ``func`` in a process pool; it then has to
+    be picklable and the batch is pickled to the worker.
+    """
+
+    def __init__(self, func: Callable, name=None, batch_size=1, max_wait=0.0, workers=1,
+                 executor="thread", queue_size=16, drop=DropPolicy.BLOCK):
+        self.func = func
+        self.name = name or getattr(func, "__name__", "stage")
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.workers = workers
+        self.executor = executor
+        self.queue = BoundedQueue(queue_size, drop)
+
+        self._pool: Optional[Executor] = None
+        self._stats = StageStats(self.name)
+        self._latency_total = 0.0
+        self._lock = threading.Lock()
+        self._running = False
+        self._closing = False
+
+    def _open(self):
+        self._closing = False
+        # Na stop() is de queue gesloten en kan er nog een _END van de vorige run in zitten
+        self.queue.reset()
+        if self.executor == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"stage-{self.name}")
+
+    def _collect(self) -> List:
+        """Wait for the first item, then fill the batch until full or max_wait"""
+        first = self.queue.get()
+        batch = [first]
+        if first is _END:
+            return batch
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            item = self.queue.get(max(deadline - time.monotonic(), 0))
+            if item is None:
+                break
+            batch.append(item)
+            if item is _END:
+                break
+        return batch
+
+    def _stack(self, items: List[Item]):
+        if self.batch_size == 1:
+            return items[0].data
+        data = [item.data for item in items]
+        if all(isinstance(d, np.ndarray) for d in data) and len({d.shape for d in data}) == 1:
+            return np.stack(data)
+        return data
+
+    def _split(self, items: List[Item], result) -> List[Item]:
+        if self.batch_size == 1:
+            return [Item(items[0].seq, items[0].captured, result)]
+        if result is None:
+            return [Item(item.seq, item.captured, None) for item in items]
+        if len(result) != len(items):
+            raise ValueError(f"stage {self.name} returned {len(result)} results for {len(items)} frames")
+        return [Item(item.seq, item.captured, r) for item, r in zip(items, result)]
+
+    def _record(self, items: List[Item], busy: float, error=False):
+        now = time.monotonic()
+        with self._lock:
+            self._stats.batches += 1
+            self._stats.busy += busy
+            if error:
+                self._stats.errors += 1
+                return
+            self._stats.processed += len(items)
+            for item in items:
+                latency = now - item.captured
+                self._latency_total += latency
+                self._stats.latency_max = max(self._stats.latency_max, latency)
+
+    def _timed(self, data):
+        start = time.perf_counter()
+        result = self.func(data)
+        return result, time.perf_counter() - start
+
+    def run(self, output: Optional[BoundedQueue]):
+        """Stage thread: batch, submit, and pass results on in order"""
+        pending = deque()
+        timed = _timed_call if self.executor == "process" else self._timed
+
+        def finish(items, future):
+            try:
+                result, busy = future.result()
+                out = self._split(items, result)
+                self._record(items, busy)
+            except Exception as e:
+                self._record(items, 0.0, error=True)
+                logging.warning(f"[warning] Stage {self.name} failed: {e}")
+                return
+            if output is not None:
+                for item in out:
+                    output.put(item)
+
+        with self._lock:
+            self._running = True
+            pool = self._pool
+        try:
+            while True:
+                batch = self._collect()
+                done = batch[-1] is _END
+                items = batch[:-1] if done else batch
+
+                if items:
+                    args = (self.func, self._stack(items)) if self.executor == "process" else (self._stack(items),)
+                    try:
+                        pending.append((items, pool.submit(timed, *args)))
+                    except RuntimeError:
+                        # Pool is gestopt: afronden wat er loopt en het einde doorgeven
+                        done = True
+                # Volgorde behouden: oudste batch eerst afronden
+                while pending and (len(pending) >= self.workers or done):
+                    finish(*pending.popleft())
+                if done:
+                    break
+        finally:
+            # Altijd _END doorgeven, anders blijven latere stages en results() hangen
+            if output is not None:
+                output.put(_END, force=True)
+            with self._lock:
+                self._running = False
+                if self._closing:
+                    self._shutdown()
+
+    def _shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def close(self):
+        """Release blocked producers; the pool is shut down now, or by the stage thread when it exits"""
+        self.queue.close()
+        with self._lock:
+            self._closing = True
+            if not self._running:
+                self._shutdown()
+
+    @property
+    def stats(self) -> StageStats:
+        with self._lock:
+            stats = StageStats(**vars(self._stats))
+        if stats.processed:
+            stats.latency_avg = self._latency_total / stats.processed
+        stats.dropped = self.queue.dropped
+        stats.queued = len(self.queue)
+        return stats
+
+
+def _timed_call(func, data):
+    """Process pool variant of Stage._timed, must be a module level function"""
+    start = time.perf_counter()
+    result = func(data)
+    return result, time.perf_counter() - start
+
+
+class Pipeline:
+    """Headless frame processing on top of a LiveStream (or any frame source).
+
+    Frames flow through the stages over bounded queues; each stage runs
+    its own thread and a thread or process pool::
+
+        stream = halo.live_stream(mode=ReadMode.EVERY)
+        pipeline = Pipeline(stream, [
+            Stage(lambda f: cv2.resize(f, (320, 180)), name="resize"),
+            Stage(model.predict, name="detect", batch_size=8, max_wait=0.1, drop=DropPolicy.OLDEST),
+        ], sink=handle)
+        with stream, pipeline:
+            pipeline.join()
+
+    ``source`` is an object with ``read(timeout)`` and ``running`` (like
+    LiveStream) or an iterable of images. Results go to ``sink(item)``,
+    or can be taken with ``results()`` when no sink is given.
+    """
+
+    def __init__(self, source, stages: Iterable[Stage], sink: Optional[Callable[[Item], Any]] = None,
+                 results_size=64, results_drop=DropPolicy.OLDEST):
+        self.source = source
+        self.stages = list(stages)
+        self.sink = sink
+        self.output = BoundedQueue(results_size, results_drop) if sink is None else None
+        self.read_timeout = 0.1
+
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._seq = 0
+
+    def _frames(self):
+        if hasattr(self.source, "read"):
+            while not self._stop.is_set():
+                frame = self.source.read(self.read_timeout)
+                if frame is not None:
+                    yield frame.image, frame.captured
+                elif not getattr(self.source, "running", True):
+                    break
+        else:
+            for image in self.source:
+                if self._stop.is_set():
+                    break
+                yield image, time.monotonic()
+
+    def _feed(self):
+        queue = self.stages[0].queue if self.stages else self._sink_queue
+        try:
+            for image, captured in self._frames():
+                self._seq += 1
+                queue.put(Item(self._seq, captured, image))
+        except Exception as e:
+            logging.warning(f"[warning] Pipeline source failed: {e}")
+        finally:
+            queue.put(_END, force=True)
+
+    def _drain(self):
+        while True:
+            item = self._sink_queue.get()
+            if item is _END:
+                if self.output is not None:
+                    self.output.put(_END, force=True)
+                break
+            if self.sink is not None:
+                try:
+                    self.sink(item)
+                except Exception as e:
+                    logging.warning(f"[warning] Pipeline sink failed: {e}")
+            else:
+                self.output.put(item)
+
+    def start(self) -> "Pipeline":
+        self._stop.clear()
+        self._sink_queue = BoundedQueue(maxsize=max(len(self.stages), 1) * 16)
+        if self.output is not None:
+            self.output.reset()
+
+        targets = []
+        for i, stage in enumerate(self.stages):
+            stage._open()
+            nxt = self.stages[i + 1].queue if i + 1 < len(self.stages) else self._sink_queue
+            targets.append((f"stage-{stage.name}", stage.run, (nxt,)))
+        targets.append(("pipeline-sink", self._drain, ()))
+        targets.append(("pipeline-source", self._feed, ()))
+
+        self._threads = [threading.Thread(target=t, name=n, args=a, daemon=True) for n, t, a in targets]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def join(self, timeout=None):
+        """Wait until the source is exhausted and every stage is drained"""
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self.join(timeout)
+        for stage in self.stages:
+            stage.close()
+        self._threads = []
+
+    def results(self, timeout=None):
+        """Iterate over finished items when no sink was given"""
+        while True:
+            item = self.output.get(timeout)
+            if item is None or item is _END:
+                return
+            yield item
+
+    @property
+    def stats(self) -> List[StageStats]:
+        return [stage.stats for stage in self.stages]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
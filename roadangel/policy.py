@@ -0,0 +1,257 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+import requests
+
+from .metrics import METRICS
+
+# Alleen lezende commando's mogen dubbel verstuurd worden
+IDEMPOTENT_COMMANDS = frozenset({
+    "API_GetBaseInfo",
+    "API_GpsFileListReq",
+    "API_GetMailboxData",
+    "API_GeneralQuery",
+})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without contacting the host while its circuit breaker is open"""
+
+
+# Fouten waarna de timeout van een host verdubbelt
+TIMEOUT_ERRORS = (TimeoutError, requests.Timeout)
+
+
+class RttEstimator:
+    """Smoothed round-trip time per host (RFC 6298 style) plus recent samples for percentiles.
+
+    Only answered attempts are sampled; after a timeout ``back_off`` doubles
+    the timeout until the next sample comes in (Karn's algorithm).
+    """
+
+    MAX_BACKOFF = 64
+
+    def __init__(self, initial=1.0, window=200):
+        self.srtt: Optional[float] = None
+        self.rttvar = initial / 2
+        self.initial = initial
+        self.backoff = 1
+        self.samples = deque(maxlen=window)
+
+    def observe(self, rtt: float):
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.samples.append(rtt)
+        self.backoff = 1
+
+    def back_off(self):
+        self.backoff = min(self.backoff * 2, self.MAX_BACKOFF)
+
+    def timeout(self) -> float:
+        if self.srtt is None:
+            return self.initial * self.backoff
+        return (self.srtt + 4 * self.rttvar) * self.backoff
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < 10:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures, lets one probe through after ``reset_timeout``"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logging.warning(f"[warning] Circuit opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+
+@dataclass
+class PolicyStats:
+    requests: int = 0
+    hedges: int = 0          # extra attempts sent
+    hedge_wins: int = 0      # answers that came from an extra attempt
+    failures: int = 0
+    rejected: int = 0        # short-circuited by an open breaker
+
+
+@dataclass
+class _Host:
+    rtt: RttEstimator
+    breaker: CircuitBreaker
+    stats: PolicyStats
+
+
+class RequestPolicy:
+    """Per-host timeouts, hedging and circuit breaking for HaloPro commands.
+
+    The timeout of every attempt follows the host's measured round-trip
+    time (``srtt + 4 * rttvar``, clamped to ``min_timeout..max_timeout``)
+    and doubles after each timeout until an answer comes in. Commands in
+    ``idempotent`` get a hedged attempt when the first has not answered
+    within the ``hedge_percentile`` of recent round-trips, or right away
+    when it failed; the first answer wins. Everything else, e.g.
+    ``API_GeneralSave``, is sent exactly once with the fixed
+    ``write_timeout`` and does not feed the round-trip estimate. After
+    ``failure_threshold`` failures in a row a host is skipped with
+    CircuitOpenError until ``reset_timeout`` has passed::
+
+        policy = RequestPolicy()
+        halo = HaloPro(host, policy=policy)
+    """
+
+    def __init__(self, min_timeout=0.25, max_timeout=5.0, initial_timeout=2.0, hedge_percentile=0.95,
+                 max_hedges=1, idempotent: Iterable[str] = IDEMPOTENT_COMMANDS,
+                 failure_threshold=5, reset_timeout=10.0, workers=8, write_timeout=15.0):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.write_timeout = write_timeout
+        self.initial_timeout = initial_timeout
+        self.hedge_percentile = hedge_percentile
+        self.max_hedges = max_hedges
+        self.idempotent = frozenset(idempotent)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._hosts: Dict[str, _Host] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+
+    def _host(self, host) -> _Host:
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _Host(RttEstimator(self.initial_timeout),
+                                                  CircuitBreaker(self.failure_threshold, self.reset_timeout),
+                                                  PolicyStats())
+            return state
+
+    def timeout(self, host) -> float:
+        return min(max(self._host(host).rtt.timeout(), self.min_timeout), self.max_timeout)
+
+    def hedge_delay(self, host) -> float:
+        """Wait this long before sending a hedged attempt"""
+        delay = self._host(host).rtt.percentile(self.hedge_percentile)
+        if delay is None:
+            return self.timeout(host)
+        return min(max(delay, self.min_timeout / 2), self.timeout(host))
+
+    def stats(self, host) -> PolicyStats:
+        return self._host(host).stats
+
+    def breaker(self, host) -> CircuitBreaker:
+        return self._host(host).breaker
+
+    def execute(self, host, cmd, send: Callable[[float], object]):
+        """Run ``send(timeout)`` for ``cmd`` on ``host`` under this policy and return its result"""
+        state = self._host(host)
+        with self._lock:
+            if not state.breaker.allow():
+                state.stats.rejected += 1
+                raise CircuitOpenError(f"{host} is failing, not sending {cmd}")
+            state.stats.requests += 1
+
+        read = cmd in self.idempotent
+        try:
+            if not read:
+                # Schrijven: één poging, ruime vaste timeout; de camera kan er lang over doen
+                result, rtt = send(self.write_timeout), None
+            elif self.max_hedges > 0:
+                result, rtt = self._hedged(host, cmd, state, send, self.timeout(host))
+            else:
+                start = time.perf_counter()
+                result = send(self.timeout(host))
+                rtt = time.perf_counter() - start
+        except Exception as e:
+            with self._lock:
+                state.stats.failures += 1
+                state.breaker.failure()
+                if read and isinstance(e, TIMEOUT_ERRORS):
+                    state.rtt.back_off()
+            raise
+
+        with self._lock:
+            if rtt is not None:
+                state.rtt.observe(rtt)
+            state.breaker.success()
+        return result
+
+    def _hedged(self, host, cmd, state: _Host, send, timeout):
+        def attempt():
+            start = time.perf_counter()
+            return send(timeout), time.perf_counter() - start
+
+        pending = {self._pool.submit(attempt): 0}
+        hedges = 0
+        error: Optional[BaseException] = None
+        delay = self.hedge_delay(host)
+
+        while pending:
+            done, _ = wait(pending, timeout=delay if hedges < self.max_hedges else None,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                number = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if number:
+                    with self._lock:
+                        state.stats.hedge_wins += 1
+                # De verliezer loopt af op zijn eigen timeout
+                return result
+
+            # Geen antwoord binnen de deadline, of een poging faalde: nog een poging
+            if hedges < self.max_hedges and (not done or not pending):
+                hedges += 1
+                with self._lock:
+                    state.stats.hedges += 1
+                if METRICS.enabled:
+                    METRICS.count_retry(host, cmd)
+                pending[self._pool.submit(attempt)] = hedges
+
+        raise error
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,222 @@
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Deque, Dict, Optional
+
+from .annexb import NAL_PPS, NAL_SPS, find_nals, is_keyframe_boundary
+
+STREAM_PORT = 6200
+
+
+@dataclass(slots=True)
+class Segment:
+    path: Path
+    started: float  # time.time()
+    ended: float = 0.0
+    size: int = 0
+
+
+@dataclass
+class RecorderStats:
+    bytes_received: int = 0
+    bytes_written: int = 0
+    segments: int = 0
+    deleted: int = 0
+    keyframes: int = 0
+    reconnects: int = 0
+
+
+class StreamRecorder:
+    """Archives the raw live stream to disk without decoding it.
+
+    The H.264 byte stream from port 6200 is cut into ``.h264`` segment
+    files at keyframe boundaries (SPS, or IDR slices) once a segment is
+    ``segment_seconds`` old. Only start codes are searched for, so the cost
+    per camera is a socket read, a ``bytes.find`` and a buffered write.
+    Oldest segments are deleted when the directory exceeds ``max_bytes``::
+
+        halo.set_playbackliveswitch(SwitchMode.ON)
+        with StreamRecorder(halo.host, "/var/lib/roadangel/front", segment_seconds=60,
+                            max_bytes=20 * 1024 ** 3):
+            ...
+
+    Segments play with ffplay/VLC and can be remuxed without re-encoding
+    (``ffmpeg -i seg.h264 -c copy seg.mp4``).
+    """
+
+    def __init__(self, host, directory, port=STREAM_PORT, segment_seconds=60, max_bytes=None,
+                 prefix="stream", buffer_size=4 * 1024 * 1024, chunk_size=256 * 1024,
+                 timeout=5, reconnect_delay=2, on_segment: Optional[Callable[[Segment], None]] = None):
+        self.host = host
+        self.port = port
+        self.directory = Path(directory)
+        self.segment_seconds = segment_seconds
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.buffer_size = buffer_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.on_segment = on_segment
+
+        self.stats = RecorderStats()
+        self.segments: Deque[Segment] = deque()
+        self.current: Optional[Segment] = None
+        self._file = None
+        self._segment_start = 0.0
+        self._held = b""
+        self._previous_type = None
+        self._params: Dict[int, bytes] = {}
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sock: Optional[socket.socket] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "StreamRecorder":
+        if self.running:
+            return self
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load_segments()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"recorder-{self.host}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _load_segments(self):
+        """Pick up segments of an earlier run so the disk cap covers them too"""
+        existing = sorted(self.directory.glob(f"{self.prefix}-*.h264"), key=lambda p: p.stat().st_mtime)
+        self.segments = deque(Segment(p, p.stat().st_mtime, p.stat().st_mtime, p.stat().st_size) for p in existing)
+
+    def _run(self):
+        buf = bytearray(self.chunk_size)
+        view = memoryview(buf)
+        while not self._stop.is_set():
+            try:
+                with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+                    self._sock = sock
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.chunk_size * 4)
+                    logging.info(f"[info] Recording {self.host}:{self.port} to {self.directory}")
+                    while not self._stop.is_set():
+                        n = sock.recv_into(buf)
+                        if not n:
+                            break
+                        self.stats.bytes_received += n
+                        self._feed(view[:n])
+            except OSError as e:
+                if not self._stop.is_set():
+                    logging.warning(f"[warning] Recorder {self.host} disconnected: {e}")
+            finally:
+                self._sock = None
+                # Een nieuwe verbinding begint niet midden in een NAL unit
+                self._write(self._held)
+                self._close_segment()
+                self._held = b""
+                self._previous_type = None
+
+            if not self._stop.wait(self.reconnect_delay):
+                self.stats.reconnects += 1
+
+    def _feed(self, chunk):
+        # De laatste 3 bytes kunnen het begin van een start code zijn, die wachten op de volgende chunk
+        data = self._held + chunk
+        nals = find_nals(data)
+        written = 0
+
+        for i, (offset, nal_type) in enumerate(nals):
+            if nal_type in (NAL_SPS, NAL_PPS) and i + 1 < len(nals):
+                self._params[nal_type] = bytes(data[offset:nals[i + 1][0]])
+
+            if is_keyframe_boundary(nal_type, self._previous_type):
+                self.stats.keyframes += 1
+                if self._file is None or time.time() - self._segment_start >= self.segment_seconds:
+                    self._write(data[written:offset])
+                    written = offset
+                    self._open_segment(prepend_params=nal_type != NAL_SPS)
+            self._previous_type = nal_type
+
+        keep = max(len(data) - 3, written)
+        self._write(data[written:keep])
+        self._held = bytes(data[keep:])
+
+    def _write(self, data):
+        # Voor het eerste keyframe valt er niets te decoderen, dat wordt overgeslagen
+        if self._file is None or not data:
+            return
+        self._file.write(data)
+        self.current.size += len(data)
+        self.stats.bytes_written += len(data)
+
+    def _open_segment(self, prepend_params=False):
+        self._close_segment()
+        now = time.time()
+        name = f"{self.prefix}-{datetime.fromtimestamp(now).strftime('%Y%m%d-%H%M%S')}.h264"
+        path = self.directory / name
+        if path.exists():
+            path = path.with_name(f"{path.stem}-{int(now * 1000) % 1000:03d}.h264")
+
+        self._file = open(path, "wb", buffering=self.buffer_size)
+        self.current = Segment(path, now)
+        self._segment_start = now
+        if prepend_params:
+            # Camera's die SPS/PPS maar een keer sturen: meegeven zodat elk segment los afspeelt
+            for nal_type in (NAL_SPS, NAL_PPS):
+                if nal_type in self._params:
+                    self._write(self._params[nal_type])
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        segment, self.current = self.current, None
+        segment.ended = time.time()
+        self.segments.append(segment)
+        self.stats.segments += 1
+        self._enforce_cap()
+
+        if self.on_segment is not None:
+            try:
+                self.on_segment(segment)
+            except Exception as e:
+                logging.warning(f"[warning] on_segment callback failed: {e}")
+
+    def _enforce_cap(self):
+        if self.max_bytes is None:
+            return
+        total = sum(s.size for s in self.segments)
+        while self.segments and total > self.max_bytes:
+            oldest = self.segments.popleft()
+            try:
+                os.remove(oldest.path)
+                self.stats.deleted += 1
+            except FileNotFoundError:
+                pass
+            total -= oldest.size
@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Errcodes (and HTTP statuses) that mean "this session is no longer valid".
+# Firmware versions differ, pass your own set to SessionManager if needed.
+AUTH_ERRCODES = frozenset({401, 403})
+
+
+def default_cache_dir() -> Path:
+    """Per-user cache directory, ``$XDG_CACHE_HOME/roadangel`` or ``~/.cache/roadangel``"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "roadangel"
+
+
+@dataclass
+class CachedSession:
+    host: str
+    session_id: str
+    created: float
+
+
+class SessionManager:
+    """Caches authenticated ``acSessionId``'s per host with a TTL.
+
+    The cache is shared by every HaloPro that gets the same manager and,
+    through a small JSON file, by short-lived processes on the same machine.
+    A cached session is only replaced when the camera rejects it, see
+    ``HaloPro.login``.
+    """
+
+    def __init__(self, path=None, ttl=300, persist=True, auth_errcodes=AUTH_ERRCODES):
+        self.ttl = ttl
+        self.auth_errcodes = frozenset(auth_errcodes)
+        self.path = Path(path) if path else (default_cache_dir() / "sessions.json" if persist else None)
+
+        self._sessions: Dict[str, CachedSession] = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Reload the file when another process changed it"""
+        if self.path is None:
+            return
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+
+        try:
+            raw = json.loads(self.path.read_text())
+            self._sessions = {host: CachedSession(**entry) for host, entry in raw.items()}
+            self._mtime = mtime
+        except (ValueError, TypeError) as e:
+            logging.warning(f"[warning] Ignoring corrupt session cache {self.path}: {e}")
+
+    def _save(self):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            data = {host: asdict(entry) for host, entry in self._sessions.items()}
+            # Atomisch vervangen zodat andere processen nooit een half bestand lezen
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".sessions")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+            self._mtime = self.path.stat().st_mtime_ns
+        except OSError as e:
+            logging.warning(f"[warning] Could not write session cache {self.path}: {e}")
+
+    def get(self, host) -> Optional[str]:
+        """Cached session id for ``host``, or None when missing or expired"""
+        with self._lock:
+            self._load()
+            entry = self._sessions.get(host)
+            if entry is None:
+                return None
+            if time.time() - entry.created > self.ttl:
+                return None
+            return entry.session_id
+
+    def put(self, host, session_id):
+        with self._lock:
+            self._load()
+            self._sessions[host] = CachedSession(host, session_id, time.time())
+            self._purge()
+            self._save()
+
+    def invalidate(self, host):
+        with self._lock:
+            self._load()
+            if self._sessions.pop(host, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._save()
+
+    def _purge(self):
+        now = time.time()
+        for host in [h for h, e in self._sessions.items() if now - e.created > self.ttl]:
+            del self._sessions[host]
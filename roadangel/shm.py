@@ -0,0 +1,358 @@
+import logging
+import multiprocessing as mp
+import time
+import weakref
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .stream import ReadMode
+
+MAGIC = 0x48414C4F  # "HALO"
+
+# Header: int64 velden aan het begin van het segment
+H_MAGIC, H_SLOTS, H_HEIGHT, H_WIDTH, H_CHANNELS, H_WRITE_SEQ, H_CLOSED = range(7)
+HEADER_FIELDS = 8
+
+
+def _attach(name) -> shared_memory.SharedMemory:
+    """Open an existing segment without letting this process' resource tracker own it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: de tracker zou het segment verwijderen als deze lezer stopt
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+@dataclass(slots=True)
+class SharedFrame:
+    """A frame inside the ring. ``image`` is a view on shared memory, not a copy."""
+    image: np.ndarray
+    seq: int
+    captured: float  # time.monotonic() of the decoder process
+    _ring: "FrameRing"
+    _slot: int
+
+    @property
+    def valid(self) -> bool:
+        """False once the writer has reused this slot; check after processing a zero-copy frame"""
+        return self._ring._slot_seq[self._slot] == self.seq
+
+
+class FrameRing:
+    """Fixed number of preallocated frame slots in one shared memory segment.
+
+    Layout: an int64 header, per-slot sequence numbers and capture times,
+    then ``slots`` frames of ``height x width x channels`` uint8. A slot's
+    sequence number is negative while the writer fills it, so readers can
+    tell a torn or overwritten slot from a complete one.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self._header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if self._header[H_MAGIC] != MAGIC:
+            raise RuntimeError(f"[error] {shm.name} is not a frame ring")
+
+        slots = int(self._header[H_SLOTS])
+        self.shape: Tuple[int, int, int] = (int(self._header[H_HEIGHT]), int(self._header[H_WIDTH]),
+                                            int(self._header[H_CHANNELS]))
+        offset = HEADER_FIELDS * 8
+        self._slot_seq = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += slots * 8
+        self._stamps = np.ndarray((slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += slots * 8
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+        self._frames_offset = offset
+        # Uitgegeven zero-copy beelden; zolang er een leeft mag het segment niet weg
+        self._views = []
+
+    @staticmethod
+    def size(shape, slots) -> int:
+        return (HEADER_FIELDS + 2 * slots) * 8 + slots * int(np.prod(shape))
+
+    @classmethod
+    def create(cls, shape, slots=8, name=None) -> "FrameRing":
+        if len(shape) == 2:
+            shape = (*shape, 1)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.size(shape, slots))
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[H_SLOTS], (header[H_HEIGHT], header[H_WIDTH], header[H_CHANNELS]) = slots, shape
+        np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=HEADER_FIELDS * 8)[:] = 0
+        # Magic als laatste, pas dan is de header compleet
+        header[H_MAGIC] = MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name) -> "FrameRing":
+        return cls(_attach(name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def slots(self) -> int:
+        return len(self._slot_seq)
+
+    @property
+    def write_seq(self) -> int:
+        return int(self._header[H_WRITE_SEQ])
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._header[H_CLOSED])
+
+    def write(self, image: np.ndarray) -> int:
+        """Copy a frame into the next slot, returns its sequence number"""
+        image = image.reshape(image.shape[:2] + (-1,))
+        if image.shape != self.shape:
+            raise ValueError(f"frame shape {image.shape} does not match ring shape {self.shape}")
+
+        seq = self.write_seq + 1
+        slot = seq % self.slots
+        self._slot_seq[slot] = -seq  # bezig met schrijven
+        self._frames[slot] = image
+        self._stamps[slot] = time.monotonic()
+        self._slot_seq[slot] = seq
+        self._header[H_WRITE_SEQ] = seq
+        return seq
+
+    def frame(self, seq) -> Optional[SharedFrame]:
+        """Frame ``seq`` if it is still in the ring and complete"""
+        slot = seq % self.slots
+        if self._slot_seq[slot] != seq:
+            return None
+        # Eigen array per frame: slices ervan verwijzen hiernaar, zo blijft het in _views zolang het gebruikt wordt
+        image = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf,
+                           offset=self._frames_offset + slot * self._frames[0].nbytes)
+        self._views = [v for v in self._views if v() is not None]
+        self._views.append(weakref.ref(image))
+        frame = SharedFrame(image, seq, float(self._stamps[slot]), self, slot)
+        # Opnieuw controleren: de schrijver kan de tijdstempel net overschreven hebben
+        return frame if frame.valid else None
+
+    def mark_closed(self):
+        self._header[H_CLOSED] = 1
+
+    def close(self):
+        """Detach; the owner also removes the segment.
+
+        Raises RuntimeError while zero-copy frames of this ring are still
+        referenced; drop them and call ``close`` again.
+        """
+        if self.shm is None:
+            return
+        alive = sum(1 for v in self._views if v() is not None)
+        if alive:
+            # Na unmap zou een levend beeld naar vrijgegeven geheugen wijzen (segfault)
+            raise RuntimeError(f"[error] {alive} frames of {self.shm.name} are still in use, "
+                               f"release them before close()")
+        if self.owner:
+            self.mark_closed()
+        # Views eerst loslaten, anders weigert SharedMemory.close()
+        self._header = self._slot_seq = self._stamps = self._frames = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameReader:
+    """A consumer's cursor into a FrameRing.
+
+    ``ReadMode.LATEST`` jumps to the newest frame, ``ReadMode.EVERY`` walks
+    the sequence numbers and counts the frames the writer lapped as missed.
+    Frames are returned as views; use ``copy=True`` or check ``frame.valid``
+    after processing when a consumer is slower than ``slots`` frames. Views
+    pin the shared segment: drop every zero-copy frame before ``close``,
+    which raises RuntimeError otherwise. Frames read with ``copy=True``
+    can outlive the reader.
+    """
+
+    def __init__(self, name, mode=ReadMode.LATEST):
+        self.ring = FrameRing.attach(name)
+        self.mode = mode
+        self.cursor = 0
+        self.received = 0
+        self.missed = 0
+
+    def read(self, timeout: float = 0, copy=False) -> Optional[SharedFrame]:
+        deadline = time.monotonic() + timeout
+        delay = 0.0005
+        while True:
+            frame = self._next(copy)
+            if frame is not None or self.ring.closed:
+                return frame
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.005)
+
+    def _next(self, copy) -> Optional[SharedFrame]:
+        head = self.ring.write_seq
+        if head <= self.cursor:
+            return None
+
+        if self.mode == ReadMode.LATEST:
+            seq = head
+        else:
+            seq = self.cursor + 1
+            # Het oudste slot kan al overschreven worden, sla dat ook over
+            oldest = head - self.ring.slots + 2
+            if seq < oldest:
+                self.missed += oldest - seq
+                seq = oldest
+
+        frame = self.ring.frame(seq)
+        if frame is None:
+            self.missed += 1
+            self.cursor = seq
+            return None
+        if copy:
+            frame.image = frame.image.copy()
+            if not frame.valid:
+                self.missed += 1
+                self.cursor = seq
+                return None
+
+        if self.mode == ReadMode.LATEST:
+            self.missed += max(seq - self.cursor - 1, 0)
+        self.cursor = seq
+        self.received += 1
+        return frame
+
+    def close(self):
+        self.ring.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _decode_into_ring(url, name, slots, fps, ready, failed, stop, capture_factory):
+    """Decoder process: one capture, every frame into the ring.
+
+    ``ready`` is set once the ring holds the first frame, ``failed`` when
+    the decoder gave up before that.
+    """
+    ring = None
+    try:
+        cap = (capture_factory or cv2.VideoCapture)(url)
+        cap.set(cv2.CAP_PROP_FPS, fps)
+        ok, image = cap.read()
+        if not ok:
+            logging.info("⚠️ Frame niet ontvangen, probeer opnieuw...")
+            failed.set()
+            return
+
+        # Vorm van de ring volgt uit het eerste frame
+        ring = FrameRing.create(image.shape, slots=slots, name=name)
+        ring.write(image)
+        ready.set()
+
+        while not stop.is_set():
+            ok, image = cap.read()
+            if not ok:
+                logging.info("⚠️ Frame niet ontvangen, probeer opnieuw...")
+                break
+            try:
+                ring.write(image)
+            except ValueError as e:
+                logging.warning(f"[warning] Skipping frame: {e}")
+        cap.release()
+    except Exception as e:
+        logging.warning(f"[warning] Decoder for {url} failed: {e}")
+        if not ready.is_set():
+            failed.set()
+    finally:
+        if ring is not None:
+            # Lezers zien closed; wie al gekoppeld is houdt zijn mapping na unlink, het proces stopt
+            ring.close()
+
+
+class SharedStream:
+    """One decoder process for a live stream, shared by any number of local processes.
+
+    The process owns the only connection to port 6200 and writes decoded
+    frames into a FrameRing named ``name``. Consumers in other processes
+    attach with ``FrameReader(name)``::
+
+        with SharedStream(halo.stream_url, name="halo-front") as shared:
+            ...
+        # elsewhere
+        reader = FrameReader("halo-front", mode=ReadMode.EVERY)
+        frame = reader.read(timeout=1)
+    """
+
+    def __init__(self, url, name=None, slots=8, fps=30, capture_factory=None):
+        self.url = url
+        self.name = name or f"roadangel-{mp.current_process().pid}-{id(self):x}"
+        self.slots = slots
+        self.fps = fps
+        self.capture_factory = capture_factory
+        self._ready = mp.Event()
+        self._failed = mp.Event()
+        self._stop = mp.Event()
+        self._process: Optional[mp.Process] = None
+
+    def start(self, timeout=10) -> "SharedStream":
+        """Start the decoder and wait until the ring holds the first frame"""
+        for event in (self._ready, self._failed, self._stop):
+            event.clear()
+        self._process = mp.Process(
+            target=_decode_into_ring, name=f"decoder-{self.name}", daemon=True,
+            args=(self.url, self.name, self.slots, self.fps, self._ready, self._failed, self._stop,
+                  self.capture_factory))
+        self._process.start()
+
+        deadline = time.monotonic() + timeout
+        while not self._ready.wait(0.05):
+            # Mislukt, gecrasht (zonder failed te zetten) of te laat
+            if self._failed.is_set() or not self._process.is_alive() or time.monotonic() >= deadline:
+                self.stop()
+                raise RuntimeError(f"[error] Failed to start decoder for {self.url}")
+        logging.info(f"[info] Shared stream {self.url} available as {self.name}")
+        return self
+
+    def reader(self, mode=ReadMode.LATEST) -> FrameReader:
+        return FrameReader(self.name, mode=mode)
+
+    @property
+    def running(self) -> bool:
+        """False once the decoder has stopped, also after a failure or the end of the source"""
+        return self._process is not None and self._process.is_alive()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._process is not None:
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
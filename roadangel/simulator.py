@@ -0,0 +1,291 @@
+import json
+import logging
+import random
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from .annexb import NAL_IDR, NAL_PPS, NAL_SLICE, NAL_SPS
+
+BASE_INFO = {
+    "nickname": "Halo", "password": "", "ordernum": "", "model": "HaloPro", "version": "sim",
+    "uuid": "00000000", "macaddr": "00:00:00:00:00:00", "sn": "SIM0001", "chipsn": "", "legalret": 0,
+    "btnver": 1, "totalruntime": 0, "sdcapacity": 64000, "sdspare": 32000, "sdbrand": "sim",
+    "hbbitrate": 8, "hsbitrate": 8, "mbbitrate": 4, "msbitrate": 4, "lbbitrate": 2,
+    "lsbitrate": 2, "rbbitrate": 4, "rsbitrate": 4, "default_user": "admin",
+    "is_neeed_update": 0, "edog_model": "", "edog_version": "", "edog_status": 0, "cid": "",
+    "is_support_emmc_and_tf": 0,
+}
+
+# Instellingen zoals API_GeneralQuery ze teruggeeft
+SYSTEM_PARAMS = {
+    "int_params": {"event_before_time": 0, "event_after_time": 0, "speaker_turn": 50, "parking_power_mgr": 0},
+    "string_params": {"mic_switch": "off", "osd_switch": "off", "osd_speedswitch": "off",
+                      "start_sound_switch": "off", "scam_vertical_mirror": "off", "scam_horizontal_mirror": "off",
+                      "parking_status": "hibernate", "power_guard_value": "mid"},
+}
+
+
+def synthetic_gpx(fixes, start=0, date="230725") -> bytes:
+    """NMEA text with one $GPRMC and one $GPGGA per second, every 500th fix invalid"""
+    lines = []
+    for i in range(start, start + fixes):
+        hh, mm, ss = i // 3600 % 24, i // 60 % 60, i % 60
+        lat = 5215.61754 + (i % 1000) * 0.0001
+        lon = 648.54750 + (i % 1000) * 0.0001
+        status = "V" if i % 500 == 0 else "A"
+        lines.append(f"$GPRMC,{hh:02d}{mm:02d}{ss:02d}.000,{status},{lat:.5f},N,{lon:011.5f},E,"
+                     f"{i % 60}.5,{i % 360}.0,{date},,,A*00")
+        lines.append(f"$GPGGA,{hh:02d}{mm:02d}{ss:02d}.000,{lat:.5f},N,{lon:011.5f},E,1,08,0.9,10.0,M,,M,,*00")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def synthetic_gop(frames=30, idr_size=40000, slice_size=4000, parameter_sets=True) -> bytes:
+    """One group of pictures as Annex B NAL units (structure only, not decodable video)"""
+    def nal(nal_type, size):
+        header = bytes([0x60 | nal_type])
+        # Payload zonder nullen, zodat er geen valse start codes in zitten
+        return b"\x00\x00\x00\x01" + header + bytes([0x5A]) * size
+
+    gop = nal(NAL_SPS, 12) + nal(NAL_PPS, 4) if parameter_sets else b""
+    gop += nal(NAL_IDR, idr_size)
+    for _ in range(frames - 1):
+        gop += nal(NAL_SLICE, slice_size)
+    return gop
+
+
+class HaloSimulator:
+    """Local stand-in for a HaloPro: cmd.cgi over HTTP, .gpx files and the stream port.
+
+    ``latency`` (+ up to ``jitter``) is added to every HTTP request,
+    ``connect_delay`` to every new connection (like the handshake over the
+    camera's WiFi), and with probability ``loss`` a request is dropped by
+    closing the connection without an answer. With ``stall`` a dropped
+    request first hangs that many seconds, like a packet lost on WiFi::
+
+        with HaloSimulator(latency=0.005, loss=0.01) as sim:
+            halo = sim.halo()
+            halo.login()
+
+    The stream port sends H.264 NAL unit structure (start codes, SPS, IDR
+    and P slices) at ``fps``; it is good for recorder and mux benchmarks,
+    not for decoding.
+    """
+
+    def __init__(self, host="127.0.0.1", http_port=0, stream_port=0, latency=0.0, jitter=0.0, loss=0.0,
+                 connect_delay=0.0, stall=0.0, gpx_files=3, gpx_fixes=3600, fps=30, gop_frames=30,
+                 require_session=False, seed=None):
+        self.bind = host
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.connect_delay = connect_delay
+        self.stall = stall
+        self.fps = fps
+        self.gop = synthetic_gop(gop_frames)
+        self.gop_frames = gop_frames
+        self.require_session = require_session
+        self.random = random.Random(seed)
+
+        self.files: Dict[str, bytes] = {}
+        self.file_list = []
+        for i in range(gpx_files):
+            start = f"20250723{14 + i:02d}0000"
+            name = f"{start}_{i:04d}.gpx"
+            self.files[name] = synthetic_gpx(gpx_fixes, start=i * gpx_fixes)
+            self.file_list.append({"index": str(i), "type": "49", "starttime": start,
+                                   "endtime": f"20250723{14 + i:02d}5959", "name": name, "parentfile": ""})
+
+        self.responses: Dict[str, Any] = {
+            "API_RequestCertificate": "",
+            "API_GetMailboxData": "",
+            "API_GetBaseInfo": BASE_INFO,
+            "API_GpsFileListReq": lambda: {"num": len(self.file_list), "file": self.file_list},
+            "API_GeneralQuery": lambda: {kind: [{"key": k, "value": v} for k, v in params.items()]
+                                         for kind, params in self.params.items()},
+        }
+        self.params = {kind: dict(params) for kind, params in SYSTEM_PARAMS.items()}
+        self.sessions = set()
+        self.requests: Dict[str, int] = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+        self._http = ThreadingHTTPServer((host, http_port), self._handler())
+        self._http.daemon_threads = True
+        self._stream = socket.create_server((host, stream_port), reuse_port=False)
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def host(self) -> str:
+        """``ip:port`` of the HTTP side, what HaloPro expects as host"""
+        return f"{self.bind}:{self._http.server_address[1]}"
+
+    @property
+    def stream_port(self) -> int:
+        return self._stream.getsockname()[1]
+
+    def halo(self, **kwargs):
+        """A HaloPro pointed at this simulator"""
+        from .dashcam import HaloPro
+        return HaloPro(self.host, stream_port=self.stream_port, **kwargs)
+
+    def start(self) -> "HaloSimulator":
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._http.serve_forever, name="sim-http", daemon=True),
+            threading.Thread(target=self._accept_streams, name="sim-stream", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logging.info(f"[info] Simulator on {self.host}, stream on port {self.stream_port}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._http.shutdown()
+        self._http.server_close()
+        self._stream.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay(self):
+        delay = self.latency + (self.random.random() * self.jitter if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+    def _lost(self) -> bool:
+        if self.loss and self.random.random() < self.loss:
+            with self._lock:
+                self.dropped += 1
+            return True
+        return False
+
+    def _count(self, cmd):
+        with self._lock:
+            self.requests[cmd] = self.requests.get(cmd, 0) + 1
+
+    def _command(self, cmd, headers, body=b"") -> Dict[str, Any]:
+        if cmd == "API_RequestSessionID":
+            sid = uuid.uuid4().hex
+            self.sessions.add(sid)
+            return {"errcode": 0, "data": {"acSessionId": sid}}
+        if self.require_session and headers.get("SessionID") not in self.sessions:
+            return {"errcode": 401, "data": ""}
+
+        if cmd == "API_GeneralSave":
+            # Alleen de meegestuurde keys veranderen
+            saved = json.loads(body or b"{}")
+            with self._lock:
+                for kind in self.params:
+                    self.params[kind].update((p["key"], p["value"]) for p in saved.get(kind, []))
+            return {"errcode": 0, "data": ""}
+
+        data = self.responses.get(cmd, "")
+        return {"errcode": 0, "data": data() if callable(data) else data}
+
+    def _handler(self):
+        sim = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                if sim.connect_delay:
+                    time.sleep(sim.connect_delay)
+                super().setup()
+
+            def log_message(self, *args):
+                pass
+
+            def _drop(self):
+                if sim.stall:
+                    time.sleep(sim.stall)
+                self.close_connection = True
+                try:
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+            def _send(self, status, body: bytes, headers=()):
+                self.send_response(status)
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body_len = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(body_len)
+                url = urlparse(self.path)
+                cmd = parse_qs(url.query).get("cmd", [""])[0]
+                sim._count(cmd)
+                sim._delay()
+                if sim._lost():
+                    return self._drop()
+                out = json.dumps(sim._command(cmd, self.headers, body)).encode()
+                self._send(200, out, [("Content-Type", "application/json")])
+
+            def do_GET(self):
+                name = urlparse(self.path).path.lstrip("/")
+                sim._count(f"GET {name.rsplit('.', 1)[-1]}")
+                sim._delay()
+                if sim._lost():
+                    return self._drop()
+                data = sim.files.get(name)
+                if data is None:
+                    return self._send(404, b"")
+
+                rng = self.headers.get("Range")
+                if not rng:
+                    return self._send(200, data)
+                start = int(rng.split("=", 1)[1].split("-", 1)[0])
+                if start >= len(data):
+                    return self._send(416, b"", [("Content-Range", f"bytes */{len(data)}")])
+                self._send(206, data[start:], [("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")])
+
+        return Handler
+
+    def _accept_streams(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._stream.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._send_stream, args=(conn,), name="sim-stream-conn", daemon=True).start()
+
+    def _send_stream(self, conn: socket.socket):
+        """One GOP per gop_frames / fps seconds, frame by frame"""
+        frame_time = 1.0 / self.fps if self.fps else 0.0
+        frames = self.gop.split(b"\x00\x00\x00\x01")[1:]
+        # SPS en PPS horen bij het eerste frame
+        frames = [b"".join(b"\x00\x00\x00\x01" + f for f in frames[:3])] + [b"\x00\x00\x00\x01" + f for f in frames[3:]]
+        next_time = time.monotonic()
+        try:
+            with conn:
+                while not self._stop.is_set():
+                    for frame in frames:
+                        conn.sendall(frame)
+                        if frame_time:
+                            next_time += frame_time
+                            delay = next_time - time.monotonic()
+                            if delay > 0:
+                                time.sleep(delay)
+        except OSError:
+            pass
+
+    def add_gpx(self, name, data: bytes, entry: Optional[dict] = None):
+        """Serve an extra .gpx and list it in API_GpsFileListReq"""
+        self.files[name] = data
+        self.file_list.append(entry or {"index": str(len(self.file_list)), "type": "49", "starttime": name[:14],
+                                        "endtime": name[:14], "name": name, "parentfile": ""})
@@ -0,0 +1,273 @@
+import json
+import logging
+import math
+import os
+import threading
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .models import FileEntry
+from .nmea import GpsTrack
+
+EARTH_RADIUS_M = 6371000.0
+
+
+@dataclass(slots=True)
+class ClipHit:
+    """A recording that passed the queried area, and when"""
+    name: str
+    starttime: str
+    parentfile: str
+    t0: float  # UTC epoch seconds
+    t1: float
+
+
+@dataclass(slots=True)
+class _Visit:
+    """Consecutive fixes of one file inside one grid cell.
+
+    With ``lead`` the arrays start with the fix just before the cell, so
+    the segment that enters the cell belongs to the visit as well.
+    """
+    file: int
+    ts: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    lead: bool
+    lat0: float = 0.0
+    lat1: float = 0.0
+    lon0: float = 0.0
+    lon1: float = 0.0
+
+    def __post_init__(self):
+        self.lat0, self.lat1 = float(self.lat.min()), float(self.lat.max())
+        self.lon0, self.lon1 = float(self.lon.min()), float(self.lon.max())
+
+
+class SpatialIndex:
+    """Grid index from GPS fixes to the recordings they belong to.
+
+    Fixes are bucketed in square cells of ``cell`` degrees. Every stretch of
+    a track inside one cell is stored once as a visit with its fixes,
+    linked to the FileEntry it came from, and listed in each cell its
+    bounding box touches. A query only looks at the cells it covers and
+    tests the fixes of the visits there; ``radius`` also tests
+    the straight segments between fixes less than ``merge_gap`` seconds
+    apart::
+
+        index = SpatialIndex()
+        index.update(gps)  # new or grown .gpx files
+        hits = index.radius(52.2603, 6.8091, 50)
+    """
+
+    FORMAT = 2
+
+    def __init__(self, cell=0.005, merge_gap=30.0):
+        self.cell = cell
+        self.merge_gap = merge_gap
+        self.files: List[FileEntry] = []
+        self._file_ids: Dict[str, int] = {}
+        self._last: Dict[int, float] = {}
+        self._tail: Dict[int, Tuple[float, float, float]] = {}
+        self._visit_list: List[_Visit] = []
+        # Cel -> visits waarvan de fixes of segmenten de cel raken
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._visit_list)
+
+    def _register(self, visit: _Visit):
+        number = len(self._visit_list)
+        self._visit_list.append(visit)
+        (x0, y0), (x1, y1) = self._cell_of(visit.lat0, visit.lon0), self._cell_of(visit.lat1, visit.lon1)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                self._cells[(x, y)].append(number)
+
+    def _cell_of(self, lat, lon):
+        return math.floor(lat / self.cell), math.floor(lon / self.cell)
+
+    def add(self, entry: FileEntry, track: GpsTrack) -> int:
+        """Index the valid fixes of ``track`` for ``entry``, returns the number of new visits.
+
+        Calling it again for a file that grew only adds the fixes after the
+        last indexed one.
+        """
+        with self._lock:
+            file_id = self._file_ids.get(entry.name)
+            if file_id is None:
+                file_id = self._file_ids[entry.name] = len(self.files)
+                self.files.append(entry)
+            else:
+                self.files[file_id] = entry
+
+            keep = track.valid & ~np.isnan(track.timestamp) & ~np.isnan(track.latitude) & ~np.isnan(track.longitude)
+            if file_id in self._last:
+                keep &= track.timestamp > self._last[file_id]
+            track = track.select(keep)
+            if not len(track):
+                return 0
+
+            ts, lat, lon = (np.asarray(track.timestamp, dtype=np.float64), np.asarray(track.latitude, dtype=np.float64),
+                            np.asarray(track.longitude, dtype=np.float64))
+            # Laatste fix van de vorige aanroep vooraan, voor het segment naar de eerste nieuwe
+            tail = self._tail.get(file_id)
+            if tail is not None:
+                ts, lat, lon = np.r_[tail[0], ts], np.r_[tail[1], lat], np.r_[tail[2], lon]
+            first = 0 if tail is None else 1
+
+            ix = np.floor(lat / self.cell).astype(np.int64)
+            iy = np.floor(lon / self.cell).astype(np.int64)
+
+            # Een nieuwe visit begint waar de track van cel wisselt
+            change = np.ones(len(ix), dtype=bool)
+            change[1:] = (ix[1:] != ix[:-1]) | (iy[1:] != iy[:-1])
+            change[:first] = False
+            if first:
+                change[first] = True
+            starts = np.flatnonzero(change)
+            ends = np.append(starts[1:], len(ix))
+
+            for s, e in zip(starts, ends):
+                # Segment vanaf de vorige fix hoort bij deze visit, tenzij er een gat in de track zit
+                lead = s > 0 and ts[s] - ts[s - 1] <= self.merge_gap
+                lo = s - 1 if lead else s
+                self._register(_Visit(file_id, ts[lo:e].copy(), lat[lo:e].copy(), lon[lo:e].copy(), bool(lead)))
+
+            self._last[file_id] = max(self._last.get(file_id, -math.inf), float(ts.max()))
+            self._tail[file_id] = (float(ts[-1]), float(lat[-1]), float(lon[-1]))
+            return len(starts)
+
+    def _visits(self, lat0, lon0, lat1, lon1) -> List[_Visit]:
+        """Visits whose bounding box overlaps the query box"""
+        (x0, y0), (x1, y1) = self._cell_of(lat0, lon0), self._cell_of(lat1, lon1)
+        with self._lock:
+            numbers = {n for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) for n in self._cells.get((x, y), ())}
+            visits = [self._visit_list[n] for n in sorted(numbers)]
+        return [visit for visit in visits
+                if visit.lat1 >= lat0 and visit.lat0 <= lat1
+                and visit.lon1 >= lon0 and visit.lon0 <= lon1]
+
+    def _hits(self, windows) -> List[ClipHit]:
+        """Merge ``(file, t0, t1)`` windows per file"""
+        per_file = defaultdict(list)
+        for file_id, t0, t1 in windows:
+            per_file[file_id].append((t0, t1))
+
+        hits = []
+        for file_id, windows in per_file.items():
+            entry = self.files[file_id]
+            windows.sort()
+            t0, t1 = windows[0]
+            for w0, w1 in windows[1:]:
+                if w0 - t1 <= self.merge_gap:
+                    t1 = max(t1, w1)
+                else:
+                    hits.append(ClipHit(entry.name, entry.starttime, entry.parentfile, t0, t1))
+                    t0, t1 = w0, w1
+            hits.append(ClipHit(entry.name, entry.starttime, entry.parentfile, t0, t1))
+
+        return sorted(hits, key=lambda h: h.t0)
+
+    def bbox(self, lat0, lon0, lat1, lon1) -> List[ClipHit]:
+        """Recordings with fixes inside the box, with the times of those fixes"""
+        lat0, lat1 = min(lat0, lat1), max(lat0, lat1)
+        lon0, lon1 = min(lon0, lon1), max(lon0, lon1)
+        windows = []
+        for visit in self._visits(lat0, lon0, lat1, lon1):
+            own = slice(1 if visit.lead else 0, None)
+            inside = ((visit.lat[own] >= lat0) & (visit.lat[own] <= lat1)
+                      & (visit.lon[own] >= lon0) & (visit.lon[own] <= lon1))
+            windows += [(visit.file, t, t) for t in visit.ts[own][inside].tolist()]
+        return self._hits(windows)
+
+    def _inside(self, visit: _Visit, lat, lon, meters) -> List[Tuple[float, float]]:
+        """Time windows in which the visit's track is within ``meters`` of (lat, lon)"""
+        # Lokale vlakke benadering in meters rond het querypunt, ruim nauwkeurig voor straal << aardstraal
+        scale = math.radians(1) * EARTH_RADIUS_M
+        x = (visit.lon - lon) * scale * math.cos(math.radians(lat))
+        y = (visit.lat - lat) * scale
+        r2 = meters * meters
+
+        windows = [(t, t) for t in visit.ts[x * x + y * y <= r2].tolist()]
+        if len(x) < 2:
+            return windows
+
+        # Segmenten: |p + u*d| <= r oplossen voor u in [0, 1]
+        dx, dy, dt = np.diff(x), np.diff(y), np.diff(visit.ts)
+        a = dx * dx + dy * dy
+        b = 2 * (x[:-1] * dx + y[:-1] * dy)
+        c = x[:-1] ** 2 + y[:-1] ** 2 - r2
+        disc = b * b - 4 * a * c
+        ok = (a > 0) & (dt <= self.merge_gap) & (disc >= 0)
+        if not ok.any():
+            return windows
+        a, b, disc, t, dt = a[ok], b[ok], disc[ok], visit.ts[:-1][ok], dt[ok]
+        root = np.sqrt(disc)
+        u0 = np.clip((-b - root) / (2 * a), 0, 1)
+        u1 = np.clip((-b + root) / (2 * a), 0, 1)
+        cross = ((-b + root) >= 0) & ((-b - root) <= 2 * a)
+        windows += list(zip((t + u0 * dt)[cross].tolist(), (t + u1 * dt)[cross].tolist()))
+        return windows
+
+    def radius(self, lat, lon, meters) -> List[ClipHit]:
+        """Recordings that came within ``meters`` of (lat, lon), with the time they were that close"""
+        dlat = math.degrees(meters / EARTH_RADIUS_M)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        windows = []
+        for visit in self._visits(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+            windows += [(visit.file, t0, t1) for t0, t1 in self._inside(visit, lat, lon, meters)]
+        return self._hits(windows)
+
+    def update(self, fetcher) -> int:
+        """Index new and grown GPS files from the device's file list"""
+        filereq = fetcher.dashcam.gpsfilelistreq()
+        added = 0
+        for entry in filereq.file:
+            if entry.type != "49":
+                continue
+            file_id = self._file_ids.get(entry.name)
+            if file_id is not None and self.files[file_id].endtime == entry.endtime:
+                continue
+            try:
+                added += self.add(entry, fetcher.fetch_track(entry))
+            except Exception as e:
+                logging.warning(f"[warning] Failed to index {entry.name}: {e}")
+        return added
+
+    def save(self, path):
+        """Write the index to a JSON file"""
+        with self._lock:
+            data = {
+                "format": self.FORMAT,
+                "cell": self.cell,
+                "files": [asdict(f) for f in self.files],
+                "last": {str(k): v for k, v in self._last.items()},
+                "tail": {str(k): v for k, v in self._tail.items()},
+                "visits": [[v.file, v.ts.tolist(), v.lat.tolist(), v.lon.tolist(), v.lead] for v in self._visit_list],
+            }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, merge_gap=30.0) -> "SpatialIndex":
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("format") != cls.FORMAT:
+            # Oude indexen bewaarden alleen bounding boxes, niet de fixes
+            raise RuntimeError(f"[error] {path} was written by an older SpatialIndex, rebuild it with update()")
+
+        index = cls(cell=data["cell"], merge_gap=merge_gap)
+        index.files = [FileEntry(**f) for f in data["files"]]
+        index._file_ids = {f.name: i for i, f in enumerate(index.files)}
+        index._last = {int(k): v for k, v in data["last"].items()}
+        index._tail = {int(k): tuple(v) for k, v in data["tail"].items()}
+        for file, ts, lat, lon, lead in data["visits"]:
+            index._register(_Visit(file, np.array(ts), np.array(lat), np.array(lon), lead))
+        return index
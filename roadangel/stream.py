@@ -0,0 +1,308 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+import cv2
+import numpy as np
+
+
+class ReadMode:
+    LATEST = "latest"  # alleen het nieuwste frame, oudere vervallen
+    EVERY = "every"    # elk frame in volgorde, zolang de buffer het bijhoudt
+
+
+@dataclass(slots=True)
+class Frame:
+    image: np.ndarray
+    seq: int
+    captured: float  # time.monotonic() when the decoder handed it over
+    pts: Optional[float] = None  # stream timestamp in seconds, None when the capture reports none
+
+
+@dataclass
+class StreamStats:
+    received: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    # Seconden van decode tot read(); vertraging van camera en netwerk zit er niet in
+    read_delay_avg: float = 0.0
+    read_delay_max: float = 0.0
+    # Seconden dat read() achterloopt op de stream zelf (PTS tegen de klok), zie LiveStream
+    latency_avg: float = 0.0
+    latency_max: float = 0.0
+    fps: float = 0.0           # decode rate over the last second
+
+
+class LiveStream:
+    """Decodes a HaloPro live stream on a background thread into a ring buffer.
+
+    Consumers never block the decoder: with ``ReadMode.LATEST`` a slow
+    consumer simply skips to the newest frame, with ``ReadMode.EVERY`` it
+    gets frames in order and the oldest are dropped once the buffer is full.
+
+    ``stats.latency_*`` compares each frame's stream timestamp (PTS) with
+    the clock at ``read()``. The camera's own clock is not visible, so the
+    frame that arrived fastest so far counts as zero lag: the fixed encode
+    and network delay is left out, everything that piles up on top of it
+    (network stalls, OpenCV, the ring buffer, the consumer) is measured.
+    Without PTS it falls back to the decode time, like ``read_delay_*``::
+
+        with LiveStream(halo.stream_url) as stream:
+            while True:
+                frame = stream.read(timeout=1)
+                if frame is not None:
+                    process(frame.image)
+    """
+
+    def __init__(self, url, mode=ReadMode.LATEST, buffer_size=8, fps=30,
+                 capture_factory: Callable[[str], "cv2.VideoCapture"] = cv2.VideoCapture):
+        self.url = url
+        self.mode = mode
+        self.fps = fps
+        self.capture_factory = capture_factory
+
+        self._buffer = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._cap = None
+
+        self.seq = 0
+        self.error: Optional[str] = None
+        self.last_frame_time: Optional[float] = None
+        self._stats = StreamStats()
+        self._delay_total = 0.0
+        self._latency_total = 0.0
+        self._pts_offset: Optional[float] = None
+        self._recent = deque(maxlen=120)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self.error = None
+        # Nieuwe capture, nieuwe tijdlijn
+        self._pts_offset = None
+        self._thread = threading.Thread(target=self._run, name="livestream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            # Een thread die vastzit in cap.read() blijft zichtbaar via running
+            if not self._thread.is_alive():
+                self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _open(self):
+        cap = self.capture_factory(self.url)
+        cap.set(cv2.CAP_PROP_FPS, self.fps)
+        # Zo min mogelijk frames in de buffer van OpenCV zelf
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _decode(self, cap):
+        """One frame from the capture, or None when the stream ended"""
+        ok, image = cap.read()
+        return image if ok else None
+
+    def _pts(self, cap) -> Optional[float]:
+        """Stream timestamp of the frame just decoded, in seconds"""
+        msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        # Backends zonder PTS geven steeds 0 (of -1); alleen het eerste frame mag op 0 staan
+        if msec is None or msec < 0 or (msec == 0 and self._pts_offset is not None):
+            return None
+        return msec / 1000
+
+    def _run(self):
+        try:
+            self._cap = cap = self._open()
+            while not self._stop.is_set():
+                image = self._decode(cap)
+                if image is None:
+                    if self._stop.is_set():
+                        break
+                    self.error = "no frame received"
+                    logging.info("⚠️ Frame niet ontvangen, probeer opnieuw...")
+                    break
+                self._push(image, self._pts(cap))
+        except Exception as e:
+            self.error = str(e)
+            logging.warning(f"[warning] Livestream {self.url} failed: {e}")
+        finally:
+            if self._cap is not None:
+                self._cap.release()
+                self._cap = None
+            with self._cond:
+                self._cond.notify_all()
+
+    def _push(self, image, pts=None):
+        now = time.monotonic()
+        with self._cond:
+            self.seq += 1
+            if pts is not None:
+                # Snelst aangekomen frame tot nu toe bepaalt het nulpunt
+                offset = now - pts
+                if self._pts_offset is None or offset < self._pts_offset:
+                    self._pts_offset = offset
+            if len(self._buffer) == self._buffer.maxlen:
+                self._stats.dropped += 1
+            self._buffer.append(Frame(image, self.seq, now, pts))
+            self._stats.received += 1
+            self.last_frame_time = now
+            self._recent.append(now)
+            self._cond.notify_all()
+
+    def read(self, timeout: float = 0) -> Optional[Frame]:
+        """Next frame according to the read mode; None if nothing arrives within ``timeout``"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    return None
+                self._cond.wait(remaining)
+
+            if self.mode == ReadMode.LATEST:
+                frame = self._buffer.pop()
+                self._stats.dropped += len(self._buffer)
+                self._buffer.clear()
+            else:
+                frame = self._buffer.popleft()
+
+            now = time.monotonic()
+            delay = now - frame.captured
+            self._stats.delivered += 1
+            self._delay_total += delay
+            self._stats.read_delay_max = max(self._stats.read_delay_max, delay)
+
+            origin = frame.captured if frame.pts is None else frame.pts + self._pts_offset
+            latency = now - origin
+            self._latency_total += latency
+            self._stats.latency_max = max(self._stats.latency_max, latency)
+            return frame
+
+    def frames(self, timeout: float = 1) -> Iterator[Frame]:
+        """Iterate over frames until the stream stops"""
+        while self.running or self._buffer:
+            frame = self.read(timeout)
+            if frame is not None:
+                yield frame
+
+    @property
+    def stats(self) -> StreamStats:
+        with self._cond:
+            now = time.monotonic()
+            stats = StreamStats(**vars(self._stats))
+            if stats.delivered:
+                stats.read_delay_avg = self._delay_total / stats.delivered
+                stats.latency_avg = self._latency_total / stats.delivered
+            stats.fps = float(sum(1 for t in self._recent if now - t <= 1.0))
+            return stats
+
+
+@dataclass
+class SamplingStats:
+    grabbed: int = 0          # frames pulled from the stream
+    decoded: int = 0          # frames converted to an image with retrieve()
+    skipped: int = 0          # frames grabbed but never retrieved
+    sample_fps: float = 0.0   # current sampling rate after adaptation
+    grab_time: float = 0.0    # seconds spent in grab()
+    retrieve_time: float = 0.0
+    saved: float = 0.0        # estimated seconds of retrieve() avoided
+
+
+class SampledStream(LiveStream):
+    """LiveStream that hands out about ``sample_fps`` frames per second.
+
+    Every frame is still pulled with ``grab()`` to keep the stream in
+    sync, but ``retrieve()`` (colour conversion and copy into a NumPy
+    image) only runs for sampled frames. With ``adaptive=True`` the rate
+    halves, down to ``min_fps``, while the consumer has not read the
+    previous sample yet, and recovers once it keeps up.
+    """
+
+    def __init__(self, url, sample_fps=1.0, min_fps=0.1, adaptive=True, **kwargs):
+        super().__init__(url, **kwargs)
+        self.sample_fps = sample_fps
+        self.min_fps = min(min_fps, sample_fps)
+        self.adaptive = adaptive
+        self._interval = 1.0 / sample_fps
+        self._next_due = 0.0
+        self._sampling = SamplingStats(sample_fps=sample_fps)
+
+    def _adapt(self):
+        # Ligt het vorige sample nog ongelezen in de buffer, dan kan de consument het niet bijhouden
+        with self._cond:
+            behind = len(self._buffer) > 0
+        if behind:
+            self._interval = min(self._interval * 2, 1.0 / self.min_fps)
+        else:
+            self._interval = max(self._interval * 0.8, 1.0 / self.sample_fps)
+        self._sampling.sample_fps = 1.0 / self._interval
+
+    def _decode(self, cap):
+        stats = self._sampling
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            ok = cap.grab()
+            stats.grab_time += time.perf_counter() - start
+            if not ok:
+                return None
+            stats.grabbed += 1
+
+            now = time.monotonic()
+            if now < self._next_due:
+                stats.skipped += 1
+                continue
+
+            start = time.perf_counter()
+            ok, image = cap.retrieve()
+            stats.retrieve_time += time.perf_counter() - start
+            if not ok:
+                return None
+            stats.decoded += 1
+
+            if self.adaptive:
+                self._adapt()
+            self._next_due = now + self._interval
+            return image
+        return None
+
+    @property
+    def sampling(self) -> SamplingStats:
+        stats = SamplingStats(**vars(self._sampling))
+        if stats.decoded:
+            stats.saved = stats.skipped * stats.retrieve_time / stats.decoded
+        return stats
+
+
+def show_stream(stream: LiveStream, window="Livestream"):
+    """Show a LiveStream in an OpenCV window until 'q' is pressed or the stream stops"""
+    try:
+        for frame in stream.frames():
+            cv2.imshow(window, frame.image)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        # Het venster bestaat niet als het eerste frame al mislukte
+        try:
+            cv2.destroyAllWindows()
+        except cv2.error:
+            pass
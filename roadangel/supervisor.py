@@ -0,0 +1,236 @@
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from .models import SwitchMode
+from .stream import Frame, LiveStream, ReadMode
+
+
+class StreamState:
+    IDLE = "idle"
+    ARMING = "arming"          # live mode aanzetten op de camera
+    CONNECTING = "connecting"  # capture openen, wachten op het eerste frame
+    STREAMING = "streaming"
+    STALLED = "stalled"
+    BACKOFF = "backoff"
+    STOPPED = "stopped"
+
+
+@dataclass
+class SupervisorStats:
+    state: str = StreamState.IDLE
+    ttff: Optional[float] = None               # seconds from start() to the first frame
+    reconnects: int = 0
+    stalls: int = 0
+    arms: int = 0
+    failed_attempts: int = 0
+    reconnect_latency: Optional[float] = None  # last stall -> first frame again
+    reconnect_latency_avg: float = 0.0
+    reconnect_latency_max: float = 0.0
+    abandoned: int = 0        # streams whose capture thread is still stuck after stop
+    abandoned_total: int = 0
+
+
+class StreamSupervisor:
+    """Keeps a live stream running across WiFi hiccups and camera hiccups.
+
+    A stall is detected when no frame arrived for ``frame_deadline``
+    seconds. The first reconnect only rebuilds the capture; live mode is
+    re-armed (``set_applivestate`` + ``set_playbackliveswitch``) only when
+    that does not produce a frame within ``first_frame_deadline``. Between
+    failed attempts it waits with jittered exponential backoff. Commands go
+    through the HaloPro, so a cached session is reused and only renewed when
+    the camera rejects it.
+
+    A stream whose capture thread hangs in ``cap.read()`` is kept aside
+    until the thread returns; with ``max_abandoned`` of those still alive
+    no new capture is opened until one has finished::
+
+        with StreamSupervisor(halo, on_state=print) as live:
+            while True:
+                frame = live.read(timeout=1)
+    """
+
+    def __init__(self, halo, mode=ReadMode.LATEST, buffer_size=8, frame_deadline=2.0,
+                 first_frame_deadline=5.0, backoff_base=0.5, backoff_max=10.0, jitter=0.5,
+                 stream_factory: Optional[Callable[[], LiveStream]] = None,
+                 on_state: Optional[Callable[[str], None]] = None, max_abandoned=4):
+        self.halo = halo
+        self.frame_deadline = frame_deadline
+        self.first_frame_deadline = first_frame_deadline
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.stream_factory = stream_factory or (lambda: halo.live_stream(mode=mode, buffer_size=buffer_size))
+        self.on_state = on_state
+        self.max_abandoned = max_abandoned
+
+        self.stream: Optional[LiveStream] = None
+        self._abandoned: List[LiveStream] = []
+        self.stats = SupervisorStats()
+        self._armed = False
+        self._latency_total = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def state(self) -> str:
+        return self.stats.state
+
+    def _set_state(self, state):
+        if state == self.stats.state:
+            return
+        self.stats.state = state
+        logging.info(f"[info] Stream {self.halo.host}: {state}")
+        if self.on_state is not None:
+            try:
+                self.on_state(state)
+            except Exception as e:
+                logging.warning(f"[warning] on_state callback failed: {e}")
+
+    def start(self) -> "StreamSupervisor":
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"supervisor-{self.halo.host}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._close_stream()
+        self._set_state(StreamState.STOPPED)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def read(self, timeout: float = 0) -> Optional[Frame]:
+        """Next frame of the current stream; keeps waiting across a reconnect up to ``timeout``"""
+        deadline = time.monotonic() + timeout
+        while True:
+            stream = self.stream
+            remaining = deadline - time.monotonic()
+            if stream is not None:
+                frame = stream.read(min(max(remaining, 0), 0.1))
+                if frame is not None:
+                    return frame
+            elif remaining > 0:
+                self._stop.wait(min(remaining, 0.05))
+            if time.monotonic() >= deadline or self._stop.is_set():
+                return None
+
+    def _arm(self):
+        """Make sure there is a session and the camera is in live mode"""
+        self._set_state(StreamState.ARMING)
+        if not self.halo.session_id:
+            self.halo.login()
+        self.halo.set_applivestate(SwitchMode.ON)
+        self.halo.set_playbackliveswitch(SwitchMode.LIVE)
+        self.stats.arms += 1
+        self._armed = True
+
+    def _close_stream(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            # Een vastgelopen cap.read() geeft de thread niet altijd terug, niet eindeloos wachten
+            stream.stop(timeout=0.5)
+            if stream.running:
+                logging.warning(f"[warning] Capture of {self.halo.host} did not stop, keeping it aside")
+                self._abandoned.append(stream)
+                self.stats.abandoned_total += 1
+        self._reap()
+
+    def _reap(self) -> int:
+        """Forget abandoned streams whose thread has returned, returns how many are still stuck"""
+        self._abandoned = [s for s in self._abandoned if s.running]
+        self.stats.abandoned = len(self._abandoned)
+        return self.stats.abandoned
+
+    def _connect(self) -> bool:
+        """Open a new capture and wait for its first frame"""
+        self._set_state(StreamState.CONNECTING)
+        self._close_stream()
+        stream = self.stream_factory()
+        stream.start()
+        self.stream = stream
+
+        deadline = time.monotonic() + self.first_frame_deadline
+        while time.monotonic() < deadline and not self._stop.is_set():
+            if stream.last_frame_time is not None:
+                return True
+            if not stream.running:
+                break
+            self._stop.wait(0.01)
+        return False
+
+    def _watch(self):
+        """Return once the stream stalled or stopped"""
+        stream = self.stream
+        interval = min(self.frame_deadline / 4, 0.25)
+        while not self._stop.wait(interval):
+            last = stream.last_frame_time or 0.0
+            if not stream.running or time.monotonic() - last > self.frame_deadline:
+                return
+
+    def _backoff(self, attempt) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** max(attempt - 1, 0))
+        # Jitter zodat een hele vloot niet tegelijk opnieuw verbindt
+        return delay * (1 - self.jitter * random.random())
+
+    def _run(self):
+        started = time.monotonic()
+        stalled_at = None
+        attempt = 0
+
+        while not self._stop.is_set():
+            try:
+                self._close_stream()
+                if self.stats.abandoned >= self.max_abandoned:
+                    # Niet nog een capture openen (of armen) zolang er te veel vastzitten
+                    raise RuntimeError(f"{self.stats.abandoned} captures still stuck")
+                # Eerste poging na een stall zonder opnieuw te armen
+                if not self._armed or attempt > 0:
+                    self._arm()
+                connected = self._connect()
+            except Exception as e:
+                logging.warning(f"[warning] Stream {self.halo.host} reconnect failed: {e}")
+                connected = False
+
+            if self._stop.is_set():
+                break
+
+            if connected:
+                now = time.monotonic()
+                if self.stats.ttff is None:
+                    self.stats.ttff = now - started
+                if stalled_at is not None:
+                    latency = now - stalled_at
+                    self.stats.reconnects += 1
+                    self.stats.reconnect_latency = latency
+                    self._latency_total += latency
+                    self.stats.reconnect_latency_avg = self._latency_total / self.stats.reconnects
+                    self.stats.reconnect_latency_max = max(self.stats.reconnect_latency_max, latency)
+                attempt = 0
+                self._set_state(StreamState.STREAMING)
+
+                self._watch()
+                if self._stop.is_set():
+                    break
+                self.stats.stalls += 1
+                stalled_at = time.monotonic()
+                self._set_state(StreamState.STALLED)
+                continue
+
+            attempt += 1
+            self.stats.failed_attempts += 1
+            self._set_state(StreamState.BACKOFF)
+            self._stop.wait(self._backoff(attempt))
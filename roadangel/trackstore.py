@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from .models import FileEntry
+from .nmea import GpsTrack
+
+# Kolom -> dtype op schijf, little endian zodat de bestanden overdraagbaar zijn
+COLUMNS = {
+    "timestamp": np.dtype("<f8"),
+    "latitude": np.dtype("<f8"),
+    "longitude": np.dtype("<f8"),
+    "valid": np.dtype("bool"),
+    "speed": np.dtype("<f4"),
+    "course": np.dtype("<f4"),
+}
+
+# Elke INDEX_STRIDE-de timestamp komt in de sparse index
+INDEX_STRIDE = 4096
+
+
+def _index_rows(rows) -> int:
+    return (rows + INDEX_STRIDE - 1) // INDEX_STRIDE
+
+
+class DeviceTrack:
+    """Column files of one device: ``<column>.bin``, ``index.bin`` and ``meta.json``.
+
+    Rows are kept sorted by timestamp, so a time range is a binary search on
+    the sparse index, a binary search inside one block, and a slice of the
+    memory-mapped columns. An out-of-order append writes a new generation
+    (``<column>.<n>.bin``) and switches to it by saving meta.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._meta_path = self.path / "meta.json"
+        self.meta = self._load_meta()
+        self._maps: Dict[str, np.memmap] = {}
+        self._mapped_rows = -1
+
+    def _load_meta(self):
+        try:
+            return json.loads(self._meta_path.read_text())
+        except FileNotFoundError:
+            return {"rows": 0, "files": {}}
+
+    def _save_meta(self):
+        tmp = self._meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.meta))
+        os.replace(tmp, self._meta_path)
+
+    def refresh(self):
+        """Pick up rows appended by another process"""
+        self.meta = self._load_meta()
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def _column_path(self, name, generation=None) -> Path:
+        # Generatie 0 is de oorspronkelijke layout, na een merge komen er nieuwe bestanden
+        generation = self.meta.get("generation", 0) if generation is None else generation
+        return self.path / (f"{name}.bin" if generation == 0 else f"{name}.{generation}.bin")
+
+    def _map(self, name) -> np.ndarray:
+        """Read-only memory map of a column, remapped after appends"""
+        rows = len(self)
+        mapped = (rows, self.meta.get("generation", 0))
+        if self._mapped_rows != mapped:
+            self._maps = {}
+            self._mapped_rows = mapped
+        if rows == 0:
+            return np.empty(0, dtype=COLUMNS.get(name, np.dtype("<f8")))
+        if name not in self._maps:
+            dtype = COLUMNS.get(name, np.dtype("<f8"))
+            count = rows if name != "index" else _index_rows(rows)
+            self._maps[name] = np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(count,))
+        return self._maps[name]
+
+    def _truncate(self, name, size):
+        """Cut bytes past ``size`` left behind by an append that crashed before meta was saved"""
+        path = self._column_path(name)
+        try:
+            if path.stat().st_size > size:
+                logging.warning(f"[warning] Dropping {path.stat().st_size - size} orphan bytes from {path}")
+                os.truncate(path, size)
+        except FileNotFoundError:
+            pass
+
+    def _append_columns(self, track: GpsTrack):
+        rows = len(self)
+        for name, dtype in COLUMNS.items():
+            self._truncate(name, rows * dtype.itemsize)
+            with open(self._column_path(name), "ab", buffering=1024 * 1024) as f:
+                f.write(np.ascontiguousarray(getattr(track, name), dtype=dtype).tobytes())
+
+        # Sparse index bijwerken met alleen de nieuwe strides
+        self._truncate("index", _index_rows(rows) * 8)
+        first = _index_rows(rows) * INDEX_STRIDE - rows
+        with open(self._column_path("index"), "ab") as f:
+            f.write(np.ascontiguousarray(track.timestamp[first::INDEX_STRIDE], dtype="<f8").tobytes())
+
+    def _rewrite_columns(self, track: GpsTrack) -> int:
+        """Write ``track`` as the next generation of column files, returns that generation.
+
+        Readers keep their memory maps on the old files; they are only
+        removed after meta points at the new ones.
+        """
+        generation = self.meta.get("generation", 0) + 1
+        columns = dict(COLUMNS, index=np.dtype("<f8"))
+        for name, dtype in columns.items():
+            values = track.timestamp[::INDEX_STRIDE] if name == "index" else getattr(track, name)
+            path = self._column_path(name, generation)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb", buffering=1024 * 1024) as f:
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            os.replace(tmp, path)
+        return generation
+
+    def append(self, track: GpsTrack, files: Optional[Dict[str, dict]] = None):
+        """Add fixes; rows without a timestamp are dropped.
+
+        ``files`` entries are merged into ``meta["files"]`` in the same
+        meta save, which happens last: a crash before it leaves the store
+        at the previous row count.
+        """
+        track = track.select(~np.isnan(track.timestamp))
+        stale = None
+        if len(track):
+            track = track.select(np.argsort(track.timestamp, kind="stable"))
+
+            last = self._map("timestamp")[-1] if len(self) else -np.inf
+            if track.timestamp[0] >= last:
+                self._append_columns(track)
+                self.meta["rows"] += len(track)
+            else:
+                # Ouder dan wat er al staat: samenvoegen in een nieuwe generatie bestanden
+                merged = GpsTrack.concat([self.range(), track])
+                merged = merged.select(np.argsort(merged.timestamp, kind="stable"))
+                stale = self.meta.get("generation", 0)
+                self.meta["generation"] = self._rewrite_columns(merged)
+                self.meta["rows"] = len(merged)
+
+        if files:
+            self.meta["files"].update(files)
+        if len(track) or files:
+            self._save_meta()
+            self._maps = {}
+            self._mapped_rows = -1
+
+        if stale is not None:
+            for name in (*COLUMNS, "index"):
+                try:
+                    self._column_path(name, stale).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def range(self, t0=-np.inf, t1=np.inf) -> GpsTrack:
+        """Fixes with ``t0 <= timestamp < t1`` as views on the memory maps"""
+        if not len(self):
+            return GpsTrack.empty()
+
+        timestamps = self._map("timestamp")
+        index = self._map("index")
+
+        def locate(t):
+            # Blok via de sparse index, dan binair zoeken binnen het blok
+            block = max(int(np.searchsorted(index, t, side="left")) - 1, 0)
+            lo = block * INDEX_STRIDE
+            hi = min(lo + INDEX_STRIDE + 1, len(timestamps))
+            return lo + int(np.searchsorted(timestamps[lo:hi], t, side="left"))
+
+        start, stop = locate(t0), locate(t1)
+        return GpsTrack(*(self._map(name)[start:stop] for name in COLUMNS))
+
+
+class TrackStore:
+    """On-disk GPS history per device, fed from GPSFetcher downloads.
+
+    ``root/<device>/`` holds fixed-width binary column files that are read
+    through ``mmap``, plus a sparse time index, so "fixes between t0 and t1
+    for device X" never re-parses .gpx text::
+
+        store = TrackStore("/var/lib/roadangel/tracks")
+        store.sync(fetcher)
+        track = store.fixes(fetcher.host, t0, t1)
+
+    Meant for a single writer per device. Readers in other processes see new
+    rows after ``store.device(host).refresh()``.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._devices: Dict[str, DeviceTrack] = {}
+        self._lock = threading.Lock()
+
+    def device(self, device: str) -> DeviceTrack:
+        with self._lock:
+            if device not in self._devices:
+                # Host "193.168.0.1:80" als mapnaam
+                self._devices[device] = DeviceTrack(self.root / device.replace(":", "_").replace("/", "_"))
+            return self._devices[device]
+
+    def fixes(self, device: str, t0=-np.inf, t1=np.inf) -> GpsTrack:
+        """Fixes of ``device`` with ``t0 <= timestamp < t1`` (UTC epoch seconds)"""
+        return self.device(device).range(t0, t1)
+
+    def append(self, device: str, track: GpsTrack, entry: Optional[FileEntry] = None):
+        """Store parsed fixes, optionally recording the file they came from.
+
+        For a file that was stored before (and grew since), only fixes newer
+        than the last stored one of that file are added.
+        """
+        store = self.device(device)
+
+        if entry is not None:
+            known = store.meta["files"].get(entry.name)
+            if known and known.get("last") is not None:
+                track = track.select(track.timestamp > known["last"])
+
+        files = None
+        if entry is not None:
+            stamps = track.timestamp[~np.isnan(track.timestamp)]
+            previous = store.meta["files"].get(entry.name, {})
+            files = {entry.name: {
+                "starttime": entry.starttime,
+                "endtime": entry.endtime,
+                "parentfile": entry.parentfile,
+                "rows": previous.get("rows", 0) + len(stamps),
+                "last": float(stamps.max()) if len(stamps) else previous.get("last"),
+            }}
+
+        # Rijen en bestandsadministratie in een meta-save
+        store.append(track, files)
+
+    def ingest(self, fetcher, entry: FileEntry, device: Optional[str] = None) -> int:
+        """Download one .gpx through ``fetcher`` and append its fixes, returns the row count"""
+        device = device or fetcher.host
+        known = self.device(device).meta["files"].get(entry.name)
+        if known and known["endtime"] == entry.endtime:
+            return 0
+
+        before = len(self.device(device))
+        self.append(device, fetcher.fetch_track(entry), entry)
+        return len(self.device(device)) - before
+
+    def sync(self, fetcher, device: Optional[str] = None) -> int:
+        """Ingest every new or grown GPS file from the device's file list"""
+        filereq = fetcher.dashcam.gpsfilelistreq()
+        added = 0
+        for entry in filereq.file:
+            if entry.type != "49":
+                continue
+            try:
+                added += self.ingest(fetcher, entry, device)
+            except Exception as e:
+                logging.warning(f"[warning] Failed to ingest {entry.name}: {e}")
+        return added
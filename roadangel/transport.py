@@ -0,0 +1,63 @@
+import logging
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HaloTransport:
+    """Pooled keep-alive HTTP transport to a single HaloPro.
+
+    All commands share one ``requests.Session`` so the TCP connection to the
+    camera's web server is reused instead of being re-established per call.
+    Session headers and cookies are set once after the handshake.
+    """
+
+    def __init__(self, host, pool_connections=1, pool_maxsize=4, timeout=5, max_retries=0):
+        self.host = host
+        self.timeout = timeout
+        self.base_url = f"http://{self.host}"
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+        )
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive',
+        })
+
+    def set_session(self, session_id: Optional[str]):
+        """Attach (or clear) the session id on every following request"""
+        self.session.headers.pop('SessionID', None)
+        self.session.cookies.clear()
+        if session_id:
+            self.session.headers['SessionID'] = session_id
+            self.session.cookies.set('Cookie', f'JSESSIONID={session_id}')
+
+    def command_url(self, cmd: str) -> str:
+        return f"{self.base_url}/vcam/cmd.cgi?cmd={cmd}"
+
+    def command(self, cmd: str, payload=None, timeout=None) -> requests.Response:
+        """POST a ``cmd.cgi`` command and return the raw response"""
+        response = self.session.post(self.command_url(cmd), data=payload, timeout=timeout or self.timeout)
+        response.raise_for_status()
+        logging.debug(f"[debug] {cmd} -> {response.status_code} ({len(response.content)} bytes)")
+        return response
+
+    def get(self, path: str, timeout=None, **kwargs) -> requests.Response:
+        """GET a file served by the camera, e.g. a ``.gpx`` from the file list"""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        return self.session.get(url, timeout=timeout or self.timeout, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
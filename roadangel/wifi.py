@@ -2,36 +2,31 @@ import subprocess
 import re
 import logging
 import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
 
 WIFI_REGEX = re.compile(r"^WiFi_\d{4}HaloPro$")
+DEFAULT_PASSWORDS = ("HaloPro1234", "1234567890")
 
-def list_networks():
+def list_networks(runner=None):
     """List alle zichtbare wifi SSID's die matchen op WiFi_####HaloPro."""
-    result = subprocess.run(
-        ["nmcli", "-t", "-f", "SSID", "dev", "wifi"],
-        capture_output=True, text=True, check=True
-    )
+    result = (runner or NmcliRunner()).run(["-t", "-f", "SSID", "dev", "wifi"])
+    result.check_returncode()
     networks = result.stdout.strip().split('\n')
     filtered = [ssid for ssid in networks if WIFI_REGEX.match(ssid)]
     return filtered
 
-def connect_to_wifi(ssid, password, timeout=10):
+def connect_to_wifi(ssid, password, timeout=10, runner=None):
     """Verbind headless met een WiFi-netwerk en fail hard als het niet binnen <timeout> seconden lukt."""
+    runner = runner or NmcliRunner()
     try:
         # Oude verbinding verwijderen om credential popups te vermijden
-        subprocess.run(
-            ["nmcli", "connection", "delete", ssid],
-            capture_output=True, text=True
-        )
+        runner.run(["connection", "delete", ssid])
     except Exception:
         pass  # niet erg als hij nog niet bestaat
 
     try:
-        result = subprocess.run(
-            ["nmcli", "device", "wifi", "connect", ssid, "password", password],
-            capture_output=True, text=True,
-            timeout=timeout
-        )
+        result = runner.run(["device", "wifi", "connect", ssid, "password", password], timeout=timeout)
     except subprocess.TimeoutExpired:
         raise RuntimeError(f"Timeout: Verbinden niet gelukt binnen {timeout} seconden.")
 
@@ -40,25 +35,183 @@ def connect_to_wifi(ssid, password, timeout=10):
     return True
 
 
-def auto_connect():
-    # Keep scanning until we find matches
-    while True:
-        matches = list_networks()
-        if matches:
-            break  # Found networks, exit the scanning loop
-        logging.warning("[warning] Geen geschikte netwerken gevonden. Opnieuw scannen in 5 seconden...")
-        time.sleep(5)
-    
-    ssid = matches[0]
-    logging.info(f"[info] Verbinden met: {ssid}")
-    passwords = ["HaloPro1234", "1234567890"]
-    
-    for pw in passwords:
+class NmcliRunner:
+    """Runs ``nmcli``; replace it with an object that has the same ``run`` to fake NetworkManager"""
+
+    def run(self, args: List[str], timeout=None) -> subprocess.CompletedProcess:
+        return subprocess.run(["nmcli", *args], capture_output=True, text=True, timeout=timeout)
+
+
+def _split_terse(line) -> List[str]:
+    """Fields of one ``nmcli -t`` line, ``\\:`` is an escaped colon"""
+    return [f.replace("\x00", ":") for f in line.replace("\\:", "\x00").split(":")]
+
+
+class CredentialCache:
+    """Remembers in memory which password worked per SSID.
+
+    Nothing is written to disk. Across runs the NetworkManager profile of
+    the SSID, with the secret in NetworkManager's own store, is brought up
+    again instead; this cache only saves attempts within one process, e.g.
+    after a profile with a stale password was recreated.
+    """
+
+    def __init__(self):
+        self._passwords: Dict[str, str] = {}
+
+    def get(self, ssid) -> Optional[str]:
+        return self._passwords.get(ssid)
+
+    def put(self, ssid, password):
+        self._passwords[ssid] = password
+
+    def forget(self, ssid):
+        self._passwords.pop(ssid, None)
+
+
+@dataclass
+class AttachResult:
+    ssid: str
+    elapsed: float           # time-to-attach, from the first scan until connected
+    scan_time: float = 0.0
+    scans: int = 0
+    attempts: int = 0        # nmcli connect/up calls
+    reused_profile: bool = False
+
+
+class WifiManager:
+    """Attaches to a HaloPro access point as fast as NetworkManager allows.
+
+    An existing NetworkManager profile for the SSID is brought up first;
+    it keeps the password of the last successful connect. Otherwise the
+    password that worked earlier in this process (see CredentialCache) is
+    tried before the other ``passwords``. Scans ask NetworkManager for an
+    explicit rescan instead of waiting for its periodic one. All ``nmcli``
+    calls go through ``runner``::
+
+        manager = WifiManager()
+        result = manager.auto_connect(timeout=60)
+        print(result.ssid, result.elapsed)
+    """
+
+    def __init__(self, runner=None, credentials: CredentialCache = None, passwords: Iterable[str] = DEFAULT_PASSWORDS,
+                 pattern=WIFI_REGEX, connect_timeout=10, scan_interval=1.0):
+        self.runner = runner or NmcliRunner()
+        self.credentials = credentials if credentials is not None else CredentialCache()
+        self.passwords = tuple(passwords)
+        self.pattern = pattern
+        self.connect_timeout = connect_timeout
+        self.scan_interval = scan_interval
+        self.last: Optional[AttachResult] = None
+        self.scan_count = 0
+
+    def _run(self, args, timeout=None) -> Optional[subprocess.CompletedProcess]:
         try:
-            connect_to_wifi(ssid, pw)
-            logging.info(f"[success] Verbonden met {ssid}")
-            return  # Stop als verbinden lukt
-        except Exception as e:
-            logging.error(f"[error] Verbinden met {ssid} mislukt: {e}")
-    
-    logging.info(f"[error] Alle wachtwoorden geprobeerd, verbinding met {ssid}")
\ No newline at end of file
+            return self.runner.run(args, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logging.warning(f"[warning] nmcli {' '.join(args[:3])} timed out after {timeout}s")
+            return None
+
+    def scan(self, rescan=True) -> List[str]:
+        """Visible SSID's matching ``pattern``, after an explicit rescan"""
+        self.scan_count += 1
+        result = self._run(["-t", "-f", "SSID", "device", "wifi", "list", "--rescan", "yes" if rescan else "no"])
+        if result is None or result.returncode != 0:
+            return []
+        seen = []
+        for line in result.stdout.splitlines():
+            ssid = _split_terse(line)[0]
+            if self.pattern.match(ssid) and ssid not in seen:
+                seen.append(ssid)
+        return seen
+
+    def profiles(self) -> List[str]:
+        """Names of the saved wifi connection profiles"""
+        result = self._run(["-t", "-f", "NAME,TYPE", "connection", "show"])
+        if result is None or result.returncode != 0:
+            return []
+        names = []
+        for line in result.stdout.splitlines():
+            fields = _split_terse(line)
+            if len(fields) >= 2 and fields[-1] == "802-11-wireless":
+                names.append(":".join(fields[:-1]))
+        return names
+
+    def wait_for_network(self, timeout=None) -> List[str]:
+        """Rescan until a matching SSID shows up, raises TimeoutError after ``timeout`` seconds"""
+        start = time.monotonic()
+        while True:
+            matches = self.scan()
+            if matches:
+                return matches
+            if timeout is not None and time.monotonic() - start >= timeout:
+                raise TimeoutError(f"No matching network found within {timeout}s")
+            logging.warning("[warning] Geen geschikte netwerken gevonden. Opnieuw scannen...")
+            # NetworkManager weigert te snel opeenvolgende rescans
+            time.sleep(self.scan_interval)
+
+    def connect(self, ssid, start=None) -> AttachResult:
+        """Attach to ``ssid``, reusing its profile or the cached password when possible"""
+        start = time.monotonic() if start is None else start
+        result = AttachResult(ssid, 0.0)
+
+        if ssid in self.profiles():
+            result.attempts += 1
+            up = self._run(["connection", "up", "id", ssid], timeout=self.connect_timeout)
+            if up is not None and up.returncode == 0:
+                result.reused_profile = True
+                return self._attached(result, start)
+            # Profiel met een verouderd wachtwoord, opnieuw aanmaken
+            logging.info(f"[info] Profile for {ssid} did not come up, recreating it")
+            self._run(["connection", "delete", "id", ssid])
+
+        cached = self.credentials.get(ssid)
+        candidates = [cached] if cached else []
+        candidates += [pw for pw in self.passwords if pw != cached]
+
+        for password in candidates:
+            result.attempts += 1
+            done = self._run(["device", "wifi", "connect", ssid, "password", password], timeout=self.connect_timeout)
+            if done is not None and done.returncode == 0:
+                self.credentials.put(ssid, password)
+                return self._attached(result, start)
+            logging.error(f"[error] Verbinden met {ssid} mislukt: {done.stderr.strip() if done else 'timeout'}")
+            if password == cached:
+                self.credentials.forget(ssid)
+            # Mislukte poging laat een profiel achter dat de volgende zou hergebruiken
+            self._run(["connection", "delete", "id", ssid])
+
+        raise RuntimeError(f"[error] Alle wachtwoorden geprobeerd, geen verbinding met {ssid}")
+
+    def _attached(self, result: AttachResult, start) -> AttachResult:
+        result.elapsed = time.monotonic() - start
+        self.last = result
+        logging.info(f"[success] Verbonden met {result.ssid} in {result.elapsed:.2f}s "
+                     f"({result.attempts} attempt(s), profile reused: {result.reused_profile})")
+        return result
+
+    def auto_connect(self, timeout=None) -> AttachResult:
+        """Wait for a matching network and attach, preferring SSID's we connected to before"""
+        start = time.monotonic()
+        scans = self.scan_count
+        matches = self.wait_for_network(timeout)
+        scan_time = time.monotonic() - start
+
+        known = set(self.profiles())
+        matches.sort(key=lambda ssid: not (ssid in known or self.credentials.get(ssid)))
+        ssid = matches[0]
+        logging.info(f"[info] Verbinden met: {ssid}")
+
+        result = self.connect(ssid, start=start)
+        result.scan_time = scan_time
+        result.scans = self.scan_count - scans
+        return result
+
+
+def auto_connect(timeout=None) -> Optional[AttachResult]:
+    """Connect to the first HaloPro network with WifiManager, None when that fails"""
+    try:
+        return WifiManager().auto_connect(timeout)
+    except (RuntimeError, TimeoutError) as e:
+        logging.error(f"{e}")
+        return None
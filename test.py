@@ -3,19 +3,19 @@ from datetime import datetime
 from roadangel import wifi, dashcam
 from roadangel.gps import GPSFetcher
 from roadangel.models import SwitchMode
+from roadangel.session import SessionManager
 
 
 
 
 #wifi.auto_connect()
 
-dashcam = dashcam.HaloPro("193.168.0.1")
-dashcam.get_session()
-dashcam.get_certificate()
+dashcam = dashcam.HaloPro("193.168.0.1", sessions=SessionManager())
+dashcam.login()
 dashcam.get_mailboxdata()
 dashcam.syncdate()
 
-gps = GPSFetcher(dashcam.host)
+gps = GPSFetcher(dashcam)
 
 print(gps.fetch_latest_gps())
 
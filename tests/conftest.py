@@ -0,0 +1,16 @@
+import pytest
+
+from roadangel.simulator import HaloSimulator
+
+
+@pytest.fixture
+def sim():
+    with HaloSimulator(gpx_files=2, gpx_fixes=200) as sim:
+        yield sim
+
+
+@pytest.fixture
+def secure_sim():
+    """A simulator that rejects commands without a session it handed out"""
+    with HaloSimulator(gpx_files=1, gpx_fixes=10, require_session=True) as sim:
+        yield sim
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from roadangel import aio
+from roadangel.dashcam import HaloPro
+from roadangel.session import SessionManager
+
+
+def test_stream_url_drops_http_port():
+    async def build():
+        return aio.AsyncHaloPro("127.0.0.1:8080", stream_port=6201)
+
+    halo = asyncio.run(build())
+    assert halo.stream_url == HaloPro("127.0.0.1:8080", stream_port=6201).stream_url == "tcp://127.0.0.1:6201/"
+
+
+def test_rejected_session_triggers_one_shared_reauth(secure_sim):
+    sessions = SessionManager(persist=False)
+
+    async def run():
+        async with aio.AsyncHaloPro(secure_sim.host, sessions=sessions) as halo:
+            await halo.login()
+            old = halo.session_id
+            secure_sim.sessions.clear()
+            infos = await asyncio.gather(*(halo.get_baseinfo() for _ in range(5)))
+            return old, halo.session_id, infos
+
+    old, new, infos = asyncio.run(run())
+    assert all(info is not None for info in infos)
+    assert new != old and sessions.get(secure_sim.host) == new
+    assert secure_sim.requests["API_RequestSessionID"] == 2
+
+
+def test_login_reuses_session_of_sync_client(secure_sim):
+    sessions = SessionManager(persist=False)
+    secure_sim.halo(sessions=sessions).login()
+
+    async def run():
+        async with aio.AsyncHaloPro(secure_sim.host, sessions=sessions) as halo:
+            await halo.login()
+            return await halo.get_baseinfo()
+
+    assert asyncio.run(run()) is not None
+    assert secure_sim.requests["API_RequestSessionID"] == 1
@@ -0,0 +1,45 @@
+from roadangel.annexb import (NAL_AUD, NAL_IDR, NAL_PPS, NAL_SEI, NAL_SLICE, NAL_SPS, find_nals,
+                              is_keyframe_boundary)
+from roadangel.recorder import StreamRecorder
+
+
+def nal(nal_type, size=8):
+    return b"\x00\x00\x00\x01" + bytes([0x60 | nal_type]) + bytes([0x5A]) * size
+
+
+def boundaries(types):
+    previous, found = None, []
+    for i, nal_type in enumerate(types):
+        if is_keyframe_boundary(nal_type, previous):
+            found.append(i)
+        previous = nal_type
+    return found
+
+
+def test_find_nals_offsets_and_types():
+    data = b"\x00\x00\x01\x67ab" + nal(NAL_PPS, 2) + nal(NAL_SLICE, 2)
+    assert find_nals(data) == [(0, NAL_SPS), (6, NAL_PPS), (13, NAL_SLICE)]
+
+
+def test_one_boundary_per_keyframe():
+    # SPS, PPS, SEI, IDR met twee slices: alleen de SPS
+    assert boundaries([NAL_SPS, NAL_PPS, NAL_SEI, NAL_IDR, NAL_IDR, NAL_SLICE]) == [0]
+    assert boundaries([NAL_AUD, NAL_IDR, NAL_IDR, NAL_SLICE]) == []
+    # Zonder parameter sets: het eerste slice van het IDR-frame
+    assert boundaries([NAL_SLICE, NAL_IDR, NAL_IDR, NAL_SLICE, NAL_IDR]) == [1, 4]
+
+
+def test_recorder_counts_keyframes_with_sei_and_multi_slice_idr(tmp_path):
+    gop = nal(NAL_SPS) + nal(NAL_PPS) + nal(NAL_SEI) + nal(NAL_IDR, 100) + nal(NAL_IDR, 100) + nal(NAL_SLICE) * 5
+    data = nal(NAL_SLICE) + gop * 3
+
+    recorder = StreamRecorder("127.0.0.1", tmp_path, segment_seconds=3600)
+    # In stukken die start codes doorsnijden
+    for i in range(0, len(data), 7):
+        recorder._feed(data[i:i + 7])
+    recorder._close_segment()
+
+    assert recorder.stats.keyframes == 3
+    assert recorder.stats.segments == 1
+    # Het segment begint bij de SPS, het losse P-slice ervoor valt weg; de laatste 3 bytes wachten nog
+    assert recorder.segments[0].path.read_bytes() == (gop * 3)[:-3]
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from roadangel.cache import ResponseCache
+
+
+def test_repeated_read_is_served_from_cache(sim):
+    cache = ResponseCache()
+    halo = sim.halo(cache=cache)
+    first = halo.get_baseinfo()
+    assert halo.get_baseinfo() == first
+    assert sim.requests["API_GetBaseInfo"] == 1
+    assert cache.stats.hits == 1 and cache.stats.misses == 1
+    cache.close()
+
+
+def test_write_invalidates(sim):
+    cache = ResponseCache()
+    halo = sim.halo(cache=cache)
+    halo.get_baseinfo()
+    halo.save_params(string_params={"mic_switch": "off"})
+    halo.get_baseinfo()
+    assert sim.requests["API_GetBaseInfo"] == 2
+    assert cache.stats.invalidations == 1
+    cache.close()
+
+
+def test_stale_entry_is_served_while_refreshing():
+    cache = ResponseCache(ttls={"cmd": 0.05}, stale_ttl=10)
+    values = iter(range(10))
+    assert cache.get("h", "cmd", lambda: next(values)) == 0
+    time.sleep(0.06)
+    # Verouderd: oude waarde meteen terug, verversen op de achtergrond
+    assert cache.get("h", "cmd", lambda: next(values)) == 0
+    deadline = time.monotonic() + 2
+    while cache.stats.refreshes == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get("h", "cmd", lambda: next(values)) == 1
+    assert cache.stats.stale_hits == 1
+    cache.close()
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = ResponseCache(ttls={"cmd": 60})
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("h", "cmd", fetch))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    cache.close()
+
+
+def test_lru_eviction():
+    cache = ResponseCache(ttls={"cmd": 60}, max_entries=2)
+    for host in ("a", "b", "c"):
+        cache.get(host, "cmd", lambda: host)
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+    cache.close()
+
+
+def test_inflight_locks_are_released():
+    cache = ResponseCache(ttls={"cmd": 60})
+    for host in range(50):
+        cache.get(host, "cmd", lambda: host)
+
+    def fail():
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        cache.get("x", "cmd", fail)
+    assert cache._inflight == {}
+    cache.close()
+
+
+def test_invalidation_during_fetch_is_not_undone():
+    cache = ResponseCache(ttls={"cmd": 60})
+    started, release = threading.Event(), threading.Event()
+
+    def slow_fetch():
+        started.set()
+        release.wait(5)
+        return "before write"
+
+    reader = threading.Thread(target=lambda: cache.get("h", "cmd", slow_fetch))
+    reader.start()
+    assert started.wait(5)
+    # Write komt binnen terwijl de lezer nog het oude antwoord ophaalt
+    cache.invalidate("h", "cmd")
+    release.set()
+    reader.join()
+
+    assert len(cache) == 0
+    assert cache.get("h", "cmd", lambda: "after write") == "after write"
+    assert cache._inflight == {}
+    cache.close()
@@ -0,0 +1,49 @@
+from roadangel.config import ConfigManager, diff_params
+from roadangel.fleet import HaloFleet
+from roadangel.models import IntParam, StringParam, SystemParams
+from roadangel.simulator import HaloSimulator
+
+
+def test_diff_only_changed_keys_with_device_types():
+    current = SystemParams([IntParam("speaker_turn", 30)], [StringParam("mic_switch", "on")])
+    diff = diff_params(current, {"speaker_turn": "30", "mic_switch": "off", "new_int": 5, "new_flag": True})
+    assert diff.int_params == {"new_int": 5}
+    assert diff.string_params == {"mic_switch": "off", "new_flag": "True"}
+    assert diff_params(current, {"speaker_turn": 30, "mic_switch": "on"}).empty
+
+
+def test_apply_sends_diff_once(sim):
+    halo = sim.halo()
+    manager = ConfigManager()
+    key, value = next(iter(sim.params["string_params"].items()))
+    desired = {key: value + "-x"}
+
+    report = manager.apply(halo, desired, verify=True)
+    assert report.saved and report.verified
+    assert sim.params["string_params"][key] == value + "-x"
+
+    again = manager.apply(halo, desired)
+    assert not again.saved and again.diff.empty
+    assert sim.requests["API_GeneralSave"] == 1
+    assert sim.requests["API_GeneralQuery"] == 2   # eerste lezing en verify
+
+
+def test_rollout_over_fleet():
+    sims = [HaloSimulator(gpx_files=0).start() for _ in range(3)]
+    try:
+        key = next(iter(sims[0].params["int_params"]))
+        sims[0].params["int_params"][key] = 7
+        fleet = HaloFleet([s.halo() for s in sims], deadline=5)
+        manager = ConfigManager(fleet)
+
+        results = manager.rollout({key: 7})
+        assert all(r.ok for r in results.values())
+        assert [r.value.saved for r in results.values()] == [False, True, True]
+        assert all(s.params["int_params"][key] == 7 for s in sims)
+
+        results = manager.rollout({key: 7})
+        assert not any(r.value.saved for r in results.values())
+        fleet.close()
+    finally:
+        for s in sims:
+            s.stop()
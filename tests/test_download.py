@@ -0,0 +1,66 @@
+import pytest
+
+from roadangel.download import Downloader
+
+
+def test_download_and_skip_on_second_run(tmp_path, sim):
+    halo = sim.halo()
+    entries = halo.gpsfilelistreq().file
+    results = Downloader(halo, tmp_path, workers=2).download(entries)
+    assert all(r.ok and not r.skipped for r in results)
+    for entry in entries:
+        assert (tmp_path / entry.name).read_bytes() == sim.files[entry.name]
+
+    # Nieuw object, manifest van schijf
+    again = Downloader(halo, tmp_path).download(entries)
+    assert all(r.skipped for r in again)
+
+
+def test_resume_from_part_file(tmp_path, sim):
+    halo = sim.halo()
+    entry = halo.gpsfilelistreq().file[0]
+    data = sim.files[entry.name]
+    (tmp_path / (entry.name + ".part")).write_bytes(data[:1000])
+
+    result = Downloader(halo, tmp_path, chunk_size=256).fetch(entry)
+    assert result.ok
+    assert result.resumed_from == 1000
+    assert result.bytes == len(data) - 1000
+    assert (tmp_path / entry.name).read_bytes() == data
+    assert not (tmp_path / (entry.name + ".part")).exists()
+
+
+def test_complete_part_file_is_finished_without_body(tmp_path, sim):
+    halo = sim.halo()
+    entry = halo.gpsfilelistreq().file[0]
+    (tmp_path / (entry.name + ".part")).write_bytes(sim.files[entry.name])
+
+    downloader = Downloader(halo, tmp_path)
+    result = downloader.fetch(entry)
+    assert result.ok and result.bytes == 0
+    assert (tmp_path / entry.name).read_bytes() == sim.files[entry.name]
+    # 416-pad legt ook de tijden vast, anders is het bestand nooit "compleet"
+    assert downloader.is_complete(entry)
+    assert Downloader(halo, tmp_path).fetch(entry).skipped
+
+
+def test_part_file_larger_than_the_file_is_restarted(tmp_path, sim):
+    halo = sim.halo()
+    entry = halo.gpsfilelistreq().file[0]
+    data = sim.files[entry.name]
+    # 416 met een andere grootte dan de .part: niet als compleet behandelen
+    (tmp_path / (entry.name + ".part")).write_bytes(data + b"garbage")
+
+    result = Downloader(halo, tmp_path).fetch(entry)
+    assert result.ok and result.resumed_from == 0 and result.bytes == len(data)
+    assert (tmp_path / entry.name).read_bytes() == data
+    assert sim.requests["GET gpx"] == 2
+
+
+def test_missing_file_and_traversal_are_errors(tmp_path, sim):
+    downloader = Downloader(sim.halo(), tmp_path / "files")
+    results = downloader.download(["does-not-exist.gpx", "../../escape.gpx"])
+    assert [r.ok for r in results] == [False, False]
+    assert not (tmp_path / "escape.gpx").exists()
+    with pytest.raises(ValueError):
+        downloader.local_path("../outside")
@@ -0,0 +1,49 @@
+from roadangel.filesync import ChangeKind, FileListSnapshot, FileListSync
+from roadangel.models import FileEntry
+from roadangel.simulator import synthetic_gpx
+
+
+def kinds(changes):
+    return [(c.kind, c.entry.name) for c in changes]
+
+
+def test_sync_reports_only_changes_and_persists(tmp_path, sim):
+    path = tmp_path / "list.json"
+    sync = FileListSync(sim.halo(), path=path)
+    first, second = (e["name"] for e in sim.file_list)
+    assert kinds(sync.sync()) == [(ChangeKind.ADDED, first), (ChangeKind.ADDED, second)]
+    assert sync.sync() == []
+
+    # Nog bezig met schrijven: endtime verschuift
+    old_end = sim.file_list[1]["endtime"]
+    sim.file_list[1]["endtime"] = "20250723160500"
+    sim.add_gpx("20250723160000_0002.gpx", synthetic_gpx(5))
+    del sim.file_list[0]
+    changes = sync.sync()
+    assert kinds(changes) == [(ChangeKind.GROWN, second), (ChangeKind.ADDED, "20250723160000_0002.gpx"),
+                              (ChangeKind.REMOVED, first)]
+    assert changes[0].previous.endtime == old_end and changes[0].entry.endtime == "20250723160500"
+
+    # Herstart: snapshot van schijf, niets nieuws
+    assert FileListSync(sim.halo(), path=path).sync() == []
+
+
+def test_index_only_change_is_saved_without_event(tmp_path, sim):
+    path = tmp_path / "list.json"
+    sync = FileListSync(sim.halo(), path=path)
+    sync.sync()
+    sim.file_list[0]["index"] = "7"
+    assert sync.sync() == []
+    assert FileListSync(sim.halo(), path=path).snapshot.by_index(7).name == sim.file_list[0]["name"]
+
+
+def test_snapshot_indexes():
+    entries = [FileEntry(str(i), t, f"2025072{i}120000", f"2025072{i}130000", f"{i}.{t}", "")
+               for i, t in enumerate(["49", "2", "49", "2"])]
+    snapshot = FileListSnapshot(entries)
+    assert snapshot.latest().name == "3.2" and snapshot.latest("49").name == "2.49"
+    assert [e.name for e in snapshot.between("20250721", "20250723")] == ["1.2", "2.49"]
+    assert [e.name for e in snapshot.of_type("49")] == ["0.49", "2.49"]
+    assert snapshot.by_index("1").name == "1.2"
+    assert kinds(snapshot.apply(entries[1:])) == [(ChangeKind.REMOVED, "0.49")]
+    assert snapshot.latest("49").name == "2.49" and snapshot.by_index(0) is None
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from roadangel.fleet import HaloFleet
+
+
+class Device:
+    def __init__(self, host, delay=0.0, release=None):
+        self.host = host
+        self.delay = delay
+        self.release = release
+
+    def call(self):
+        if self.release is not None:
+            self.release.wait(5)
+        time.sleep(self.delay)
+        return self.host
+
+    def close(self):
+        pass
+
+
+def test_deadline_counts_from_the_start_of_each_call():
+    # 4 apparaten, 2 workers: de tweede ronde begint pas na de eerste, maar krijgt zijn eigen deadline
+    fleet = HaloFleet([Device(f"h{i}", delay=0.15) for i in range(4)], max_workers=2, deadline=0.25)
+    results = fleet.run(lambda device: device.call())
+    assert all(r.ok for r in results.values())
+    assert all(0.1 < r.elapsed < 0.25 for r in results.values())
+    fleet.close()
+
+
+def test_late_read_times_out_and_queued_device_is_not_started():
+    release = threading.Event()
+    fleet = HaloFleet([Device("stuck", release=release), Device("queued")], max_workers=1, deadline=0.1)
+    results = fleet.run(lambda device: device.call())
+
+    stuck, queued = results["stuck"], results["queued"]
+    assert isinstance(stuck.error, TimeoutError) and stuck.started and stuck.running
+    assert isinstance(queued.error, TimeoutError) and not queued.started and queued.future is None
+    release.set()
+    assert stuck.wait(5).ok and stuck.wait().value == "stuck"
+    fleet.close()
+
+
+def test_late_write_is_not_reported_as_failed():
+    release = threading.Event()
+    fleet = HaloFleet([Device("slow", release=release)], deadline=0.05)
+    result = fleet.run(lambda device: device.call(), write=True)["slow"]
+    assert result.error is None and result.running and not result.ok
+    release.set()
+    assert result.wait(5).value == "slow"
+    fleet.close()
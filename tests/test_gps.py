@@ -0,0 +1,42 @@
+from roadangel.gps import GPSFetcher
+from roadangel.simulator import synthetic_gpx
+
+
+def test_tail_reads_only_new_complete_lines(sim):
+    name = sim.file_list[-1]["name"]
+    data = synthetic_gpx(3)
+    sim.files[name] = data
+    fetcher = GPSFetcher(sim.halo(), tail=True)
+
+    assert len(fetcher._read_new_lines(name)) == 6
+    # Niets nieuws: 416
+    assert fetcher._read_new_lines(name) == []
+
+    more = synthetic_gpx(2, start=3)
+    # Halve regel blijft hangen tot hij af is
+    sim.files[name] = data + more[:-10]
+    assert len(fetcher._read_new_lines(name)) == 3
+    sim.files[name] = data + more
+    lines = fetcher._read_new_lines(name)
+    assert len(lines) == 1 and lines[0].startswith("$GPGGA")
+    assert fetcher._tails[name].offset == len(data + more)
+    assert sim.requests["GET gpx"] == 4
+
+
+def test_tail_restarts_when_the_file_shrank(sim):
+    name = sim.file_list[-1]["name"]
+    fetcher = GPSFetcher(sim.halo(), tail=True)
+    fetcher._read_new_lines(name)
+
+    # Zelfde naam, nieuw en korter bestand: 416 met een kleinere grootte
+    sim.files[name] = synthetic_gpx(1)
+    assert len(fetcher._read_new_lines(name)) == 2
+    assert fetcher._tails[name].offset == len(sim.files[name])
+
+
+def test_fetch_latest_gps_with_tail(sim):
+    fetcher = GPSFetcher(sim.halo(), tail=True)
+    first = fetcher.fetch_latest_gps()
+    assert first is not None and 52 < first["latitude"] < 53 and 6 < first["longitude"] < 7
+    # Geen nieuwe regels: laatst bekende locatie
+    assert fetcher.fetch_latest_gps() == first
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+from roadangel.mailbox import AsyncMailboxPoller, MailboxPoller
+from roadangel.models import AccStatus, HaloResponse
+
+
+class Mailbox:
+    """Fake device: hands out ``script`` in order, then empty responses"""
+
+    def __init__(self, host, script=()):
+        self.host = host
+        self.script = list(script)
+        self.polls = []
+
+    def get_mailbox_response(self):
+        self.polls.append(time.monotonic())
+        return HaloResponse(0, self.script.pop(0) if self.script else "")
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_interval_backs_off_when_idle_and_resets_on_a_message():
+    device = Mailbox("cam", ["", "", "", {"state": 1}])
+    with MailboxPoller(min_interval=0.02, max_interval=0.05, decay=2) as poller:
+        poller.add(device)
+        assert wait_for(lambda: len(device.polls) >= 3)
+        # Drie lege polls: 0.02 -> 0.04 -> 0.05 (max)
+        assert wait_for(lambda: poller.stats[0].interval == 0.05)
+        assert wait_for(lambda: len(device.polls) >= 5)
+    gaps = [b - a for a, b in zip(device.polls, device.polls[1:])]
+    # Na het bericht (vierde poll) weer snel
+    assert gaps[3] < gaps[2] and poller.stats[0].messages == 1
+
+
+def test_duplicates_are_merged_and_callbacks_filter_on_model():
+    acc = {"connetc_acc_status": 1}
+    device = Mailbox("cam", [acc, acc, {"state": 1}, acc])
+    seen, accs = [], []
+
+    with MailboxPoller(min_interval=0.01, dedupe_window=60) as poller:
+        poller.on(lambda host, data, resp: seen.append((host, resp.raw)))
+        poller.on(lambda host, data, resp: accs.append(data), model=AccStatus)
+        poller.add(device)
+        assert wait_for(lambda: len(device.polls) >= 5)
+
+    assert seen == [("cam", acc), ("cam", {"state": 1})]
+    assert len(accs) == 1 and isinstance(accs[0], AccStatus)
+    assert poller.stats[0].duplicates == 2
+
+
+def test_removed_device_is_no_longer_polled():
+    device = Mailbox("cam")
+    with MailboxPoller(min_interval=0.01, max_interval=0.01) as poller:
+        poller.add(device)
+        assert wait_for(lambda: len(device.polls) >= 2)
+        poller.remove("cam")
+        time.sleep(0.05)
+        polls = len(device.polls)
+        time.sleep(0.1)
+        assert len(device.polls) == polls and poller.stats == []
+
+
+def test_async_poller_awaits_coroutine_callbacks():
+    class AsyncMailbox(Mailbox):
+        async def get_mailbox_response(self):
+            return super().get_mailbox_response()
+
+    async def run():
+        device = AsyncMailbox("cam", [{"state": 2}])
+        received = []
+        poller = AsyncMailboxPoller(min_interval=0.01)
+
+        async def handler(host, data, resp):
+            received.append(resp.raw)
+            poller.stop()
+
+        poller.on(handler)
+        poller.add(device)
+        await asyncio.wait_for(poller.run(), 5)
+        return received
+
+    assert asyncio.run(run()) == [{"state": 2}]
@@ -0,0 +1,67 @@
+import pytest
+import requests
+
+from roadangel.metrics import METRICS, CommandEvent, Histogram, Metrics
+
+
+@pytest.fixture
+def metrics():
+    # Globale METRICS aan voor de HaloPro-aanroepen, daarna terug zoals het was
+    enabled = METRICS.enabled
+    METRICS.reset()
+    METRICS.enable()
+    yield METRICS
+    METRICS.enabled = enabled
+    METRICS.reset()
+
+
+def test_histogram_buckets_and_quantiles():
+    hist = Histogram((0.01, 0.1, 1.0))
+    for value in [0.005] * 98 + [0.5, 5.0]:
+        hist.observe(value)
+    assert hist.counts == [98, 0, 1, 1]
+    assert hist.quantile(0.5) == 0.01 and hist.quantile(0.99) == 1.0 and hist.quantile(1.0) == float("inf")
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_render_is_cumulative_and_escapes_labels():
+    metrics = Metrics(enabled=True)
+    metrics.record(CommandEvent('cam"1', "API_GetBaseInfo", 0.003, 10, 200, 0))
+    metrics.record(CommandEvent('cam"1', "API_GetBaseInfo", 0.2, 10, 0, None, retry=True))
+    metrics.observe_parse("DeviceInfo", 2e-5)
+    text = metrics.render()
+
+    labels = 'host="cam\\"1",command="API_GetBaseInfo"'
+    assert f'roadangel_command_seconds_bucket{{{labels},le="0.005"}} 1' in text
+    assert f'roadangel_command_seconds_bucket{{{labels},le="0.25"}} 2' in text
+    assert f'roadangel_command_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"roadangel_command_seconds_count{{{labels}}} 2" in text
+    assert f"roadangel_command_retries_total{{{labels}}} 1" in text
+    assert f"roadangel_command_failures_total{{{labels}}} 1" in text
+    assert f'roadangel_command_errcode_total{{{labels},errcode="0"}} 1' in text
+    assert 'roadangel_parse_seconds_count{model="DeviceInfo"} 1' in text
+    assert text.endswith("\n")
+
+
+def test_halo_commands_are_recorded_and_served(sim, metrics):
+    events = []
+    hook = metrics.add_hook(events.append)
+    try:
+        halo = sim.halo()
+        halo.login()
+        halo.get_baseinfo()
+    finally:
+        metrics.remove_hook(hook)
+
+    summary = metrics.summary()
+    stats = summary[f"{sim.host} API_GetBaseInfo"]
+    assert stats["count"] == 1 and stats["bytes_in"] > 0 and stats["errcodes"] == {0: 1}
+    assert [e.command for e in events] == ["API_RequestSessionID", "API_RequestCertificate", "API_GetBaseInfo"]
+
+    server = metrics.serve(port=0, host="127.0.0.1")
+    try:
+        r = requests.get(f"http://127.0.0.1:{server.server_address[1]}/metrics", timeout=5)
+        assert r.status_code == 200 and "API_GetBaseInfo" in r.text
+        assert requests.get(f"http://127.0.0.1:{server.server_address[1]}/other", timeout=5).status_code == 404
+    finally:
+        metrics.shutdown()
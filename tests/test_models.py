@@ -0,0 +1,33 @@
+from roadangel import models
+from roadangel.models import DeviceInfo, GpsFileReq, HaloResponse, SessionData, resolve_model
+
+
+def test_data_uses_command_model_and_signature():
+    response = HaloResponse(0, '{"acSessionId": "abc"}', "API_RequestSessionID")
+    assert isinstance(response.data, SessionData) and response.data.acSessionId == "abc"
+    # Zonder commando via de keys
+    listing = HaloResponse(0, {"num": 0, "file": []}).data
+    assert isinstance(listing, GpsFileReq)
+
+
+def test_unknown_and_malformed_payloads():
+    assert HaloResponse(0, "").data is None
+    assert HaloResponse(0, {"foo": 1}).data == {"foo": 1}
+    broken = HaloResponse(0, "{not json")
+    assert broken.data == "{not json" and broken.parse_error is not None
+
+
+def test_signature_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(models, "SIGNATURES", dict(models.SIGNATURES))
+    size = len(models.SIGNATURES)
+
+    # Onbekende vormen worden niet onthouden
+    for i in range(100):
+        assert resolve_model({f"key{i}": 1}) is None
+    assert len(models.SIGNATURES) == size
+
+    # Via een regel gevonden vormen wel, maar nooit meer dan MAX_SIGNATURES
+    monkeypatch.setattr(models, "MAX_SIGNATURES", size + 10)
+    for i in range(100):
+        assert resolve_model({"nickname": "", "model": "", "uuid": "", f"extra{i}": 1}) is DeviceInfo
+    assert len(models.SIGNATURES) == size + 10
@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+
+from roadangel.mux import StreamMux
+
+
+class CountingDecoder:
+    """One 'frame' per decode call, enough to see what reaches the decoder"""
+
+    def __init__(self, host=None):
+        self.host = host
+        self.data = bytearray()
+        self.closed = False
+
+    def decode(self, data):
+        self.data += data
+        return [np.zeros((2, 2, 3), dtype=np.uint8)]
+
+    def close(self):
+        self.closed = True
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_unresolvable_host_does_not_stop_other_feeds(sim):
+    decoders = []
+
+    def factory(host):
+        decoders.append(CountingDecoder(host))
+        return decoders[-1]
+
+    with StreamMux(port=sim.stream_port, workers=1, decoder_factory=factory, reconnect_delay=0.1) as mux:
+        mux.add("does-not-resolve.invalid")
+        # HTTP-poort in de host wordt weggelaten
+        with mux.subscribe(sim.host) as sub:
+            assert mux.hosts == ["does-not-resolve.invalid", "127.0.0.1"]
+            assert sub.read(timeout=5) is not None
+        assert mux._thread.is_alive()
+
+    # Decoder begint bij de SPS voor een keyframe
+    assert bytes(decoders[0].data[:5]) == b"\x00\x00\x00\x01\x67"
+
+
+def test_unwatched_feed_is_not_decoded_and_remove_tears_down(sim):
+    with StreamMux(port=sim.stream_port, decoder_factory=CountingDecoder) as mux:
+        mux.add(sim.host)
+        assert wait_for(lambda: mux.stats[0].bytes_received > 0)
+        assert mux.active_decoders == 0 and mux.stats[0].bytes_decoded == 0
+
+        sub = mux.subscribe(sim.host)
+        assert mux.active_decoders == 1
+        sub.close()
+        assert wait_for(lambda: mux.active_decoders == 0)
+
+        mux.remove(sim.host)
+        assert mux.hosts == []
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from roadangel.nmea import GpsTrack, parse_rmc, parse_rmc_file
+from roadangel.simulator import synthetic_gpx
+
+
+def reference(line):
+    """Per-line parse, zoals GPSFetcher het doet"""
+    parts = line.split(",")
+    lat = float(parts[3][:2]) + float(parts[3][2:]) / 60
+    lon = float(parts[5][:3]) + float(parts[5][3:]) / 60
+    return (-lat if parts[4] == "S" else lat), (-lon if parts[6] == "W" else lon), parts[2] == "A"
+
+
+def test_matches_per_line_parse():
+    data = synthetic_gpx(1200)
+    track = parse_rmc(data)
+    rmc = [line for line in data.decode().splitlines() if line.startswith("$GPRMC")]
+    assert len(track) == len(rmc) == 1200
+
+    expected = np.array([reference(line) for line in rmc])
+    np.testing.assert_allclose(track.latitude, expected[:, 0])
+    np.testing.assert_allclose(track.longitude, expected[:, 1])
+    assert (track.valid == expected[:, 2].astype(bool)).all() and track.valid.sum() == 1197
+    assert len(track.valid_only()) == 1197
+
+
+def test_fields_signs_and_missing_values():
+    text = ("$GNRMC,235959.500,A,3351.00000,S,15112.00000,W,,,010124,,,A*00\r\n"
+            "$GPRMC,000001.000,V,5215.00000,N,00648.00000,E,1.5,90.0,,,,A*00\n"
+            "$GPGGA,000001.000,5215.00000,N,00648.00000,E,1,08,0.9,10.0,M,,M,,*00\n"
+            "$GPRMC,000002.000,A,5215.0\n")
+    track = parse_rmc(text)
+    # Afgebroken regel valt weg, GGA telt niet mee
+    assert len(track) == 2
+    assert track.latitude[0] == -(33 + 51 / 60) and track.longitude[0] == -(151 + 12 / 60)
+    expected = datetime(2024, 1, 1, 23, 59, 59, 500000, tzinfo=timezone.utc).timestamp()
+    assert track.timestamp[0] == expected
+    assert np.isnan(track.speed[0]) and np.isnan(track.course[0])
+    # Zonder datum geen tijdstempel
+    assert np.isnan(track.timestamp[1]) and track.speed[1] == np.float32(1.5)
+
+
+def test_empty_concat_and_file(tmp_path):
+    assert len(parse_rmc(b"")) == 0 and len(parse_rmc("no nmea here\n")) == 0
+    path = tmp_path / "track.gpx"
+    path.write_bytes(synthetic_gpx(10))
+    track = parse_rmc_file(path)
+    joined = GpsTrack.concat([track, parse_rmc(synthetic_gpx(5, start=10))])
+    assert len(joined) == 15 and (np.diff(joined.timestamp) == 1).all()
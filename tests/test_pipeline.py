@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+
+from roadangel.pipeline import DropPolicy, Pipeline, Stage
+
+
+def test_batches_keep_order_and_shape():
+    shapes = []
+
+    def detect(batch):
+        shapes.append(batch.shape)
+        return list(batch.sum(axis=(1, 2)))
+
+    frames = [np.full((2, 2), i) for i in range(10)]
+    pipeline = Pipeline(frames, [Stage(detect, batch_size=4, max_wait=0.5)])
+    with pipeline:
+        results = list(pipeline.results(timeout=5))
+    assert [r.data for r in results] == [4 * i for i in range(10)]
+    assert shapes[0] == (4, 2, 2)
+    assert pipeline.stats[0].processed == 10
+
+
+def test_newest_policy_drops_when_full():
+    stage = Stage(lambda x: time.sleep(0.01) or x, queue_size=2, drop=DropPolicy.NEWEST)
+    pipeline = Pipeline(range(50), [stage])
+    with pipeline:
+        results = list(pipeline.results(timeout=5))
+    stats = pipeline.stats[0]
+    assert stats.dropped > 0 and len(results) + stats.dropped == 50
+
+
+def test_block_backpressure_after_restart():
+    high = []
+
+    def slow(x):
+        # Bij BLOCK komt de wachtrij nooit boven queue_size, plus de geforceerde eindmarkering
+        high.append(len(stage.queue))
+        time.sleep(0.002)
+        return x
+
+    stage = Stage(slow, queue_size=2, drop=DropPolicy.BLOCK)
+    for _ in range(2):
+        pipeline = Pipeline(range(30), [stage])
+        with pipeline:
+            results = [r.data for r in pipeline.results(timeout=5)]
+        assert results == list(range(30))
+    assert max(high) <= 3 and stage.stats.dropped == 0
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from roadangel.policy import CircuitBreaker, CircuitOpenError, RequestPolicy, RttEstimator
+
+
+class Script:
+    """send(timeout) that follows a list of (delay, error) per attempt"""
+
+    def __init__(self, *attempts):
+        self.attempts = list(attempts)
+        self.timeouts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, timeout):
+        with self._lock:
+            number = len(self.timeouts)
+            self.timeouts.append(timeout)
+        delay, error = self.attempts[min(number, len(self.attempts) - 1)]
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return f"answer {number}"
+
+
+@pytest.fixture
+def policy():
+    policy = RequestPolicy(min_timeout=0.05, initial_timeout=0.1, failure_threshold=2, reset_timeout=0.1)
+    yield policy
+    policy.close()
+
+
+def test_slow_read_is_hedged_and_the_hedge_wins(policy):
+    send = Script((0.5, None), (0.0, None))
+    start = time.monotonic()
+    assert policy.execute("cam", "API_GetBaseInfo", send) == "answer 1"
+    assert time.monotonic() - start < 0.4
+    stats = policy.stats("cam")
+    assert stats.hedges == 1 and stats.hedge_wins == 1 and stats.failures == 0
+
+
+def test_failed_read_is_hedged_right_away(policy):
+    send = Script((0.0, requests.ConnectionError("reset")), (0.0, None))
+    start = time.monotonic()
+    assert policy.execute("cam", "API_GetBaseInfo", send) == "answer 1"
+    # Niet eerst de hedge-wachttijd uitzitten
+    assert time.monotonic() - start < 0.09
+
+
+def test_write_is_sent_once_with_the_write_timeout(policy):
+    send = Script((0.0, requests.Timeout("slow")))
+    with pytest.raises(requests.Timeout):
+        policy.execute("cam", "API_GeneralSave", send)
+    assert send.timeouts == [policy.write_timeout]
+    assert policy.stats("cam").hedges == 0
+    # Een write-timeout verdubbelt de read-timeout niet
+    assert policy.timeout("cam") == 0.1
+
+
+def test_breaker_opens_and_probes(policy):
+    failing = Script((0.0, requests.ConnectionError("down")))
+    policy.max_hedges = 0
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            policy.execute("cam", "API_GetBaseInfo", failing)
+    with pytest.raises(CircuitOpenError):
+        policy.execute("cam", "API_GetBaseInfo", failing)
+    assert len(failing.timeouts) == 2 and policy.stats("cam").rejected == 1
+
+    time.sleep(0.12)
+    assert policy.execute("cam", "API_GetBaseInfo", Script((0.0, None))) == "answer 0"
+    assert policy.breaker("cam").state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.failure()
+    assert breaker.allow() and not breaker.allow()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_rtt_estimator_backoff_and_percentile():
+    rtt = RttEstimator(initial=1.0)
+    assert rtt.timeout() == 1.0
+    rtt.back_off()
+    assert rtt.timeout() == 2.0 and rtt.percentile(0.5) is None
+    for i in range(1, 21):
+        rtt.observe(i / 100)
+    assert rtt.backoff == 1 and rtt.percentile(0.95) == 0.2
+    assert rtt.srtt < rtt.timeout() < 1.0
+
+
+def test_policy_over_lossy_simulator():
+    from roadangel.simulator import HaloSimulator
+
+    # Verloren pakketten hangen; de hedge haalt het antwoord toch snel op
+    with HaloSimulator(gpx_files=0, stall=1.0, seed=3) as sim:
+        policy = RequestPolicy(min_timeout=0.1, max_timeout=2.0, initial_timeout=0.2, max_hedges=4,
+                               failure_threshold=100)
+        halo = sim.halo(policy=policy)
+        # Login is geen read en wordt niet gehedged
+        halo.login()
+        sim.loss = 0.2
+        for _ in range(10):
+            assert halo.get_baseinfo() is not None
+        assert policy.stats(sim.host).hedges > 0
+        policy.close()
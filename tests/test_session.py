@@ -0,0 +1,39 @@
+from roadangel.session import SessionManager
+
+
+def test_login_reuses_cached_session(secure_sim):
+    sessions = SessionManager(persist=False)
+    first = secure_sim.halo(sessions=sessions)
+    first.login()
+    second = secure_sim.halo(sessions=sessions)
+    second.login()
+
+    assert secure_sim.requests["API_RequestSessionID"] == 1
+    assert second.session_id == first.session_id
+    assert second.get_baseinfo() is not None
+
+
+def test_rejected_session_triggers_one_reauth(secure_sim):
+    sessions = SessionManager(persist=False)
+    halo = secure_sim.halo(sessions=sessions)
+    halo.login()
+    old = halo.session_id
+
+    # Camera herstart: alle sessies ongeldig
+    secure_sim.sessions.clear()
+    assert halo.get_baseinfo() is not None
+
+    assert secure_sim.requests["API_RequestSessionID"] == 2
+    assert halo.session_id != old
+    assert sessions.get(halo.host) == halo.session_id
+
+
+def test_session_file_is_shared(tmp_path, secure_sim):
+    path = tmp_path / "sessions.json"
+    secure_sim.halo(sessions=SessionManager(path=path)).login()
+
+    # Ander proces: zelfde bestand, geen nieuwe handshake
+    halo = secure_sim.halo(sessions=SessionManager(path=path))
+    halo.login()
+    assert secure_sim.requests["API_RequestSessionID"] == 1
+    assert halo.get_baseinfo() is not None
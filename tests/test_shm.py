@@ -0,0 +1,71 @@
+import time
+
+import numpy as np
+import pytest
+
+from roadangel.shm import FrameReader, FrameRing, SharedStream
+from roadangel.stream import ReadMode
+
+
+class FakeCapture:
+    def __init__(self, url, frames=50):
+        self.frames = frames
+        self.index = 0
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        self.index += 1
+        if self.index > self.frames:
+            return False, None
+        time.sleep(0.002)
+        return True, np.full((4, 6, 3), self.index % 256, dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+class NoFrames(FakeCapture):
+    def read(self):
+        return False, None
+
+
+def broken_factory(url):
+    raise OSError("cannot open stream")
+
+
+def test_ring_every_mode_and_lapped_frames():
+    with FrameRing.create((4, 6, 3), slots=4) as ring:
+        with FrameReader(ring.name, mode=ReadMode.EVERY) as reader:
+            for i in range(1, 11):
+                ring.write(np.full((4, 6, 3), i, dtype=np.uint8))
+            frames = [reader.read(copy=True) for _ in range(3)]
+            assert [int(f.image[0, 0, 0]) for f in frames] == [8, 9, 10]
+            assert reader.missed == 7
+
+
+def test_close_refuses_while_a_view_is_alive():
+    with FrameRing.create((4, 6, 3), slots=4) as ring:
+        ring.write(np.zeros((4, 6, 3), dtype=np.uint8))
+        reader = FrameReader(ring.name)
+        frame = reader.read()
+        with pytest.raises(RuntimeError):
+            reader.close()
+        del frame
+        reader.close()
+
+
+@pytest.mark.parametrize("factory", [NoFrames, broken_factory])
+def test_start_fails_when_the_decoder_fails(factory):
+    shared = SharedStream("fake", capture_factory=factory)
+    with pytest.raises(RuntimeError):
+        shared.start(timeout=5)
+    assert not shared.running
+
+
+def test_frames_reach_a_reader():
+    with SharedStream("fake", capture_factory=FakeCapture) as shared:
+        with shared.reader(mode=ReadMode.EVERY) as reader:
+            frame = reader.read(timeout=5, copy=True)
+            assert frame is not None and frame.image.shape == (4, 6, 3)
@@ -0,0 +1,75 @@
+import socket
+
+import requests
+
+from roadangel.annexb import NAL_IDR, NAL_PPS, NAL_SLICE, NAL_SPS
+from roadangel.nmea import parse_rmc
+from roadangel.simulator import HaloSimulator, synthetic_gop, synthetic_gpx
+
+
+def nal_types(data):
+    return [part[0] & 0x1F for part in data.split(b"\x00\x00\x00\x01")[1:]]
+
+
+def test_synthetic_gop_structure():
+    assert nal_types(synthetic_gop(frames=4)) == [NAL_SPS, NAL_PPS, NAL_IDR, NAL_SLICE, NAL_SLICE, NAL_SLICE]
+    assert nal_types(synthetic_gop(frames=2, parameter_sets=False)) == [NAL_IDR, NAL_SLICE]
+
+
+def test_synthetic_gpx_has_rmc_and_gga_per_second():
+    lines = synthetic_gpx(3).decode().splitlines()
+    assert len(lines) == 6
+    assert [line[:6] for line in lines[:2]] == ["$GPRMC", "$GPGGA"]
+    # Elke 500e fix is ongeldig
+    assert lines[0].split(",")[2] == "V" and lines[2].split(",")[2] == "A"
+
+
+def test_commands_and_session(secure_sim):
+    halo = secure_sim.halo()
+    halo.login()
+    assert halo.session_id in secure_sim.sessions
+    assert halo.get_baseinfo() is not None
+    assert secure_sim.requests["API_RequestSessionID"] == 1
+    assert [f.name for f in halo.gpsfilelistreq().file] == list(secure_sim.files)
+
+
+def test_range_requests(sim):
+    name, data = next(iter(sim.files.items()))
+    url = f"http://{sim.host}/{name}"
+
+    r = requests.get(url, headers={"Range": "bytes=100-"})
+    assert r.status_code == 206 and r.content == data[100:]
+    assert r.headers["Content-Range"] == f"bytes 100-{len(data) - 1}/{len(data)}"
+
+    r = requests.get(url, headers={"Range": f"bytes={len(data)}-"})
+    assert r.status_code == 416 and r.headers["Content-Range"] == f"bytes */{len(data)}"
+
+    assert requests.get(f"http://{sim.host}/missing.gpx").status_code == 404
+    assert sim.requests["GET gpx"] == 3
+
+
+def test_add_gpx_is_listed_and_served(sim):
+    data = synthetic_gpx(5)
+    sim.add_gpx("20250724100000_0009.gpx", data)
+    halo = sim.halo()
+    assert halo.gpsfilelistreq().file[-1].starttime == "20250724100000"
+    assert requests.get(f"http://{sim.host}/20250724100000_0009.gpx").content == data
+    assert len(parse_rmc(data)) == 5
+
+
+def test_stream_sends_parameter_sets_first():
+    with HaloSimulator(gpx_files=0, fps=0, gop_frames=3) as sim:
+        with socket.create_connection(("127.0.0.1", sim.stream_port), timeout=5) as sock:
+            data = b""
+            while len(data) < len(sim.gop):
+                data += sock.recv(65536)
+    assert data.startswith(sim.gop)
+
+
+def test_loss_drops_requests():
+    with HaloSimulator(gpx_files=0, loss=1.0, seed=1) as sim:
+        try:
+            requests.post(f"http://{sim.host}/vcam/cmd.cgi?cmd=API_GetBaseInfo", timeout=5)
+        except requests.ConnectionError:
+            pass
+        assert sim.dropped == 1
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from roadangel.models import FileEntry
+from roadangel.nmea import GpsTrack
+from roadangel.spatial import SpatialIndex
+
+ENTRY = FileEntry("0", "49", "20250723140000", "20250723140100", "a.gpx", "a.mp4")
+
+
+def make_track(ts, lat, lon):
+    n = len(ts)
+    return GpsTrack(np.asarray(ts, dtype=float), np.asarray(lat, dtype=float), np.asarray(lon, dtype=float),
+                    np.ones(n, dtype=bool), np.zeros(n, dtype=np.float32), np.zeros(n, dtype=np.float32))
+
+
+def diagonal():
+    # Dwars door een cel van 0.005 graden, van de ene hoek naar de andere
+    index = SpatialIndex(cell=0.005)
+    n = 50
+    index.add(ENTRY, make_track(np.arange(n), np.linspace(52.0001, 52.0049, n), np.linspace(6.0049, 6.0001, n)))
+    return index
+
+
+def test_radius_tests_fixes_not_the_bounding_box():
+    index = diagonal()
+    # Hoek van de bounding box, de dichtstbijzijnde fix is honderden meters verder
+    assert index.radius(52.0001, 6.0001, 20) == []
+
+    hits = index.radius(52.0025, 6.0025, 20)
+    assert len(hits) == 1
+    # Alleen de tijd rond het punt, niet de hele doorgang van de cel
+    assert 22 < hits[0].t0 < hits[0].t1 < 27
+
+
+def test_radius_matches_segment_between_sparse_fixes():
+    index = SpatialIndex()
+    index.add(ENTRY, make_track([0, 10], [52.0, 52.0027], [6.001, 6.001]))
+    hits = index.radius(52.00135, 6.001, 10)
+    assert len(hits) == 1 and 4 < hits[0].t0 < 5 < hits[0].t1 < 6
+
+
+def test_no_segment_across_a_gap():
+    index = SpatialIndex(merge_gap=30)
+    index.add(ENTRY, make_track([0, 600], [52.0, 52.0027], [6.001, 6.001]))
+    assert index.radius(52.00135, 6.001, 10) == []
+
+
+def test_grown_file_connects_to_previous_fixes():
+    index = SpatialIndex()
+    index.add(ENTRY, make_track([0, 10], [52.0, 52.0027], [6.001, 6.001]))
+    # Zelfde bestand, gegroeid: alleen de nieuwe fix wordt toegevoegd, het segment ernaartoe telt mee
+    index.add(ENTRY, make_track([0, 10, 20], [52.0, 52.0027, 52.0054], [6.001, 6.001, 6.001]))
+    assert len(index) == 2
+    hits = index.radius(52.00405, 6.001, 10)
+    assert len(hits) == 1 and 14 < hits[0].t0 < 15 < hits[0].t1 < 16
+
+
+def test_bbox_narrows_to_fixes_inside():
+    hits = diagonal().bbox(52.002, 6.002, 52.003, 6.003)
+    assert [(h.t0, h.t1) for h in hits] == [(20.0, 29.0)]
+
+
+def test_save_and_load(tmp_path):
+    index = diagonal()
+    path = tmp_path / "spatial.json"
+    index.save(path)
+    loaded = SpatialIndex.load(path)
+    assert len(loaded) == len(index)
+    assert loaded.radius(52.0025, 6.0025, 20) == index.radius(52.0025, 6.0025, 20)
+
+    path.write_text('{"cell": 0.005, "files": [], "last": {}, "cells": []}')
+    with pytest.raises(RuntimeError):
+        SpatialIndex.load(path)
@@ -0,0 +1,122 @@
+import time
+
+import cv2
+import numpy as np
+
+from roadangel.stream import LiveStream, ReadMode, SampledStream
+
+
+class FakeCapture:
+    """cv2.VideoCapture stand-in: frames with PTS i / fps in real time, stalling before frame ``stall_at``"""
+
+    def __init__(self, frames=20, fps=30, stall_at=None, stall=0.0):
+        self.frames = frames
+        self.fps = fps
+        self.stall_at = stall_at
+        self.stall = stall
+        self.index = -1
+        self.start = None
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        assert prop == cv2.CAP_PROP_POS_MSEC
+        return self.index * 1000 / self.fps
+
+    def read(self):
+        self.index += 1
+        if self.index >= self.frames:
+            # Einde van de stream: blijven hangen tot stop()
+            time.sleep(0.05)
+            return False, None
+        if self.start is None:
+            self.start = time.monotonic()
+        if self.index == self.stall_at:
+            time.sleep(self.stall)
+        # Nooit voor op de camera; na de hapering komt de achterstand in één keer binnen
+        time.sleep(max(0.0, self.start + self.index / self.fps - time.monotonic()))
+        return True, np.zeros((2, 2, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+def read_all(stream):
+    frames = []
+    for frame in stream.frames(timeout=0.5):
+        frames.append(frame)
+    return frames
+
+
+def test_every_mode_delivers_in_order_and_counts_drops():
+    stream = LiveStream("fake", mode=ReadMode.EVERY, buffer_size=4, capture_factory=lambda url: FakeCapture(fps=1000))
+    with stream:
+        time.sleep(0.2)
+        frames = read_all(stream)
+    seqs = [f.seq for f in frames]
+    assert seqs == sorted(seqs) and seqs[-1] == 20
+    stats = stream.stats
+    assert stats.received == 20 and stats.delivered + stats.dropped == 20 and stats.dropped > 0
+
+
+def test_latency_includes_a_stall_before_decode():
+    stream = LiveStream("fake", mode=ReadMode.EVERY, buffer_size=32,
+                        capture_factory=lambda url: FakeCapture(frames=20, stall_at=10, stall=0.3))
+    with stream:
+        frames = read_all(stream)
+    assert frames[0].pts == 0.0
+    stats = stream.stats
+    # Decode -> read() is kort, maar de frames na de hapering liepen 0.3 s achter
+    assert stats.read_delay_max < 0.1
+    assert 0.2 < stats.latency_max < 0.5
+
+
+def test_latency_falls_back_to_decode_time_without_pts():
+    class NoPts(FakeCapture):
+        def get(self, prop):
+            return 0.0
+
+    stream = LiveStream("fake", capture_factory=lambda url: NoPts(frames=5))
+    with stream:
+        frames = read_all(stream)
+    # Alleen het eerste frame mag PTS 0 hebben
+    assert len(frames) == 5 and all(f.pts is None for f in frames[1:])
+    assert stream.stats.latency_max == stream.stats.read_delay_max
+
+
+class GrabCapture(FakeCapture):
+    """Adds grab()/retrieve(), counting how often retrieve() runs"""
+
+    def __init__(self, frames=60, fps=200):
+        super().__init__(frames=frames, fps=fps)
+        self.retrieved = 0
+
+    def grab(self):
+        ok, _ = self.read()
+        return ok
+
+    def retrieve(self):
+        self.retrieved += 1
+        return True, np.zeros((2, 2, 3), dtype=np.uint8)
+
+
+def test_sampled_stream_only_retrieves_sampled_frames():
+    cap = GrabCapture(frames=60, fps=200)
+    stream = SampledStream("fake", sample_fps=20, adaptive=False, capture_factory=lambda url: cap)
+    with stream:
+        frames = read_all(stream)
+    sampling = stream.sampling
+    # 0.3 s stream, een frame per 50 ms
+    assert sampling.grabbed == 60 and 3 <= sampling.decoded <= 10
+    assert cap.retrieved == sampling.decoded == len(frames)
+    assert sampling.skipped == 60 - sampling.decoded and sampling.saved > 0
+
+
+def test_sampled_stream_slows_down_for_a_slow_consumer():
+    stream = SampledStream("fake", sample_fps=100, min_fps=10, capture_factory=lambda url: GrabCapture(200, 200))
+    with stream:
+        # Consument leest niets: het vorige sample blijft liggen, de rate zakt tot min_fps
+        time.sleep(0.6)
+        assert stream.sampling.sample_fps == 10
+        read_all(stream)
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import numpy as np
+
+from roadangel.stream import LiveStream
+from roadangel.supervisor import StreamState, StreamSupervisor
+
+
+class StallingCapture:
+    """``frames`` frames at ~100 fps, then read() hangs for ``hang`` seconds and fails"""
+
+    def __init__(self, frames=5, hang=0.0):
+        self.frames = frames
+        self.hang = hang
+        self.index = 0
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        return 0.0
+
+    def read(self):
+        self.index += 1
+        if self.index > self.frames:
+            time.sleep(self.hang)
+            return False, None
+        time.sleep(0.01)
+        return True, np.zeros((2, 2, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+def supervisor(sim, captures, **kwargs):
+    captures = iter(captures)
+    states = []
+    live = StreamSupervisor(sim.halo(), frame_deadline=0.2, first_frame_deadline=0.5, backoff_base=0.05,
+                            backoff_max=0.1, jitter=0,
+                            stream_factory=lambda: LiveStream("fake", capture_factory=lambda url: next(captures)),
+                            on_state=states.append, **kwargs)
+    return live, states
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_stall_reconnects_without_rearming(sim):
+    # Tweede capture blijft lang genoeg lopen om te meten
+    live, states = supervisor(sim, [StallingCapture(5, hang=1.0), StallingCapture(1000)])
+    with live:
+        assert live.read(timeout=2) is not None
+        assert wait_for(lambda: live.stats.reconnects == 1)
+        assert live.read(timeout=1) is not None
+    stats = live.stats
+    assert stats.arms == 1 and stats.stalls == 1 and stats.ttff is not None
+    assert 0 < stats.reconnect_latency < 1
+    assert states[:5] == [StreamState.ARMING, StreamState.CONNECTING, StreamState.STREAMING,
+                          StreamState.STALLED, StreamState.CONNECTING]
+    assert states[-1] == StreamState.STOPPED
+    assert sim.requests["API_SetAppLiveState"] == 1
+
+
+def test_failed_attempts_rearm_with_backoff(sim):
+    live, states = supervisor(sim, [StallingCapture(0) for _ in range(3)] + [StallingCapture(1000)])
+    with live:
+        assert wait_for(lambda: live.state == StreamState.STREAMING)
+    assert live.stats.failed_attempts == 3 and live.stats.arms == 4
+    assert StreamState.BACKOFF in states
+
+
+def test_stuck_capture_is_kept_aside(sim):
+    release = threading.Event()
+
+    class Stuck(StallingCapture):
+        def read(self):
+            # Hangt in read() en reageert niet op stop()
+            if self.index >= self.frames:
+                release.wait(5)
+                return False, None
+            return super().read()
+
+    live, _ = supervisor(sim, [Stuck(3), Stuck(3), StallingCapture(1000)], max_abandoned=1)
+    with live:
+        assert wait_for(lambda: live.stats.abandoned == 1)
+        # Met max_abandoned=1 geen nieuwe capture zolang de oude vastzit
+        time.sleep(0.3)
+        assert live.stats.abandoned_total == 1 and live.state != StreamState.STREAMING
+        release.set()
+        assert wait_for(lambda: live.state == StreamState.STREAMING and live.stats.abandoned == 0)
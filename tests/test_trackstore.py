@@ -0,0 +1,71 @@
+import numpy as np
+
+from roadangel import trackstore
+from roadangel.models import FileEntry
+from roadangel.nmea import GpsTrack
+from roadangel.trackstore import DeviceTrack, TrackStore
+
+
+def make_track(timestamps):
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    n = len(timestamps)
+    return GpsTrack(timestamps, timestamps / 1e6, -timestamps / 1e6, np.ones(n, dtype=bool),
+                    np.full(n, 10, dtype=np.float32), np.zeros(n, dtype=np.float32))
+
+
+def test_append_and_range(tmp_path, monkeypatch):
+    monkeypatch.setattr(trackstore, "INDEX_STRIDE", 16)
+    track = DeviceTrack(tmp_path / "dev")
+    track.append(make_track(range(0, 100)))
+    track.append(make_track(range(100, 250)))
+    track.append(make_track([np.nan, 250]))
+
+    assert len(track) == 251
+    assert list(track.range(90, 110).timestamp) == list(range(90, 110))
+    assert len(track.range(1000, 2000)) == 0
+
+    # Opnieuw openen vanaf schijf
+    reopened = DeviceTrack(tmp_path / "dev")
+    assert np.array_equal(reopened.range().timestamp, np.arange(251))
+    assert np.array_equal(reopened.range(33, 200).latitude, np.arange(33, 200) / 1e6)
+
+
+def test_out_of_order_append_merges_into_new_generation(tmp_path, monkeypatch):
+    monkeypatch.setattr(trackstore, "INDEX_STRIDE", 16)
+    track = DeviceTrack(tmp_path / "dev")
+    track.append(make_track(range(100, 200)))
+    track.append(make_track(range(0, 100, 2)))
+
+    assert track.meta["generation"] == 1
+    assert not (tmp_path / "dev" / "timestamp.bin").exists()
+    stamps = track.range().timestamp
+    assert len(stamps) == 150 and np.all(np.diff(stamps) > 0)
+    assert list(track.range(10, 16).timestamp) == [10, 12, 14]
+
+    track.append(make_track([200, 201]))
+    assert np.array_equal(DeviceTrack(tmp_path / "dev").range(199, 300).timestamp, [199, 200, 201])
+
+
+def test_orphan_bytes_of_a_crashed_append_are_dropped(tmp_path):
+    track = DeviceTrack(tmp_path / "dev")
+    track.append(make_track(range(10)))
+    # Kolom geschreven, meta niet: zoals na een crash
+    with open(tmp_path / "dev" / "timestamp.bin", "ab") as f:
+        f.write(np.arange(5, dtype="<f8").tobytes())
+
+    track = DeviceTrack(tmp_path / "dev")
+    track.append(make_track([10, 11]))
+    assert np.array_equal(track.range().timestamp, np.arange(12))
+
+
+def test_store_appends_only_new_fixes_of_a_grown_file(tmp_path):
+    store = TrackStore(tmp_path)
+    entry = FileEntry("0", "49", "20250723140000", "20250723140010", "a.gpx", "")
+    store.append("1.2.3.4:80", make_track(range(10)), entry)
+
+    grown = FileEntry("0", "49", "20250723140000", "20250723140020", "a.gpx", "")
+    store.append("1.2.3.4:80", make_track(range(20)), grown)
+
+    assert len(store.fixes("1.2.3.4:80")) == 20
+    info = store.device("1.2.3.4:80").meta["files"]["a.gpx"]
+    assert info["rows"] == 20 and info["last"] == 19 and info["endtime"] == grown.endtime
@@ -0,0 +1,114 @@
+import subprocess
+
+import pytest
+
+from roadangel.wifi import CredentialCache, WifiManager, connect_to_wifi, list_networks
+
+
+class FakeNmcli:
+    """NetworkManager in a dict: visible SSID's, saved profiles and the right password per SSID"""
+
+    def __init__(self, visible=(), profiles=None, passwords=None, hang=()):
+        self.visible = list(visible)
+        self.profiles = dict(profiles or {})   # ssid -> password stored in the profile
+        self.passwords = dict(passwords or {})
+        self.hang = set(hang)                  # SSID's whose connect times out
+        self.calls = []
+
+    def run(self, args, timeout=None):
+        self.calls.append(args)
+        if args[:3] == ["-t", "-f", "SSID"]:
+            return self._done("\n".join(self.visible + ["OtherNet", "WiFi_12\\:34HaloPro"]))
+        if args[:3] == ["-t", "-f", "NAME,TYPE"]:
+            lines = [f"{name}:802-11-wireless" for name in self.profiles] + ["Wired:802-3-ethernet"]
+            return self._done("\n".join(lines))
+        if args[:3] == ["connection", "up", "id"]:
+            ssid = args[3]
+            ok = self.profiles.get(ssid) == self.passwords.get(ssid)
+            return self._done(returncode=0 if ok else 4, stderr="" if ok else "Secrets were required")
+        if args[0] == "connection" and args[1] == "delete":
+            self.profiles.pop(args[-1], None)
+            return self._done()
+        if args[:3] == ["device", "wifi", "connect"]:
+            ssid, password = args[3], args[5]
+            if ssid in self.hang:
+                raise subprocess.TimeoutExpired(["nmcli", *args], timeout)
+            # NetworkManager laat ook na een mislukte poging een profiel achter
+            self.profiles[ssid] = password
+            if self.passwords.get(ssid) != password:
+                return self._done(returncode=4, stderr="Secrets were required")
+            return self._done()
+        raise AssertionError(f"unexpected nmcli call {args}")
+
+    def _done(self, stdout="", returncode=0, stderr=""):
+        return subprocess.CompletedProcess(["nmcli"], returncode, stdout, stderr)
+
+    def connects(self):
+        return [c for c in self.calls if c[:3] == ["device", "wifi", "connect"]]
+
+
+def test_scan_filters_and_deduplicates():
+    nmcli = FakeNmcli(visible=["WiFi_1234HaloPro", "WiFi_1234HaloPro", "WiFi_5678HaloPro"])
+    manager = WifiManager(runner=nmcli)
+    assert manager.scan() == ["WiFi_1234HaloPro", "WiFi_5678HaloPro"]
+    assert nmcli.calls[0][-2:] == ["--rescan", "yes"]
+
+
+def test_profiles_only_lists_wifi():
+    manager = WifiManager(runner=FakeNmcli(profiles={"WiFi_1234HaloPro": "x"}))
+    assert manager.profiles() == ["WiFi_1234HaloPro"]
+
+
+def test_reuses_profile_without_password():
+    nmcli = FakeNmcli(visible=["WiFi_1234HaloPro"], profiles={"WiFi_1234HaloPro": "secret"},
+                      passwords={"WiFi_1234HaloPro": "secret"})
+    result = WifiManager(runner=nmcli, passwords=["wrong"]).auto_connect(timeout=1)
+    assert result.reused_profile and result.attempts == 1
+    assert nmcli.connects() == []
+
+
+def test_stale_profile_is_recreated():
+    nmcli = FakeNmcli(profiles={"WiFi_1234HaloPro": "old"}, passwords={"WiFi_1234HaloPro": "1234567890"})
+    result = WifiManager(runner=nmcli).connect("WiFi_1234HaloPro")
+    assert not result.reused_profile
+    assert ["connection", "delete", "id", "WiFi_1234HaloPro"] in nmcli.calls
+    assert nmcli.profiles["WiFi_1234HaloPro"] == "1234567890"
+
+
+def test_tries_passwords_in_order_and_remembers_the_one_that_worked():
+    nmcli = FakeNmcli(passwords={"WiFi_1234HaloPro": "1234567890"})
+    credentials = CredentialCache()
+    manager = WifiManager(runner=nmcli, credentials=credentials)
+    result = manager.connect("WiFi_1234HaloPro")
+    assert result.attempts == 2
+    assert [c[5] for c in nmcli.connects()] == ["HaloPro1234", "1234567890"]
+    assert credentials.get("WiFi_1234HaloPro") == "1234567890"
+
+    # Profiel weg: het onthouden wachtwoord gaat voor
+    nmcli.profiles.clear()
+    nmcli.calls.clear()
+    assert manager.connect("WiFi_1234HaloPro").attempts == 1
+
+
+def test_timeout_and_failure():
+    nmcli = FakeNmcli(hang={"WiFi_1234HaloPro"})
+    with pytest.raises(RuntimeError):
+        WifiManager(runner=nmcli, passwords=["a"]).connect("WiFi_1234HaloPro")
+    with pytest.raises(TimeoutError):
+        WifiManager(runner=FakeNmcli(), scan_interval=0).wait_for_network(timeout=0)
+
+
+def test_auto_connect_prefers_known_ssid():
+    nmcli = FakeNmcli(visible=["WiFi_1111HaloPro", "WiFi_2222HaloPro"], profiles={"WiFi_2222HaloPro": "pw"},
+                      passwords={"WiFi_2222HaloPro": "pw"})
+    result = WifiManager(runner=nmcli).auto_connect(timeout=1)
+    assert result.ssid == "WiFi_2222HaloPro"
+    assert result.scans == 1
+
+
+def test_module_helpers_use_the_runner():
+    nmcli = FakeNmcli(visible=["WiFi_1234HaloPro"], passwords={"WiFi_1234HaloPro": "pw"})
+    assert list_networks(runner=nmcli) == ["WiFi_1234HaloPro"]
+    assert connect_to_wifi("WiFi_1234HaloPro", "pw", runner=nmcli)
+    with pytest.raises(RuntimeError):
+        connect_to_wifi("WiFi_1234HaloPro", "nope", runner=nmcli)